@@ -2,17 +2,28 @@
 AceTracker Tkinter app for tracking PokerStars data
 """
 
+import time
+
+# Cold start of the app is measured from here until the first frame is shown
+startup_clock = time.perf_counter()
+
 import customtkinter as ctk
-import csv
 import os
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure 
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib import rcParams
-from cycler import cycler
-from re import findall
 from tkinter import Listbox, Scrollbar
-from utility import handle_txt_file, save_to_json, load_from_json, save_to_csv
+from utility import save_to_json, load_from_json, HandHistoryParser
+from hand_model import ActionType, hand_streets
+from hand_store import open_hand_store, HandStore, PlayerStatsCache
+from stats_engine import stat_registry
+from hand_evaluator import hand_categories, category_value, evaluate_many, hand_label
+from ingest import ingest_history_folder, IngestWorker
+from history_watcher import HistoryWatcher, DELETED
+from cell_grid import CellGrid, configure_changed
+from bankroll import cumulative_profit, visible_range, downsample_min_max
+from profiler import RefreshProfiler, profile_settings, profile_stage, save_profile, get_profiles, format_profile
+
+# Matplotlib is imported when profit graph is drawn first time, other modules are imported before the first frame
+startup_profiler = RefreshProfiler("startup", started_at=startup_clock)
+startup_profiler.add_time("module import", time.perf_counter() - startup_clock)
 
 # Set themes
 ctk.set_appearance_mode("dark")  # Modes: system (default), light, dark
@@ -23,11 +34,63 @@ config_data = load_from_json(source="./hud_data/config.json")
 if config_data != 0:
     history_path = config_data["path_to_hand_history"]
     ps_username = config_data["pokerstars_username"]
+    ingest_workers = config_data.get("ingest_workers", 0)
+    auto_refresh = config_data.get("auto_refresh", 1)
 
 ctk_default_blue = "#1f538d"
 ctk_default_grey = "#212121"
 ctk_default_grey_light = "#292929"
 
+# How often background ingestion events are checked, in milliseconds
+ingest_poll_interval = 16
+
+# Number of hand keys read from hand store at a time for hand DB listbox
+hand_key_block_size = 500
+
+# How often changes found by history watcher are checked, and how long stats wait for more changes before refresh, in milliseconds
+watch_poll_interval = 50
+stats_refresh_delay = 5000
+
+# Tables written during this many seconds are shown in HUD, and number of blocks parsed from a table per refresh
+active_table_period = 600
+table_parse_blocks = 1
+latest_table_option = "Latest table"
+
+# Profit graph zooms by this factor on every mouse wheel step, but shows at least plot_min_hands hands
+plot_zoom_step = 0.8
+plot_min_hands = 20
+
+# Total stats of recently seated players from all hand histories, shared by HUD refreshes
+player_stats_cache = PlayerStatsCache()
+
+# File where diagnostics of the latest refreshes are exported
+diagnostics_file = "./hud_data/diagnostics.json"
+
+# Seconds from start until the first frame is shown, longer startup is reported
+startup_budget = 1.0
+
+def table_display_name(table_file):
+    """
+    Function that returns table name from hand history file name, like "Aase II" from "HH20240101 Aase II - $0.02-$0.05 - USD No Limit Hold'em.txt"
+    """
+    name = os.path.basename(table_file)
+    if name.startswith("HH") and " " in name:
+        name = name.split(" ", 1)[1]
+    name = name.split(" - ")[0]
+    return name[:-4] if name.endswith(".txt") else name
+
+def poll_ingest_worker(screen, worker, on_progress, on_finish):
+    """
+    Check events from background ingest worker and keep polling with after() until worker finishes
+    """
+    for event, payload in worker.get_events():
+        if event == "progress":
+            on_progress(*payload)
+        else:
+            on_finish(event, payload)
+            return
+    screen.after(ingest_poll_interval, poll_ingest_worker, screen, worker, on_progress, on_finish)
+
 class MainApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -57,23 +120,60 @@ class MainApp(ctk.CTk):
         self.settings_button = ctk.CTkButton(self.menu_frame, text="Settings", command=self.show_settings)
         self.settings_button.pack(side="left", pady=10, padx=10)
 
-        # Dictionary to store screens
+        # Screens are created when they are shown first time
+        self.screen_classes = {
+            "Stats": StatsScreen,
+            "Ranges": OpeningRanges,
+            "Hand DB": HandDBScreen,
+            "Settings": SettingsScreen
+        }
         self.screens = {}
-
-        # Create and store screens
-        self.screens["Stats"] = StatsScreen(self.container, self)
-        self.screens["Ranges"] = OpeningRanges(self.container, self)
-        self.screens["Hand DB"] = HandDBScreen(self.container, self)
-        self.screens["Settings"] = SettingsScreen(self.container, self)
+        self.startup_profiler = startup_profiler
 
         # Show the HUD screen by default
         self.current_screen = "Stats"
         self.show_screen("Stats")
 
+        # Refresh HUD and stats when poker client writes to hand history folder
+        self.history_watcher = None
+        if auto_refresh and os.path.isdir(history_path):
+            self.history_watcher = HistoryWatcher(history_path)
+            self.history_watcher.start()
+            self.after(watch_poll_interval, self.check_history_changes)
+
+        # Startup is finished when Tk is idle after drawing the first frame
+        self.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        """Save startup profile when the first frame is shown, startup over its budget is reported"""
+        self.update_idletasks()
+        profile = save_profile(self.startup_profiler)
+        self.startup_profiler = None
+        if profile["total_seconds"] > startup_budget:
+            print(f"Startup took {profile['total_seconds']:.2f} s, budget is {startup_budget} s")
+
+    def check_history_changes(self):
+        """Pass changed files from history watcher to screens and keep checking with after()"""
+        changes = self.history_watcher.get_changes()
+        if changes:
+            # Screens created later find changed files when they are created
+            for screen_name in ["Ranges", "Stats"]:
+                if screen_name in self.screens:
+                    self.screens[screen_name].on_history_change(changes)
+        self.after(watch_poll_interval, self.check_history_changes)
+
+    def get_screen(self, screen_name):
+        """Return screen, it is created if it is shown first time"""
+        screen = self.screens.get(screen_name)
+        if screen is None:
+            with profile_stage(self.startup_profiler, f"{screen_name} screen"):
+                screen = self.screens[screen_name] = self.screen_classes[screen_name](self.container, self)
+        return screen
+
     def show_screen(self, screen_name):
         """Display the requested screen."""
         self.current_screen = screen_name
-        screen = self.screens[screen_name]
+        screen = self.get_screen(screen_name)
         screen.tkraise()
         screen.pack()
 
@@ -88,6 +188,13 @@ class MainApp(ctk.CTk):
     def show_history(self):
         self.screens[self.current_screen].forget()
         self.show_screen("Hand DB")
+        # Hands may have been saved while another screen was shown
+        self.screens["Hand DB"].refresh_hands()
+
+    def hands_saved(self):
+        """Called when background parsing has saved hands, hand list is counted again if it is shown"""
+        if self.current_screen == "Hand DB":
+            self.screens["Hand DB"].refresh_hands()
 
     def show_settings(self):
         self.screens[self.current_screen].forget()
@@ -106,10 +213,22 @@ class StatsScreen(ctk.CTkFrame):
         # Button for refreshing data
         self.hud_button = ctk.CTkButton(self, text="Refresh", command=self.refresh_data)
         self.hud_button.pack(side="top", pady=5, padx=10)
+
+        # Progress bar for background refresh
+        self.ingest_worker = None
+        self.refresh_pending = False
+        self.auto_refresh_job = None
+        self.progress_bar = ctk.CTkProgressBar(self, width=300)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(side="top", pady=5, padx=10)
+        self.progress_label = ctk.CTkLabel(self, text="", font=("Arial", 12))
+        self.progress_label.pack(side="top", padx=10)
         
         # Create frame for showing data
         self.hud_frame = ctk.CTkFrame(self)
         self.hud_frame.pack(side="top", padx=20, pady=10)
+        self.stats_grid = CellGrid(self.hud_frame, self.create_stat_cell,
+            grid_options=lambda row, column: {"padx": 10, "pady": 3, "sticky": "w" if column == 0 else "e"})
 
         # Add optimal stats for REG
         ctk.CTkLabel(self, text=f"REG: 23 / 19 / 7 / 65 / 50", font=("Arial", 14, "bold")).pack(padx=10, pady=5)
@@ -117,101 +236,168 @@ class StatsScreen(ctk.CTkFrame):
         # Create frame for profit graph
         self.plot_frame = ctk.CTkFrame(self)
         self.plot_frame.pack(side="top", pady=10, fill="both", expand=True)
+        self.figure = None
+        self.profit_series = cumulative_profit([])
+        self.ev_series = cumulative_profit([])
 
         # Load initial data and display hero statistics
         self.refresh_data()
 
     def display_data(self, statistics):
-        """Displays the provided JSON data in the hud_frame.""" 
-        # Clear any existing widgets in the frame
-        for widget in self.hud_frame.winfo_children():
-            widget.destroy()
-        
-        # Add a label for each key-value pair in the JSON
+        """Displays the provided JSON data in the hud_frame, labels of previous refresh are reused"""
+        rows = []
         for key in statistics:
-            # Create a sub-frame for each stat
-            stat_frame = ctk.CTkFrame(self.hud_frame)
-            stat_frame.pack(fill="x", pady=3, padx=5)
-            
-            # Add a label for the stat name
-            stat_label = ctk.CTkLabel(stat_frame, text=f"{key.upper()}:", font=("Arial", 14, "bold"))
-            stat_label.pack(side="left", padx=10)
-            
-            # Add a label for the stat value (assuming a nested 'value' key in the JSON)
-            if key == "profit": statistics[key]['value'] = f"{statistics[key]['value']:.2f}"
-            value_label = ctk.CTkLabel(stat_frame, text=f"{statistics[key]['value']}", font=("Arial", 14))
-            value_label.pack(side="right", padx=10)
+            value = statistics[key]['value']
+            if key == "profit":
+                value = f"{value:.2f}"
+            rows.append([f"{key.upper()}:", f"{value}"])
+        return self.stats_grid.render(rows)
+
+    def create_stat_cell(self, master, row, column):
+        # Stat name on the left and its value on the right of each row
+        if column == 0:
+            return ctk.CTkLabel(master, text="", font=("Arial", 14, "bold"))
+        return ctk.CTkLabel(master, text="", font=("Arial", 14))
 
     def refresh_data(self):
-        # Go through all data and calculate stats for Hero
-        files = [os.path.join(history_path, f) for f in os.listdir(history_path) if os.path.isfile(os.path.join(history_path, f)) and "USD No Limit Hold'em" in f]
-        if not files:
-            print("No files found from", history_path)
-        else:
-            statistics = {}
-            bank_roll_data = []
-            for f in files:
-                single_table_stats, _, tmp_bank_roll_data = handle_txt_file(f, ps_username)
-                if single_table_stats:
-                    single_table_stats = single_table_stats[f"{ps_username}"]
-                    bank_roll_data.append(tmp_bank_roll_data)
-                    for key in single_table_stats:
-                        if key in statistics:
-                            if key in ["played_hands", "profit"]:
-                                statistics[key]["value"] += single_table_stats[key]["value"]
-                            else:
-                                statistics[key]["true"] += single_table_stats[key]["true"]
-                                statistics[key]["false"] += single_table_stats[key]["false"]
-                        else:
-                            # This is first file, we can just copy values to total stats
-                            statistics = single_table_stats
-                            break
-
-            # Final tuning on statistics
-            for stat in statistics:
-                if stat not in ["played_hands", "profit"]:
-                    if statistics[stat]["true"] > 0:
-                        # Calculate percentage
-                        statistics[stat]["value"] = statistics[stat]["true"] / (statistics[stat]["true"] + statistics[stat]["false"])
-                        statistics[stat]["value"] = int(100 * statistics[stat]["value"])
-                    else:
-                        statistics[stat]["value"] = 0
-            
-            # Save to JSON file
-            save_to_json(target="./hud_data/hero_stats.json", json_data=statistics)
-
-            # Save bank roll data to CSV
-            save_to_csv(target="./hud_data/bank_roll_data.csv", csv_data=bank_roll_data)
+        # Refresh button cancels refresh that is already running
+        if self.ingest_worker and self.ingest_worker.is_alive():
+            self.ingest_worker.cancel()
+            self.hud_button.configure(state="disabled")
+            return
+
+        # Go through all data and calculate stats for Hero in background, so UI stays responsive
+        self.profiler = RefreshProfiler("full refresh", profile_settings["trace_memory"])
+        self.ingest_worker = IngestWorker(ingest_history_folder, history_path, ps_username, ingest_workers, profiler=self.profiler)
+        self.ingest_worker.start()
+        self.hud_button.configure(text="Cancel")
+        self.progress_bar.set(0)
+        self.progress_label.configure(text="Checking files...")
+        poll_ingest_worker(self, self.ingest_worker, self.show_progress, self.finish_refresh)
+
+    def on_history_change(self, changes):
+        # Stats are refreshed once after poker client stops writing for a while, changes coming meanwhile restart the wait
+        if not any("USD No Limit Hold'em" in path for path in changes):
+            return
+        if self.auto_refresh_job is not None:
+            self.after_cancel(self.auto_refresh_job)
+        self.auto_refresh_job = self.after(stats_refresh_delay, self.auto_refresh)
+
+    def auto_refresh(self):
+        self.auto_refresh_job = None
+        if self.ingest_worker and self.ingest_worker.is_alive():
+            # Refresh again when current refresh is done, refresh_data would cancel it
+            self.refresh_pending = True
+            return
+        self.refresh_data()
 
-            self.display_data(statistics)
-            self.display_plot(bank_roll_data)
+    def show_progress(self, done, total):
+        """Update progress bar with number of parsed files"""
+        if total:
+            self.progress_bar.set(done / total)
+        self.progress_label.configure(text=f"Parsed {done} / {total} changed files")
+
+    def finish_refresh(self, event, result):
+        """Display results of background refresh"""
+        self.hud_button.configure(text="Refresh", state="normal")
+        if event == "done":
+            self.progress_bar.set(1)
+            self.progress_label.configure(text="")
+            # Parsed files may have changed total stats of any player
+            player_stats_cache.invalidate()
+            self.controller.hands_saved()
+            if result:
+                statistics, bankroll = result
+                with self.profiler.stage("widget rebuild"):
+                    self.profiler.count("changed cells", self.display_data(statistics))
+                    self.display_plot(bankroll["profit"], bankroll["ev_profit"])
+        elif event == "cancelled":
+            self.progress_label.configure(text="Refresh cancelled")
+        else:
+            self.progress_label.configure(text=f"Refresh failed: {result}")
+        save_profile(self.profiler)
+        if self.refresh_pending:
+            self.refresh_pending = False
+            self.refresh_data()
     
-    def display_plot(self, plot_data):
-        # Clear the plot frame
-        for widget in self.plot_frame.winfo_children():
-            widget.destroy()
-
-        # Combine multiple lists into one list and add values together sequentially
-        combined_data = []
-        current_val = 0
-        for sub_list in plot_data:
-            for val in sub_list:
-                current_val += val
-                combined_data.append(current_val)
-
-        # Create a figure and axis for the plot
-        plt.style.use('dark_background')
+    def create_plot(self):
+        """Create figure, canvas and toolbar of profit graph once, later refreshes only update the line"""
+        # Matplotlib takes long to import, so it is imported only when graph is drawn first time
+        from matplotlib import rcParams, style
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        from cycler import cycler
+        style.use('dark_background')
         rcParams['axes.prop_cycle'] = cycler('color', ['red', ctk_default_blue, 'green'])
-        fig = Figure(figsize = (50, 10), dpi = 100, facecolor=ctk_default_grey_light)
-        plot1 = fig.add_subplot(111)
-        plot1.set_title("Profit over time", 
+        self.figure = Figure(figsize = (12, 4), dpi = 100, facecolor=ctk_default_grey_light)
+        self.plot_axes = self.figure.add_subplot(111)
+        self.plot_axes.set_title("Profit over time",
             fontdict={'fontsize': 14})
-        plot1.set_facecolor(ctk_default_grey)
-        plot1.grid(linestyle='--', linewidth=0.5, axis='y')
-        plot1.plot(combined_data)
-        canvas = FigureCanvasTkAgg(fig, master=self.plot_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
+        self.plot_axes.set_facecolor(ctk_default_grey)
+        self.plot_axes.grid(linestyle='--', linewidth=0.5, axis='y')
+        self.plot_line, = self.plot_axes.plot([], [], label="Profit")
+        # Profit with all-in pots shared by equity of hero
+        self.ev_line, = self.plot_axes.plot([], [], label="EV")
+        self.plot_axes.legend(loc="upper left")
+        self.plot_canvas = FigureCanvasTkAgg(self.figure, master=self.plot_frame)
+        # Toolbar has zoom, pan and home buttons, mouse wheel zooms around the cursor
+        self.plot_toolbar = NavigationToolbar2Tk(self.plot_canvas, self.plot_frame, pack_toolbar=False)
+        self.plot_toolbar.pack(side="bottom", fill="x")
+        self.plot_canvas.get_tk_widget().pack(side="top", fill="both", expand=True)
+        self.plot_axes.callbacks.connect("xlim_changed", self.on_plot_range_change)
+        self.plot_canvas.mpl_connect("scroll_event", self.on_plot_scroll)
+        self.plot_canvas.mpl_connect("resize_event", self.on_plot_range_change)
+
+    def display_plot(self, profits, ev_profits=None):
+        # Cumulative profit of all hands is kept, lines only get the points visible at current width
+        self.profit_series = cumulative_profit(profits)
+        self.ev_series = cumulative_profit(profits if ev_profits is None else ev_profits)
+        if self.figure is None:
+            self.create_plot()
+        length = len(self.profit_series)
+        self.plot_axes.set_xlim(0, max(1, length - 1))
+        self.fit_plot_y()
+        self.update_plot_line()
+        # New data makes old zoom and pan history of toolbar useless
+        self.plot_toolbar.update()
+        self.plot_canvas.draw_idle()
+
+    def update_plot_line(self):
+        """Downsample visible part of profit and EV series to width of the plot in pixels"""
+        x_min, x_max = self.plot_axes.get_xlim()
+        start, stop = visible_range(len(self.profit_series), x_min, x_max)
+        for line, series in [(self.plot_line, self.profit_series), (self.ev_line, self.ev_series)]:
+            x, y = downsample_min_max(series, start, stop, self.plot_axes.bbox.width)
+            line.set_data(x, y)
+
+    def fit_plot_y(self):
+        """Set y limits to lowest and highest profit or EV of visible hands"""
+        x_min, x_max = self.plot_axes.get_xlim()
+        start, stop = visible_range(len(self.profit_series), x_min, x_max)
+        if stop > start:
+            low = min(self.profit_series[start:stop].min(), self.ev_series[start:stop].min())
+            high = max(self.profit_series[start:stop].max(), self.ev_series[start:stop].max())
+            margin = (high - low) * 0.05 or 1
+            self.plot_axes.set_ylim(low - margin, high + margin)
+
+    def on_plot_range_change(self, _):
+        # Called by zoom, pan, home button and resizing, line is downsampled again for the new range
+        self.update_plot_line()
+        self.plot_canvas.draw_idle()
+
+    def on_plot_scroll(self, event):
+        if event.inaxes is not self.plot_axes or not len(self.profit_series):
+            return
+        # Zoom in to hands around the cursor, but not past whole history or less than a few hands
+        x_min, x_max = self.plot_axes.get_xlim()
+        scale = plot_zoom_step if event.button == "up" else 1 / plot_zoom_step
+        last = max(1, len(self.profit_series) - 1)
+        width = min(last, max(plot_min_hands, (x_max - x_min) * scale))
+        center = event.xdata
+        x_min = min(max(0, center - (center - x_min) * width / (x_max - x_min)), last - width)
+        self.plot_axes.set_xlim(x_min, x_min + width)
+        self.fit_plot_y()
+        self.plot_canvas.draw_idle()
 
 class OpeningRanges(ctk.CTkFrame):
     def __init__(self, parent, controller):
@@ -222,6 +408,18 @@ class OpeningRanges(ctk.CTkFrame):
         self.selected_cells = []
         self.player_data = []
         self.active_pos = "SB"
+
+        # Incremental parsers for table files, so refresh only parses newly played hands
+        self.table_parsers = {}
+        self.ingest_worker = None
+        self.refresh_pending = False
+        # Every active table has its own parser, latest stats and seats of its last hand, and time it was last written.
+        # Tables with new hands wait in dirty_tables in the order they changed.
+        self.table_results = {}
+        self.table_activity = {}
+        self.dirty_tables = []
+        self.table_names = {}
+        self.shown_table = None
         
         # Load opening ranges from JSON
         self.opening_ranges = load_from_json(source="./hud_data/opening_ranges.json")
@@ -229,6 +427,8 @@ class OpeningRanges(ctk.CTkFrame):
         # Create frame for showing data
         self.hud_frame = ctk.CTkFrame(self)
         self.hud_frame.pack(side="top", expand=True)
+        self.hud_grid = CellGrid(self.hud_frame, self.create_hud_cell,
+            grid_options={"padx": 5, "pady": 3, "sticky": "nsew"})
 
         # Menu Frame (for navigation)
         self.menu_frame = ctk.CTkFrame(self, width=200)
@@ -246,12 +446,16 @@ class OpeningRanges(ctk.CTkFrame):
         self.bottom_frame = ctk.CTkFrame(self)
         self.bottom_frame.pack(side="bottom")
 
+        # Selector for table shown in HUD, latest follows the table where hand was played last
+        self.table_selector = ctk.CTkOptionMenu(self.menu_frame, values=[latest_table_option], command=lambda value: self.show_selected_table())
+        self.table_selector.pack(side="top", pady=5, padx=10)
+
         # Button for refreshing data
-        self.hud_button = ctk.CTkButton(self.menu_frame, text="Refresh", command=self.refresh_data)
+        self.hud_button = ctk.CTkButton(self.menu_frame, text="Refresh", command=self.refresh_all_tables)
         self.hud_button.pack(side="top", pady=5, padx=10)
 
         # Load initial data
-        self.refresh_data()
+        self.refresh_all_tables()
 
         # Generate poker hands grid
         ranks = ['A', 'K', 'Q', 'J', 'T', '9', '8', '7', '6', '5', '4', '3', '2']
@@ -313,35 +517,15 @@ class OpeningRanges(ctk.CTkFrame):
         )
         self.selected_cells_display.pack(padx=15, pady=15)
 
-        # Create a dictionary to store cell buttons for faster updates
-        self.cell_buttons = {}
-        
         # Create initial table
         self.create_table()
         self.change_active_position("SB")
 
     def create_table(self):
-        # Clear the frame first
-        for widget in self.table_frame.winfo_children():
-            widget.destroy()
-
-        for row in range(13):
-            for col in range(13):
-                # Create a clickable cell
-                cell_text = f"{self.tableTexts[row][col]}"
-                cell_color = None
-                if cell_text in self.opening_ranges[self.active_pos]:
-                    cell_color = "brown"
-
-                cell = ctk.CTkButton(
-                    self.table_frame,
-                    text=cell_text,
-                    command=lambda c=cell_text: self.on_cell_click(c),
-                    corner_radius=5,
-                    fg_color=cell_color
-                )
-                cell.grid(row=row, column=col, padx=3, pady=3, sticky="nsew")
-                self.cell_buttons[cell_text] = cell 
+        # Buttons are created once, later updates configure only buttons whose color changed
+        self.range_grid = CellGrid(self.table_frame, self.create_range_cell,
+            grid_options={"padx": 3, "pady": 3, "sticky": "nsew"})
+        self.update_table_colors()
 
         # Configure grid weights for dynamic resizing
         for i in range(13):
@@ -349,24 +533,38 @@ class OpeningRanges(ctk.CTkFrame):
         for j in range(13):
             self.table_frame.columnconfigure(j, weight=1)
 
+    def create_range_cell(self, master, row, column):
+        # Create a clickable cell
+        cell_text = self.tableTexts[row][column]
+        return ctk.CTkButton(
+            master,
+            text=cell_text,
+            command=lambda c=cell_text: self.on_cell_click(c),
+            corner_radius=5
+        )
+
     def update_table_colors(self):
-        """Update colors for all buttons"""
-        for cell_text, button in self.cell_buttons.items():
-            if cell_text in self.opening_ranges[self.active_pos]:
-                base_color = "brown"
-            else:
-                base_color = ctk_default_blue
+        """Update colors of buttons whose color changed"""
+        rows = []
+        for row in self.tableTexts:
+            colors = []
+            for cell_text in row:
+                if cell_text in self.opening_ranges[self.active_pos]:
+                    base_color = "brown"
+                else:
+                    base_color = ctk_default_blue
 
-            # Darken if selected
-            if cell_text in self.selected_cells:
-                if base_color == "brown":
-                    color = "#5c1919"
+                # Darken if selected
+                if cell_text in self.selected_cells:
+                    if base_color == "brown":
+                        color = "#5c1919"
+                    else:
+                        color = "#0c2645"
                 else:
-                    color = "#0c2645"
-            else:
-                color = base_color
-            
-            button.configure(fg_color=color)
+                    color = base_color
+                colors.append({"fg_color": color})
+            rows.append(colors)
+        return self.range_grid.render(rows)
 
     def on_cell_click(self, cell_text):
         """Handles cell click event."""
@@ -412,47 +610,160 @@ class OpeningRanges(ctk.CTkFrame):
         """Update the selected cells display"""
         self.selected_cells_var.set(f"Selected cells: {self.selected_cells}")
 
-    def refresh_data(self):
-        # Check latest table from hand_history
+    def refresh_all_tables(self):
+        # Parse every table written lately, or the latest table if none is active
         files = [os.path.join(history_path, f) for f in os.listdir(history_path) if os.path.isfile(os.path.join(history_path, f))]
-        if files:
-            latest_file = max(files, key=os.path.getmtime)
-
-            # Very smart way to check if file name is tournament
-            is_tournament = 0
-            if " T" in latest_file and " No Limit Hold'em $" in latest_file and " + " in latest_file:
-                is_tournament = 1
-            # Parse data from latest table
-            if latest_file:
-                table_stats, last_hand_stats, _ = handle_txt_file(latest_file, ps_username, is_tournament)
+        file_times = {f: os.path.getmtime(f) for f in files}
+        active = [f for f in files if time.time() - file_times[f] < active_table_period]
+        if not active and files:
+            active = [max(files, key=file_times.get)]
+        for f in sorted(active, key=file_times.get):
+            self.mark_table_changed(f, file_times[f])
+        self.refresh_data()
+
+    def mark_table_changed(self, table_file, changed_time=None):
+        self.table_activity[table_file] = changed_time or time.time()
+        if table_file not in self.dirty_tables:
+            self.dirty_tables.append(table_file)
+
+    def refresh_data(self):
+        # Parse changed tables in background, if previous refresh is still running parse again when it is done
+        if self.ingest_worker and self.ingest_worker.is_alive():
+            self.refresh_pending = True
+            return
+        if not self.dirty_tables:
+            return
+        tables, self.dirty_tables = self.dirty_tables, []
+        # Worker gets its own dict of parsers, so forget_table can drop parsers while it runs
+        parsers = {f: self.table_parsers[f] for f in tables if f in self.table_parsers}
+        self.profiler = RefreshProfiler("HUD refresh", profile_settings["trace_memory"])
+        self.ingest_worker = IngestWorker(self.parse_tables, tables, parsers, profiler=self.profiler)
+        self.ingest_worker.start()
+        poll_ingest_worker(self, self.ingest_worker, lambda done, total: None, self.finish_refresh)
+
+    def on_history_change(self, changes):
+        for path, kind in changes.items():
+            if kind == DELETED:
+                # Parser and HUD of removed file are not needed anymore
+                self.forget_table(path)
+            else:
+                self.mark_table_changed(path)
+        self.refresh_data()
+
+    def forget_table(self, table_file):
+        self.table_parsers.pop(table_file, None)
+        self.table_results.pop(table_file, None)
+        self.table_activity.pop(table_file, None)
+        if table_file in self.dirty_tables:
+            self.dirty_tables.remove(table_file)
+
+    def parse_tables(self, tables, parsers, progress=None, cancel_event=None, profiler=None):
+        """
+        Parse new hands of tables, run by background ingest worker. Every table reads at most table_parse_blocks
+        blocks, so a table with a long backlog can't delay others. Parsers of tables parsed before are given in
+        parsers, and parsers of new tables are added to it. Returns total stats of players seated in the last hand
+        of every parsed table from all hand histories, seats of the last hand, tables that still have lines to
+        parse and parsers.
+        """
+        results = {}
+        unfinished = []
+        # SQLite connection can only be used by the thread that opened it
+        with profile_stage(profiler, "hand store open"):
+            store = open_hand_store(ps_username)
+        try:
+            for table_file in tables:
+                if cancel_event is not None and cancel_event.is_set():
+                    unfinished.append(table_file)
+                    continue
+                if not os.path.isfile(table_file):
+                    continue
+                if table_file not in parsers:
+                    # Very smart way to check if file name is tournament
+                    is_tournament = 0
+                    if " T" in table_file and " No Limit Hold'em $" in table_file and " + " in table_file:
+                        is_tournament = 1
+                    parsers[table_file] = HandHistoryParser(table_file, ps_username, is_tournament)
+                parser = parsers[table_file]
+                parser.profiler = profiler
+                try:
+                    parser.parse_new_lines(store, max_blocks=table_parse_blocks)
+                finally:
+                    parser.profiler = None
+                if parser.more_data:
+                    unfinished.append(table_file)
+                with profile_stage(profiler, "stats merge"):
+                    player_stats_cache.invalidate(parser.saved_players, parser.tournament_mode)
+                    seated_players = [seat.usr for seat in parser.temp_stats.values()]
+                    table_stats = player_stats_cache.get_stats(store, seated_players, parser.tournament_mode)
                 if table_stats:
-                    self.display_hud(table_stats, last_hand_stats)
-    
-    def display_hud(self, long_stats, short_stats):
-        """Displays the provided JSON data in the hud_frame.""" 
-        # Clear any existing widgets in the frame
-        for widget in self.hud_frame.winfo_children():
-            widget.destroy()
+                    results[table_file] = (table_stats, parser.temp_stats)
+        finally:
+            store.close()
+        if profiler is not None:
+            profiler.count("tables", len(tables))
+        return results, unfinished, parsers
+
+    def finish_refresh(self, event, result):
+        """Update HUD of parsed tables when background parsing is finished"""
+        if event == "done" and result:
+            results, unfinished, parsers = result
+            self.controller.hands_saved()
+            # Results and parsers of tables removed while they were parsed are not kept
+            self.table_results.update({f: r for f, r in results.items() if f in self.table_activity})
+            self.table_parsers.update({f: p for f, p in parsers.items() if f in self.table_activity})
+            # Tables with lines left go after tables that changed meanwhile
+            for table_file in unfinished:
+                if table_file not in self.dirty_tables:
+                    self.dirty_tables.append(table_file)
+            # Tables that have not been played for a while are dropped from selector
+            for table_file in list(self.table_activity):
+                if time.time() - self.table_activity[table_file] > active_table_period and table_file not in self.dirty_tables:
+                    self.forget_table(table_file)
+            with self.profiler.stage("widget rebuild"):
+                self.update_table_selector()
+                self.profiler.count("changed cells", self.show_selected_table(results))
+        elif event == "error":
+            print("HUD refresh failed:", result)
+        save_profile(self.profiler)
+        if self.refresh_pending or self.dirty_tables:
+            self.refresh_pending = False
+            self.refresh_data()
+
+    def update_table_selector(self):
+        self.table_names = {}
+        for table_file in sorted(self.table_results, key=lambda f: self.table_activity.get(f, 0), reverse=True):
+            self.table_names[table_display_name(table_file)] = table_file
+        self.table_selector.configure(values=[latest_table_option] + list(self.table_names))
+        if self.table_selector.get() not in self.table_names:
+            self.table_selector.set(latest_table_option)
+
+    def show_selected_table(self, updated_tables=None):
+        """
+        Show HUD of selected table, HUD is updated only if table changed or got new hands.
+        Returns number of HUD cells that changed.
+        """
+        selected = self.table_selector.get()
+        if selected == latest_table_option:
+            active = [f for f in self.table_results if f in self.table_activity]
+            table_file = max(active, key=self.table_activity.get) if active else None
+        else:
+            table_file = self.table_names.get(selected)
+        if table_file is None or table_file not in self.table_results:
+            return 0
+        if table_file != self.shown_table or updated_tables is None or table_file in updated_tables:
+            self.shown_table = table_file
+            return self.display_hud(*self.table_results[table_file])
+        return 0
 
+    def display_hud(self, long_stats, short_stats):
+        """Displays the provided JSON data in the hud_frame, labels of previous refresh are reused"""
         # Create a table displaying stats for each player
-        header = ["Player", "VPIP", "PFR", "3Bet", "Fold vs Btn", "Fold vs C-bet", "Hands"]
-        row, col = 0, 0
-        for h in header:
-            cell_text = f"{h}"
-
-            cell = ctk.CTkLabel(
-                self.hud_frame,
-                text=f"{cell_text}",
-                corner_radius=0,
-                font=("Arial", 14)
-            )
-            cell.grid(row=row, column=col, padx=5, pady=3, sticky="nsew")
-            col += 1
+        rows = [["Player"] + [stat.label for stat in stat_registry] + ["Hands"]]
 
         # Display players in a descending order based on played hands
         active_players = []
         for seat in short_stats:
-            player = short_stats[seat]["usr"]
+            player = short_stats[seat].usr
             played_hands = long_stats[player]["played_hands"]["value"]
             active_players.append((player, played_hands))
 
@@ -460,27 +771,139 @@ class OpeningRanges(ctk.CTkFrame):
         active_players.sort(key=lambda x: x[1], reverse=True)
 
         for player, _ in active_players:
-            row += 1
-            col = 0
-            cell = ctk.CTkLabel(
-                self.hud_frame,
-                text=f"{player}",
-                corner_radius=0,
-                font=("Arial", 14, "bold")
-            )
-            cell.grid(row=row, column=col, padx=5, pady=3, sticky="nsew")
+            row = [f"{player}"]
             for stat in long_stats[player]:
                 if stat != "profit":
-                    col += 1
-                    cell_text = f"{long_stats[player][stat]['value']}"
+                    row.append(f"{long_stats[player][stat]['value']}")
+            rows.append(row)
+        return self.hud_grid.render(rows)
+
+    def create_hud_cell(self, master, row, column):
+        # Player names are bold
+        font = ("Arial", 14, "bold") if row > 0 and column == 0 else ("Arial", 14)
+        return ctk.CTkLabel(master, text="", corner_radius=0, font=font)
+
+# Symbols and colors of card suits, "?" is unknown card
+card_suit_symbols = {'h': '♥', 'd': '♦', 'c': '♣', 's': '♠', '?': '?'}
+card_suit_colors = {'h': '#ff0000', 'd': '#f94449', 'c': '#000020', 's': '#000000', '?': '#111111'}
+
+# Hand DB can show only hands where hero made at least this hand, values are minimum values of hand_evaluator
+hand_strength_options = {"Any hand": None}
+hand_strength_options.update({f"{category} or better": category_value(category) for category in hand_categories[1:]})
+
+# Text colors of actions in hand DB
+action_text_colors = {
+    ActionType.RAISE: '#ce2029',
+    ActionType.BET: '#ff4d00',
+    ActionType.CALL: '#e4cd05',
+    ActionType.POST: 'green',
+}
+
+def card_cells(cards_list):
+    """
+    Function that returns cell options of cards, like [{"text": "A\n♥", "fg_color": "#ff0000"}] from ["Ah"]
+    """
+    cells = []
+    for card in cards_list:
+        rank, suit = card[:-1], card[-1]
+        cells.append({"text": f"{rank}\n{card_suit_symbols[suit]}", "fg_color": card_suit_colors[suit]})
+    return cells
+
+def create_card_cell(master, row, column):
+    return ctk.CTkLabel(
+        master,
+        text="",
+        font=("Arial", 22, "bold"),
+        width=50,
+        height=70,
+        corner_radius=5,
+        text_color="white"
+    )
+
+def create_cards_grid(master):
+    # Cards are in one row of a grey frame
+    cards_frame = ctk.CTkFrame(master, fg_color=ctk_default_grey)
+    return cards_frame, CellGrid(cards_frame, create_card_cell, grid_options={"padx": 5})
+
+def create_action_cell(master, row, column):
+    cell = ctk.CTkFrame(master)
+    cell.default_color = cell.cget("fg_color")
+    cell.player_label = ctk.CTkLabel(cell, text="", font=("Arial", 12, "normal"))
+    cell.player_label.pack(anchor="nw", padx=10, pady=0)
+    cell.action_label = ctk.CTkLabel(cell, text="", font=("Arial", 14, "bold"))
+    cell.action_label.pack(anchor="w", padx=10, pady=0)
+    return cell
+
+def update_action_cell(cell, old, new):
+    """
+    Function that updates changed parts of action cell, action label is hidden when action has no second line
+    """
+    if old.get("fg_color", cell.default_color) != new["fg_color"]:
+        cell.configure(fg_color=new["fg_color"] or cell.default_color)
+    configure_changed(cell.player_label, {"text": old.get("player"), "text_color": old.get("text_color")},
+        {"text": new["player"], "text_color": new["text_color"]})
+    # New cell has action label packed
+    shown = old.get("action") is not None or not old
+    if new["action"] is None:
+        if shown:
+            cell.action_label.pack_forget()
+        return
+    if not shown:
+        cell.action_label.pack(anchor="w", padx=10, pady=0)
+    configure_changed(cell.action_label, {"text": old.get("action"), "text_color": old.get("text_color")},
+        {"text": new["action"], "text_color": new["text_color"]})
+
+def create_player_cell(master, row, column):
+    cell = ctk.CTkFrame(master)
+    cell.player_label = ctk.CTkLabel(cell, text="", font=("Arial", 16, "bold"), text_color="white")
+    cell.player_label.pack(side="top", padx=5, pady=5)
+    cell.cards_frame, cell.cards = create_cards_grid(cell)
+    cell.cards_frame.pack(side="top", padx=5, pady=5)
+    cell.hand_label = ctk.CTkLabel(cell, text="", font=("Arial", 13), text_color="white")
+    cell.hand_label.pack(side="top", padx=5, pady=0)
+    cell.profit_label = ctk.CTkLabel(cell, text="", font=("Arial", 16, "bold"))
+    cell.profit_label.pack(side="top", padx=10, pady=5)
+    return cell
+
+def update_player_cell(cell, old, new):
+    configure_changed(cell.player_label, {"text": old.get("player")}, {"text": new["player"]})
+    cell.cards.render([new["cards"]])
+    configure_changed(cell.hand_label, {"text": old.get("hand")}, {"text": new["hand"]})
+    configure_changed(cell.profit_label, {"text": old.get("profit"), "text_color": old.get("profit_color")},
+        {"text": new["profit"], "text_color": new["profit_color"]})
+
+class StreetView:
+    """
+    Widgets of one street in hand DB, kept between selected hands. Board, actions and pot are hidden
+    for streets the hand didn't reach.
+    """
+    def __init__(self, frame, street):
+        self.frame = frame
+        ctk.CTkLabel(frame, text=f"- - - - - -   {street.capitalize()}   - - - - - -", font=("Arial", 19, "bold")).pack(anchor="n", padx=10, pady=2)
+        self.board_frame, self.board = create_cards_grid(frame)
+        self.actions_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        self.actions_frame.pack(side="top", fill="x")
+        self.actions_frame.columnconfigure(0, weight=1)
+        self.actions = CellGrid(self.actions_frame, create_action_cell, update_action_cell,
+            grid_options={"padx": 10, "pady": 2, "sticky": "ew"})
+        self.pot_label = ctk.CTkLabel(frame, text="", font=("Arial", 14, "bold"), text_color="white")
+
+    def show(self, board, actions, pot_text):
+        """Show board cards, rows of action cell options and pot, returns number of changed cells"""
+        changed = self.board.render([card_cells(board)])
+        if board:
+            self.board_frame.pack(side="top", padx=5, pady=5, before=self.actions_frame)
+        else:
+            self.board_frame.pack_forget()
+        changed += self.actions.render(actions)
+        self.pot_label.configure(text=pot_text)
+        self.pot_label.pack(side="bottom", anchor="w", padx=10, pady=5)
+        return changed
 
-                    cell = ctk.CTkLabel(
-                        self.hud_frame,
-                        text=f"{cell_text}",
-                        corner_radius=0,
-                        font=("Arial", 14)
-                    )
-                    cell.grid(row=row, column=col, padx=5, pady=3, sticky="nsew")
+    def hide(self):
+        self.board_frame.pack_forget()
+        self.pot_label.pack_forget()
+        return self.actions.render([])
 
 class HandDBScreen(ctk.CTkFrame):
     def __init__(self, parent, controller):
@@ -495,8 +918,19 @@ class HandDBScreen(ctk.CTkFrame):
             "showdown": 0
         }
 
-        # Load hands data from JSON files
-        self.hands_data = self.load_hands_data()
+        # Hands are loaded from hand store only when they are displayed. Listbox shows one page of hand keys,
+        # which is taken from a block of keys read from the store, so scrolling does not query every line.
+        # Store is opened in background, list stays empty until it is open.
+        self.store = None
+        self.page_size = 38
+        self.list_offset = 0
+        self.hand_total = 0
+        self.key_block_start = 0
+        self.key_block = []
+        self.selected_hand_key = None
+        self.min_hand_value = None
+        self.store_worker = IngestWorker(self.open_store, self.active_filter_names(), self.min_hand_value)
+        self.store_worker.start()
 
         # Create frames for displaying data
         self.selection_frame = ctk.CTkFrame(self, width=50)
@@ -531,20 +965,30 @@ class HandDBScreen(ctk.CTkFrame):
         self.showdown_checkbox = ctk.CTkCheckBox(self.checkbox_frame, text="Showdown", command=self.update_listbox)
         self.showdown_checkbox.grid(row=1, column=1, padx=3, pady=3, sticky="nsew")
 
+        # Made hand of hero on the last street
+        self.hand_strength_menu = ctk.CTkOptionMenu(self.checkbox_frame, values=list(hand_strength_options), command=lambda value: self.update_listbox())
+        self.hand_strength_menu.grid(row=2, column=0, columnspan=2, padx=3, pady=3, sticky="nsew")
+
         # Create listbox for selecting hands with a scrollbar
         self.hand_listbox = Listbox(self.listbox_frame, bg=ctk_default_grey, fg="white", activestyle='none',
             selectbackground=ctk_default_blue, selectforeground="white", height=38, font=("Arial", 11))
         self.hand_listbox.pack(side="left", fill="both")
 
-        self.scrollbar = Scrollbar(self.listbox_frame, command=self.hand_listbox.yview)
+        # Scrollbar and scrolling events move the page instead of the listbox view
+        self.scrollbar = Scrollbar(self.listbox_frame, command=self.scroll_list)
         self.scrollbar.pack(side="right", fill="y")
 
-        self.hand_listbox.config(yscrollcommand=self.scrollbar.set)
         self.hand_listbox.bind("<<ListboxSelect>>", self.on_hand_select)
+        self.hand_listbox.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.hand_listbox.bind("<Button-4>", self.on_mouse_wheel)
+        self.hand_listbox.bind("<Button-5>", self.on_mouse_wheel)
+        self.hand_listbox.bind("<Up>", lambda event: self.on_arrow_key(-1))
+        self.hand_listbox.bind("<Down>", lambda event: self.on_arrow_key(1))
+        self.hand_listbox.bind("<Prior>", lambda event: self.scroll_list("scroll", -1, "pages"))
+        self.hand_listbox.bind("<Next>", lambda event: self.scroll_list("scroll", 1, "pages"))
 
-        # Populate listbox with hand IDs
-        for hand_id in self.hands_data.keys():
-            self.hand_listbox.insert("end", hand_id)
+        # Populate listbox with the first page of hand keys when store is open
+        poll_ingest_worker(self, self.store_worker, lambda done, total: None, self.finish_store_open)
 
         # Create frames for each stage of the hand
         self.preflop_frame = ctk.CTkFrame(self.stages_frame)
@@ -559,53 +1003,134 @@ class HandDBScreen(ctk.CTkFrame):
         self.river_frame = ctk.CTkFrame(self.stages_frame)
         self.river_frame.pack(side="left", fill="both", expand=True, padx=5, pady=5)
 
+        # Widgets of streets and players are created for the first hand and reused for the next ones
+        stage_frames = [self.preflop_frame, self.flop_frame, self.turn_frame, self.river_frame]
+        self.street_views = {street: StreetView(frame, street) for street, frame in zip(hand_streets, stage_frames)}
+        self.summary_grid = CellGrid(self.summary_frame, create_player_cell, update_player_cell,
+            grid_options={"padx": 5, "pady": 5, "sticky": "ew"})
+        self.summary_columns = 0
+
+    def active_filter_names(self):
+        return [f for f in self.active_filters if self.active_filters[f] == 1]
+
+    def open_store(self, filters, min_hand_value=None, progress=None, cancel_event=None):
+        """
+        Open hand store in background, old JSON hand DB is imported on first open. Returns number of hands
+        and first block of keys matching filters.
+        """
+        store = open_hand_store(ps_username)
+        try:
+            return (store.count_hands(filters, min_hand_value=min_hand_value),
+                store.hand_keys_page(0, hand_key_block_size, filters, min_hand_value=min_hand_value))
+        finally:
+            store.close()
+
+    def finish_store_open(self, event, result):
+        if event != "done":
+            self.hand_listbox.insert("end", "Hand DB failed to open")
+            print("Hand DB failed to open:", result)
+            return
+        # SQLite connection can only be used by the thread that opened it, store is ready so opening is fast
+        self.store = HandStore()
+        hand_total, key_block = result
+        if self.store_worker.args == (self.active_filter_names(), self.min_hand_value):
+            self.hand_total = hand_total
+            self.key_block = key_block
+        else:
+            # Filters changed while store was opened
+            self.load_hands_data()
+        self.show_page()
+
     def load_hands_data(self):
-        hands_data = {}
-        hands_db_path = "./hands_db"
-        for file_name in os.listdir(hands_db_path):
-            if file_name.endswith("_db.json"):
-                data = load_from_json(source=os.path.join(hands_db_path, file_name))
-                hands_data.update(data)
-        # Filter hands to be displayed
-        for filter in self.active_filters:
-            # Update list every iteration
-            hand_ids = list(hands_data.keys())
-            if filter == "won" and self.active_filters["won"] == 1:
-                for hand in hand_ids:
-                    profit = hand.split("_")[-1]
-                    if float(profit) <= 0:
-                        hands_data.pop(hand)
-            elif filter == "lost" and self.active_filters["lost"] == 1:
-                for hand in hand_ids:
-                    profit = hand.split("_")[-1]
-                    if float(profit) >= 0:
-                        hands_data.pop(hand)
-            elif filter == "post-flop" and self.active_filters["post-flop"] == 1:
-                for hand in hand_ids:
-                    hero_found = 0
-                    if "flop" in hands_data[hand]:
-                        for action in hands_data[hand]["flop"]:
-                            if ps_username in action:
-                                hero_found = 1
-                                break
-                    if not hero_found: hands_data.pop(hand)
-            elif filter == "showdown" and self.active_filters["showdown"] == 1:
-                for hand in hand_ids:
-                    hero_folded = 1
-                    for stage in ["flop", "turn", "river"]:
-                        if stage in hands_data[hand]:
-                            for action in hands_data[hand][stage]:
-                                if ps_username in action:
-                                    hero_folded = 0
-                                    if "folds" in action:
-                                        hero_folded = 1
-                                        break
-                        else:
-                            hero_folded = 1
-                            break
-                    if hero_folded: hands_data.pop(hand)
-
-        return hands_data
+        if self.store is None:
+            return
+        # Filters are evaluated by hand store from precomputed columns of every hand, only the count is read here
+        self.hand_total = self.store.count_hands(self.active_filter_names(), min_hand_value=self.min_hand_value)
+        self.key_block_start = 0
+        self.key_block = []
+        self.list_offset = 0
+
+    def refresh_hands(self):
+        """Count hands again and forget cached keys, so hands saved after the list was read are shown"""
+        if self.store is None:
+            return
+        self.hand_total = self.store.count_hands(self.active_filter_names(), min_hand_value=self.min_hand_value)
+        self.key_block_start = 0
+        self.key_block = []
+        self.list_offset = max(0, min(self.list_offset, self.hand_total - self.page_size))
+        self.show_page()
+
+    def keys_at(self, offset, count):
+        """Return hand keys of rows offset..offset+count, block of keys around them is read from store if needed"""
+        block_end = self.key_block_start + len(self.key_block)
+        half = hand_key_block_size // 2
+        filters = self.active_filter_names()
+        if self.key_block and self.key_block_start <= offset and block_end < offset + count <= block_end + half:
+            # Scrolling down past the block reads the next keys after the last key and keeps half of the block
+            kept = self.key_block[-half:]
+            self.key_block = kept + self.store.hand_keys_from(self.key_block[-1], half, filters, min_hand_value=self.min_hand_value)
+            self.key_block_start = block_end - len(kept)
+        elif self.key_block and self.key_block_start - half <= offset < self.key_block_start:
+            keys = self.store.hand_keys_from(self.key_block[0], half, filters, min_hand_value=self.min_hand_value, backward=True)
+            self.key_block = keys + self.key_block[:half]
+            self.key_block_start -= len(keys)
+        block_end = self.key_block_start + len(self.key_block)
+        if offset < self.key_block_start or (offset + count > block_end and block_end < self.hand_total):
+            # Jumps read keys also before the page, so scrolling back does not need a new query right away
+            self.key_block_start = max(0, offset - (hand_key_block_size - count) // 2)
+            self.key_block = self.store.hand_keys_page(self.key_block_start, hand_key_block_size, filters,
+                min_hand_value=self.min_hand_value)
+        start = offset - self.key_block_start
+        return self.key_block[start:start + count]
+
+    def show_page(self):
+        # Fill listbox with keys of the current page and move scrollbar to match it
+        keys = self.keys_at(self.list_offset, self.page_size)
+        self.hand_listbox.delete(0, "end")
+        for hand_key in keys:
+            self.hand_listbox.insert("end", hand_key)
+        if self.hand_total:
+            self.scrollbar.set(self.list_offset / self.hand_total, (self.list_offset + len(keys)) / self.hand_total)
+        else:
+            self.scrollbar.set(0, 1)
+        # Keep selected hand highlighted when it is on the page
+        if self.selected_hand_key in keys:
+            self.hand_listbox.selection_set(keys.index(self.selected_hand_key))
+
+    def set_list_offset(self, offset):
+        offset = max(0, min(int(offset), self.hand_total - self.page_size))
+        if offset != self.list_offset:
+            self.list_offset = offset
+            self.show_page()
+
+    def scroll_list(self, command, *args):
+        # Same commands as Scrollbar sends to yview: ("moveto", fraction) or ("scroll", n, "units"/"pages")
+        if command == "moveto":
+            self.set_list_offset(float(args[0]) * self.hand_total)
+        elif command == "scroll":
+            step = self.page_size if args[1] == "pages" else 1
+            self.set_list_offset(self.list_offset + int(args[0]) * step)
+        return "break"
+
+    def on_mouse_wheel(self, event):
+        # Linux sends wheel as buttons 4 and 5, Windows and macOS as delta
+        if event.num == 4 or event.delta > 0:
+            return self.scroll_list("scroll", -3, "units")
+        return self.scroll_list("scroll", 3, "units")
+
+    def on_arrow_key(self, step):
+        # Moving selection past first or last row of the page scrolls the page by one row
+        selection = self.hand_listbox.curselection()
+        row = selection[0] + step if selection else 0
+        if row < 0 or row >= self.hand_listbox.size():
+            self.set_list_offset(self.list_offset + step)
+            row = min(max(row, 0), self.hand_listbox.size() - 1)
+        if row >= 0:
+            self.hand_listbox.selection_clear(0, "end")
+            self.hand_listbox.selection_set(row)
+            self.hand_listbox.activate(row)
+            self.hand_listbox.event_generate("<<ListboxSelect>>")
+        return "break"
 
     def update_listbox(self):
         # Update active filters based on checkboxes
@@ -613,187 +1138,145 @@ class HandDBScreen(ctk.CTkFrame):
         self.active_filters["lost"] = self.lost_checkbox.get()
         self.active_filters["post-flop"] = self.post_flop_checkbox.get()
         self.active_filters["showdown"] = self.showdown_checkbox.get()
+        self.min_hand_value = hand_strength_options[self.hand_strength_menu.get()]
 
         # Update listbox data
-        self.hand_listbox.delete(0, "end")
-        self.hands_data = self.load_hands_data()
-        for hand_id in self.hands_data.keys():
-            self.hand_listbox.insert("end", hand_id)
+        self.load_hands_data()
+        self.show_page()
 
     def on_hand_select(self, event):
         # Get selected hand ID
         selection = event.widget.curselection()
         if selection:
+            if self.store is None:
+                return
             hand_id = event.widget.get(selection[0])
-            hand_data = self.hands_data[hand_id]
-            self.display_hand_data(hand_data)
-
-    def display_hand_data(self, hand_data):
-        # Clear existing data in frames
-        for frame in [self.preflop_frame, self.flop_frame, self.turn_frame, self.river_frame, self.summary_frame]:
-            for widget in frame.winfo_children():
-                widget.destroy()
-
-        # Display data for each stage
-        stages = {
-            "pre-flop": self.preflop_frame,
-            "flop": self.flop_frame,
-            "turn": self.turn_frame,
-            "river": self.river_frame,
-            "summary": self.summary_frame
-        }
+            # Only the selected hand is read from the store
+            self.selected_hand_key = hand_id
+            hand = self.store.load_hand(hand_id)
+            if hand:
+                self.display_hand_data(hand)
+
+    def display_hand_data(self, hand):
+        # Widgets of the previous hand are reused, returns number of changed cells
+        changed = 0
         pot_size = 0.0
-        for s in stages.keys():
-            title = f"- - - - - -   {s.capitalize()}   - - - - - -"
-            if s in hand_data:
-                if s != "summary":
-                    pot_size = self.display_stage_data(stages[s], title, hand_data[s], pot_size)
-                else:
-                    self.display_summary_data(stages[s], hand_data[s])
+        for i, s in enumerate(hand_streets):
+            if i < hand.street_count():
+                pot_size, street_changed = self.display_stage_data(self.street_views[s], hand, s, pot_size)
+                changed += street_changed
             else:
                 # Display empty box with title
-                ctk.CTkLabel(stages[s], text=f"{title}", font=("Arial", 19, "bold")).pack(anchor="n", padx=10, pady=2)
-
-    def display_stage_data(self, frame, stage_name, stage_data, pot_size=0.0):
-        ctk.CTkLabel(frame, text=f"{stage_name}", font=("Arial", 19, "bold")).pack(anchor="n", padx=10, pady=2)
-        for action in stage_data:
-            if action.startswith("board:"):
-                # Extract the board cards
-                board_cards = action.split("board: ")[1].split()
-                self.text_to_cards(frame, board_cards)
-            elif action.startswith("pot size:"):
-                amount = float(findall(r"\$(\d+\.\d+)", action)[-1])
-                pot_size += amount
-            else:
-                # Set text color and font options based on action type
-                box_color = None
-                if ps_username in action:
-                    action = action.replace(ps_username, "HERO")
-                    box_color = "#383838"
-                txt_color_options = {
-                    'raises': '#ce2029',
-                    'bets': '#ff4d00',
-                    'calls': '#e4cd05',
-                    'posts': 'green',
-                }
-                txt_color = "white"
-                for word in txt_color_options.keys():
-                    if word in action:
-                        txt_color = txt_color_options[word]
-
-                # Split action to two parts: Username, action
-                usr, act = action.split(":")
-
-                # If action is check or fold, display in a single line
-                if "folds" in act or "checks" in act:
-                    usr = usr + act
-                    act = None
-
-                action_frame = ctk.CTkFrame(frame, fg_color=box_color)
-                action_frame.pack(anchor="w", padx=10, pady=2, fill="x")
-
-                usr_label = ctk.CTkLabel(
-                    action_frame,
-                    text=usr.strip(),
-                    font=("Arial", 12, "normal"),
-                    text_color=txt_color
-                )
-                usr_label.pack(anchor="nw", padx=10, pady=0)
-
-                if act:
-                    act_label = ctk.CTkLabel(
-                        action_frame,
-                        text=act.strip(),
-                        font=("Arial", 14, "bold"),
-                        text_color=txt_color
-                    )
-                    act_label.pack(anchor="w", padx=10, pady=0)
+                changed += self.street_views[s].hide()
+        return changed + self.display_summary_data(hand)
+
+    def display_stage_data(self, view, hand, street, pot_size=0.0):
+        i = hand_streets.index(street)
+        board = hand.boards[i].split() if hand.boards[i] is not None else []
+        if hand.pot_sizes[i] is not None:
+            pot_size += hand.pot_sizes[i]
+        rows = []
+        for action in hand.actions(street):
+            # Set text color and box color based on action type and player
+            box_color = None
+            usr = action.player
+            if usr == ps_username:
+                usr = "HERO"
+                box_color = "#383838"
+            txt_color = action_text_colors.get(action.code, "white")
+            act = action.describe(hand.tournament)
+
+            # If action is check or fold, display in a single line
+            if action.code == ActionType.FOLD or action.code == ActionType.CHECK:
+                usr = f"{usr} {act}"
+                act = None
+            rows.append([{"player": usr, "action": act, "text_color": txt_color, "fg_color": box_color}])
         # Display final pot size for the stage
-        pot_label = ctk.CTkLabel(
-            frame,
-            text=f"Pot size: ${pot_size:.2f}",
-            font=("Arial", 14, "bold"),
-            text_color="white"
-        )
-        pot_label.pack(side="bottom", anchor="w", padx=10, pady=5)
-        return pot_size
-
-    def display_summary_data(self, frame, stage_data):
-        for player in stage_data:
-            player_frame = ctk.CTkFrame(frame)
-            player_frame.pack(side="left", fill="x", expand=True, padx=5, pady=5)
-            
+        changed = view.show(board, rows, f"Pot size: ${pot_size:.2f}")
+        return pot_size, changed
+
+    def display_summary_data(self, hand):
+        cells = []
+        players = list(hand.players())
+        # Made hands of players whose cards are known, evaluated together
+        board = hand.board_cards()
+        hand_values = evaluate_many([player.cards.split() + board for player in players])
+        for player, hand_value in zip(players, hand_values):
             # Display player name and position
-            player_txt = player
-            if player == ps_username:
+            player_txt = player.name
+            if player.name == ps_username:
                 player_txt = "HERO"
-            position = f"{stage_data[player]['position']}".upper()
-            player_label = ctk.CTkLabel(
-                player_frame,
-                text=f"{position} - {player_txt}",
-                font=("Arial", 16, "bold"),
-                text_color="white"
-            )
-            player_label.pack(side="top", padx=5, pady=5)
-
-            # Display player cards
-            self.text_to_cards(player_frame, stage_data[player]['cards'].split())
+            position = f"{player.position}".upper()
 
             # Display player profit
-            amount = float(stage_data[player]['profit'])
+            amount = float(player.profit)
             profit_color = "white"
             if amount > 0:
                 profit_color = "#008000"
             elif amount < 0:
                 profit_color = "#ff0000"
-            profit_label = ctk.CTkLabel(
-                player_frame,
-                text=f"${stage_data[player]['profit']:.2f}",
-                font=("Arial", 16, "bold"),
-                text_color=profit_color
-            )
-            profit_label.pack(side="top", padx=10, pady=5)
-
-    def text_to_cards(self, frame, cards_list):
-        board_frame = ctk.CTkFrame(frame, fg_color=ctk_default_grey)
-        board_frame.pack(side="top", padx=5, pady=5)
-
-        for card in cards_list:
-            rank = card[:-1]
-            suit = card[-1]
-            suit_symbol = {
-                'h': '♥',
-                'd': '♦',
-                'c': '♣',
-                's': '♠',
-                '?': '?' # For unknown cards
-            }[suit]
-            suit_color = {
-                'h': '#ff0000',
-                'd': '#f94449',
-                'c': '#000020',
-                's': '#000000',
-                '?': '#111111' # For unknown cards
-            }[suit]
-            card_label = ctk.CTkLabel(
-                board_frame,
-                text=f"{rank}\n{suit_symbol}",
-                font=("Arial", 22, "bold"),
-                width=50,
-                height=70,
-                corner_radius=5,
-                fg_color=suit_color,
-                text_color="white"
-            )
-            card_label.pack(side="left", padx = 5)
+            cells.append({
+                "player": f"{position} - {player_txt}",
+                "cards": card_cells(player.cards.split()),
+                "hand": hand_label(hand_value) if hand_value is not None else "",
+                "profit": f"${player.profit:.2f}",
+                "profit_color": profit_color
+            })
+        changed = self.summary_grid.render([cells])
+        # Players share the width of summary, columns of hidden players take no space
+        self.summary_columns = max(self.summary_columns, len(cells))
+        for column in range(self.summary_columns):
+            self.summary_frame.columnconfigure(column, weight=1 if column < len(cells) else 0)
+        return changed
 
 class SettingsScreen(ctk.CTkFrame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
 
-        # Add content to the About screen
-        ctk.CTkLabel(self, text="Welcome to the Settings Screen!").pack(padx=10, pady=10)
+        # Diagnostics of the latest refreshes
+        ctk.CTkLabel(self, text="Diagnostics", font=("Arial", 24, "bold")).pack(padx=10, pady=10)
+
+        self.options_frame = ctk.CTkFrame(self)
+        self.options_frame.pack(side="top", pady=5)
+
+        self.profile_menu = ctk.CTkSegmentedButton(self.options_frame, values=["startup", "full refresh", "HUD refresh"], command=lambda value: self.show_profile())
+        self.profile_menu.set("full refresh")
+        self.profile_menu.grid(row=0, column=0, padx=5, pady=5)
+
+        self.update_button = ctk.CTkButton(self.options_frame, text="Update", command=self.show_profile)
+        self.update_button.grid(row=0, column=1, padx=5, pady=5)
+
+        self.export_button = ctk.CTkButton(self.options_frame, text="Export JSON", command=self.export_profiles)
+        self.export_button.grid(row=0, column=2, padx=5, pady=5)
+
+        # Tracing memory makes refreshes several times slower, so it is off by default
+        self.trace_memory_checkbox = ctk.CTkCheckBox(self.options_frame, text="Trace memory", command=self.toggle_memory_trace)
+        self.trace_memory_checkbox.grid(row=0, column=3, padx=5, pady=5)
+
+        self.profile_text = ctk.CTkTextbox(self, width=900, height=600, font=("Courier", 13))
+        self.profile_text.pack(side="top", padx=10, pady=5, fill="both", expand=True)
+
+        self.export_label = ctk.CTkLabel(self, text="", font=("Arial", 12))
+        self.export_label.pack(side="top", padx=10)
+
+        self.show_profile()
+
+    def show_profile(self):
+        """Show breakdown of the latest refresh selected in the menu"""
+        profile = get_profiles().get(self.profile_menu.get())
+        self.profile_text.configure(state="normal")
+        self.profile_text.delete("1.0", "end")
+        self.profile_text.insert("1.0", format_profile(profile) if profile else "No refresh profiled yet")
+        self.profile_text.configure(state="disabled")
+
+    def export_profiles(self):
+        # Save latest profile of every refresh
+        save_to_json(diagnostics_file, get_profiles())
+        self.export_label.configure(text=f"Saved to {diagnostics_file}")
+
+    def toggle_memory_trace(self):
+        profile_settings["trace_memory"] = bool(self.trace_memory_checkbox.get())
 
 if __name__ == "__main__":
     app = MainApp()
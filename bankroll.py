@@ -0,0 +1,208 @@
+"""
+Library for storing results of hero hands and preparing bankroll graph data of AceTracker.py with NumPy
+"""
+import json
+import os
+import numpy as np
+from hand_model import position_codes, big_blind_of
+
+def cumulative_profit(profits):
+    """
+    Function that returns cumulative profit after every hand as float array
+    """
+    return np.cumsum(np.asarray(profits, dtype=np.float64))
+
+def visible_range(length, x_min, x_max):
+    """
+    Function that returns start and stop indexes of points between x limits, including one point outside on both sides
+    """
+    start = max(0, int(np.floor(x_min)) - 1)
+    stop = min(length, int(np.ceil(x_max)) + 2)
+    return start, max(start, stop)
+
+def downsample_min_max(y, start, stop, width):
+    """
+    Function that returns x and y arrays for drawing y[start:stop] on width pixels. Points are split to width
+    buckets, and the lowest and highest point of every bucket are kept in their original order, so every spike
+    is still visible. Ranges with less than two points per pixel are returned as they are.
+    """
+    width = max(1, int(width))
+    count = stop - start
+    if count <= 2 * width:
+        x = np.arange(start, stop)
+        return x, y[start:stop]
+    bucket = -(-count // width)
+    full = count // bucket
+    values = y[start:start + full * bucket].reshape(full, bucket)
+    low = values.argmin(axis=1)
+    high = values.argmax(axis=1)
+    offsets = np.arange(full) * bucket + start
+    first = offsets + np.minimum(low, high)
+    second = offsets + np.maximum(low, high)
+    x = np.empty(2 * full, dtype=np.int64)
+    x[0::2] = first
+    x[1::2] = second
+    # First and last point and points of the last partial bucket are always drawn, so line reaches both edges
+    tail = start + full * bucket
+    if tail < stop:
+        rest = y[tail:stop]
+        x = np.concatenate([x, np.unique([tail + rest.argmin(), tail + rest.argmax(), stop - 1])])
+    elif x[-1] != stop - 1:
+        x = np.append(x, stop - 1)
+    if x[0] != start:
+        x = np.insert(x, 0, start)
+    return x, y[x]
+
+# Folder of bankroll store, every column is a raw binary file that only grows by appending
+BANKROLL_FOLDER = "./hud_data/bankroll"
+BANKROLL_VERSION = 2
+
+# Columns of the row saved for every cash game hand of hero, in the order of rows made by the parser.
+# Timestamp is start time written in hand history as seconds since 1970, 0 if not known.
+# Position is index in hand_model.position_names, -1 if not known.
+# EV profit is profit with the pot of an all-in hand shared by hero's equity, other hands have actual profit.
+bankroll_columns = {
+    "hand_id": np.int64,
+    "timestamp": np.int64,
+    "big_blind": np.float64,
+    "position": np.int8,
+    "profit": np.float64,
+    "pot": np.float64,
+    "all_in": np.bool_,
+    "ev_profit": np.float64
+}
+
+def empty_columns():
+    return {name: np.zeros(0, dtype) for name, dtype in bankroll_columns.items()}
+
+def columns_from_rows(rows):
+    """
+    Function that converts hero rows made by parser, hand id, date, stakes, position, profit, pot and all-in flag,
+    to dict of column arrays
+    """
+    if not rows:
+        return empty_columns()
+    hand_ids, dates, stakes, positions, profits, pots, all_ins = zip(*rows)
+    dates = np.array(dates, dtype="datetime64[s]")
+    timestamps = dates.astype(np.int64)
+    timestamps[np.isnat(dates)] = 0
+    return {
+        "hand_id": np.array(hand_ids, np.int64),
+        "timestamp": timestamps,
+        "big_blind": np.array([big_blind_of(s) for s in stakes], np.float64),
+        "position": np.array([position_codes.get(p, -1) for p in positions], np.int8),
+        "profit": np.array(profits, np.float64),
+        "pot": np.array(pots, np.float64),
+        "all_in": np.array(all_ins, np.bool_),
+        "ev_profit": np.array(profits, np.float64)
+    }
+
+def apply_all_in_ev(columns, spots, equities):
+    """
+    Function that sets EV profit of all-in hands from equity of hero. Spots are made by the parser, hand id,
+    cards, board, amount won by hero and whole pot won. Hero's expected share of the pot replaces the amount won.
+    """
+    adjustments = {hand_id: equities[hand_id] * pot - won for hand_id, _, _, won, pot in spots if hand_id in equities}
+    if not adjustments:
+        return columns
+    rows = np.flatnonzero(np.isin(columns["hand_id"], list(adjustments)))
+    for row in rows.tolist():
+        columns["ev_profit"][row] = columns["profit"][row] + adjustments[int(columns["hand_id"][row])]
+    return columns
+
+def concatenate_columns(parts):
+    """
+    Function that joins list of column dicts to one
+    """
+    parts = [part for part in parts if len(part["hand_id"])]
+    if not parts:
+        return empty_columns()
+    return {name: np.concatenate([part[name] for part in parts]) for name in bankroll_columns}
+
+class BankrollStore:
+    """
+    Append-only columnar store of hero results. Every column is a raw binary file in the folder, and number of
+    saved rows is kept in bankroll.json, which is written after the columns, so bytes of an interrupted append
+    are ignored and overwritten later. Rows are kept in order of timestamp, so new hands are normally just
+    appended, and only hands older than the latest saved hand cause the columns to be rewritten.
+    Columns returned by load are read-only memory maps, which must be released before rewriting on Windows.
+    """
+    def __init__(self, folder=BANKROLL_FOLDER):
+        self.folder = folder
+        self.meta_file = os.path.join(folder, "bankroll.json")
+        self.rows = 0
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file, "r") as source:
+                meta = json.load(source)
+            if meta.get("version") == BANKROLL_VERSION:
+                self.rows = meta["rows"]
+
+    def column_file(self, name):
+        return os.path.join(self.folder, f"{name}.bin")
+
+    def load(self):
+        """Return dict of column arrays mapped from files without copying, in order of timestamp"""
+        if self.rows == 0:
+            return empty_columns()
+        return {name: np.memmap(self.column_file(name), dtype, mode="r", shape=(self.rows,)) for name, dtype in bankroll_columns.items()}
+
+    def select(self, start_time=None, end_time=None, big_blind=None):
+        """
+        Return columns of hands played from start_time to before end_time, as seconds since 1970, and at
+        big_blind stakes if given. Time range is a view of the memory maps found with binary search.
+        """
+        columns = self.load()
+        timestamps = columns["timestamp"]
+        start = 0 if start_time is None else int(np.searchsorted(timestamps, start_time, "left"))
+        stop = len(timestamps) if end_time is None else int(np.searchsorted(timestamps, end_time, "left"))
+        columns = {name: column[start:stop] for name, column in columns.items()}
+        if big_blind is not None:
+            mask = np.isclose(columns["big_blind"], big_blind)
+            columns = {name: column[mask] for name, column in columns.items()}
+        return columns
+
+    def append(self, columns):
+        """
+        Save rows of hands that are not in the store yet and return their number
+        """
+        # Hand seen again, for example when a changed file is parsed again, is saved only once
+        hand_ids, first = np.unique(columns["hand_id"], return_index=True)
+        if self.rows:
+            first = first[~np.isin(hand_ids, self.load()["hand_id"])]
+        if not len(first):
+            return 0
+        new = {name: columns[name][first] for name in bankroll_columns}
+        order = np.lexsort((new["hand_id"], new["timestamp"]))
+        new = {name: np.ascontiguousarray(column[order], bankroll_columns[name]) for name, column in new.items()}
+        os.makedirs(self.folder, exist_ok=True)
+        if self.rows and new["timestamp"][0] < self.load()["timestamp"][-1]:
+            self.rewrite(new)
+        else:
+            for name, column in new.items():
+                path = self.column_file(name)
+                mode = "r+b" if os.path.exists(path) else "wb"
+                with open(path, mode) as target:
+                    # Bytes after saved rows are left from an interrupted append
+                    target.truncate(self.rows * column.itemsize)
+                    target.seek(self.rows * column.itemsize)
+                    target.write(column.tobytes())
+            self.save_meta(self.rows + len(first))
+        return len(first)
+
+    def rewrite(self, new):
+        """Merge new rows to saved rows in order of timestamp and replace all column files"""
+        old = {name: np.array(column) for name, column in self.load().items()}
+        merged = concatenate_columns([old, new])
+        order = np.lexsort((merged["hand_id"], merged["timestamp"]))
+        for name, column in merged.items():
+            path = self.column_file(name)
+            column[order].tofile(path + ".tmp")
+            os.replace(path + ".tmp", path)
+        self.save_meta(len(order))
+
+    def save_meta(self, rows):
+        meta_tmp = self.meta_file + ".tmp"
+        with open(meta_tmp, "w") as target:
+            json.dump({"version": BANKROLL_VERSION, "rows": rows}, target)
+        os.replace(meta_tmp, self.meta_file)
+        self.rows = rows
@@ -0,0 +1,315 @@
+"""
+Benchmark for parsing hand histories of AceTracker.py. Synthetic files are written by hh_generator.py
+to a work folder, and hand store and stats files are kept there too, so real hud_data is never touched.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from hh_generator import HandHistoryGenerator, generate_history_folder
+from utility import handle_txt_file, HandHistoryParser
+from hand_store import HandStore
+from ingest import collect_hero_statistics
+from hand_evaluator import get_tables, evaluate_batch
+
+def count_lines(files):
+    """
+    Function that returns total number of lines in files
+    """
+    lines = 0
+    for f in files:
+        with open(f, "rb") as source:
+            lines += sum(block.count(b"\n") for block in iter(lambda: source.read(1 << 20), b""))
+    return lines
+
+def measure(function, trace_memory=True):
+    """
+    Function that runs function with tracemalloc for peak memory and then again for timing, so that latencies
+    collected by function come from the run without tracing. Returns result and seconds of the timed run,
+    and peak memory in bytes, or None if memory was not traced.
+    """
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    return result, seconds, peak
+
+def latency_summary(latencies):
+    """
+    Function that returns min, median, 95th percentile and max of latencies in milliseconds
+    """
+    latencies = sorted(latencies)
+    if not latencies:
+        return {}
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return {
+        "min_ms": round(latencies[0] * 1000, 2),
+        "median_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(p95 * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2)
+    }
+
+def stage_result(seconds, hands, lines, peak, latencies):
+    return {
+        "seconds": round(seconds, 3),
+        "hands_per_sec": round(hands / seconds) if seconds else None,
+        "lines_per_sec": round(lines / seconds) if seconds and lines else None,
+        "peak_memory_mb": round(peak / 2**20, 2) if peak is not None else None,
+        "latency": latency_summary(latencies)
+    }
+
+def bench_full_refresh(files, hero_name, hands, lines, workers, trace_memory):
+    """
+    Parse every file to an empty hand store, once file by file for per-file latency
+    and once as a full refresh through parse cache and worker pool.
+    """
+    latencies = []
+
+    def parse_files():
+        latencies.clear()
+        store = HandStore("./hands_db/parse.sqlite3")
+        try:
+            for f in files:
+                start = time.perf_counter()
+                handle_txt_file(f, hero_name, 1 if " T" in os.path.basename(f) else 0, store)
+                latencies.append(time.perf_counter() - start)
+        finally:
+            store.close()
+    _, seconds, peak = measure(parse_files, trace_memory)
+    results = {"parse files": stage_result(seconds, hands, lines, peak, latencies)}
+
+    cash_files = [f for f in files if "USD No Limit Hold'em" in f]
+    cash_hands = hands * len(cash_files) // len(files)
+
+    def full_refresh():
+        if os.path.exists("./hud_data/parse_cache.json"):
+            os.remove("./hud_data/parse_cache.json")
+        shutil.rmtree("./hud_data/bankroll", ignore_errors=True)
+        return collect_hero_statistics(cash_files, hero_name, workers)
+    # Memory of worker processes is not seen by tracemalloc, so only time is measured
+    _, seconds, _ = measure(full_refresh, trace_memory=False)
+    results["full refresh"] = stage_result(seconds, cash_hands, count_lines(cash_files), None, [])
+    return results
+
+def bench_hud_refresh(hero_name, refreshes, hands_per_refresh, seed, trace_memory):
+    """
+    Append hands to a live table file and parse new lines after every append, like HUD does
+    """
+    latencies = []
+    totals = {"hands": 0, "lines": 0}
+
+    def play_table():
+        latencies.clear()
+        totals["hands"] = totals["lines"] = 0
+        generator = HandHistoryGenerator(hero_name, seed=seed, table_name="Live")
+        path = os.path.join("./live", generator.file_name())
+        os.makedirs("./live", exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+        parser = HandHistoryParser(path, hero_name)
+        store = HandStore("./hands_db/live.sqlite3")
+        try:
+            with open(path, "w", encoding="utf-8") as target:
+                for _ in range(refreshes):
+                    for _ in range(hands_per_refresh):
+                        lines = generator.generate_hand()
+                        target.write("\n".join(lines) + "\n\n\n")
+                        totals["lines"] += len(lines) + 2
+                    target.flush()
+                    start = time.perf_counter()
+                    totals["hands"] += parser.parse_new_lines(store)
+                    parser.get_stats()
+                    latencies.append(time.perf_counter() - start)
+        finally:
+            store.close()
+    _, _, peak = measure(play_table, trace_memory)
+    return {"HUD refresh": stage_result(sum(latencies), totals["hands"], totals["lines"], peak, latencies)}
+
+def bench_hand_db_load(samples, seed, trace_memory):
+    """
+    Open hand store like hand DB screen does, read first page and all keys, and load random hands.
+    Hands per second is the number of hands loaded one by one.
+    """
+    latencies = []
+    counts = {"hands": 0}
+
+    def load_hands():
+        latencies.clear()
+        store = HandStore("./hands_db/parse.sqlite3")
+        try:
+            start = time.perf_counter()
+            store.count_hands()
+            store.hand_keys_page(0, 38)
+            latencies.append(time.perf_counter() - start)
+            keys = list(store.hand_keys())
+            sampled_keys = random.Random(seed).sample(keys, min(samples, len(keys)))
+            counts["hands"] = len(sampled_keys)
+            for key in sampled_keys:
+                start = time.perf_counter()
+                store.load_hand(key)
+                latencies.append(time.perf_counter() - start)
+        finally:
+            store.close()
+    _, seconds, peak = measure(load_hands, trace_memory)
+    results = stage_result(seconds, counts["hands"], 0, peak, latencies[1:])
+    results["first_page_ms"] = round(latencies[0] * 1000, 2)
+    return {"hand DB load": results}
+
+def bench_hand_evaluator(hands, seed, trace_memory):
+    """
+    Rank random 7 card hands in one batch. Lookup tables are built before the timed run, build time is reported separately.
+    """
+    start = time.perf_counter()
+    get_tables()
+    build_seconds = time.perf_counter() - start
+    rng = np.random.default_rng(seed)
+    # Seven different cards of every hand are the smallest of random numbers given to the cards
+    cards = np.concatenate([rng.random((min(100000, hands - i), 52)).argpartition(7, axis=1)[:, :7]
+        for i in range(0, hands, 100000)])
+    _, seconds, peak = measure(lambda: evaluate_batch(cards), trace_memory)
+    results = stage_result(seconds, hands, 0, peak, [])
+    results["build_ms"] = round(build_seconds * 1000, 2)
+    return {"hand evaluator": results}
+
+# Modules that AceTracker.py must not import before its first frame
+deferred_modules = ["matplotlib"]
+
+# Run in a new process, so that modules are imported like when the app starts. The app is built and its main loop
+# runs until the first frame is shown, then the startup profile saved by finish_startup is printed.
+startup_code = """
+import json, sys
+import AceTracker
+from profiler import get_profiles
+
+def report():
+    # finish_startup was scheduled with after_idle before this, so the first frame has been shown
+    profile = get_profiles()["startup"]
+    print(json.dumps({"seconds": profile["total_seconds"], "budget": AceTracker.startup_budget,
+        "stages": {name: stage["seconds"] for name, stage in profile["stages"].items()},
+        "loaded": [m for m in %r if m in sys.modules]}))
+    app.destroy()
+
+app = AceTracker.MainApp()
+app.after_idle(report)
+app.mainloop()
+"""
+
+def bench_startup(runs=3):
+    """
+    Start AceTracker.py in new processes and compare median time until the first frame is shown with its startup
+    budget. Time is taken from the startup profile of the app, from the start of its imports until Tk is idle after
+    drawing the first frame. The app needs a display, without one startup is reported as not measured.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    latencies = []
+    for _ in range(runs):
+        run = subprocess.run([sys.executable, "-c", startup_code % deferred_modules], env=env, capture_output=True, text=True)
+        if run.returncode != 0:
+            results = stage_result(0.0, 0, 0, None, [])
+            results.update({"budget_seconds": None, "within_budget": None, "deferred_modules_loaded": [],
+                "error": (run.stderr.strip().splitlines() or [f"app exited with status {run.returncode}"])[-1]})
+            return {"startup": results}
+        # App prints config warnings before the result
+        startup = json.loads(run.stdout.strip().splitlines()[-1])
+        latencies.append(startup["seconds"])
+    results = stage_result(statistics.median(latencies), 0, 0, None, latencies)
+    results["budget_seconds"] = startup["budget"]
+    results["within_budget"] = results["seconds"] <= startup["budget"]
+    results["deferred_modules_loaded"] = startup["loaded"]
+    results["stages"] = startup["stages"]
+    return {"startup": results}
+
+def run_benchmark(work_dir, tables=6, hands=2000, tournaments=0, hero_name="Hero", seed=0, workers=0,
+                  refreshes=50, hands_per_refresh=5, samples=500, trace_memory=True, evaluated_hands=1000000):
+    """
+    Function that writes synthetic files to work folder and runs all benchmark stages in it. Returns results as dict.
+    """
+    work_dir = os.path.abspath(work_dir)
+    start_dir = os.getcwd()
+    os.makedirs(os.path.join(work_dir, "hud_data"), exist_ok=True)
+    os.chdir(work_dir)
+    try:
+        files = generate_history_folder("./history", tables, hands, hero_name, seed, tournaments)
+        total_hands = hands * len(files)
+        total_lines = count_lines(files)
+        results = {
+            "setup": {"files": len(files), "hands": total_hands, "lines": total_lines, "workers": workers}
+        }
+        results.update(bench_full_refresh(files, hero_name, total_hands, total_lines, workers, trace_memory))
+        results.update(bench_hud_refresh(hero_name, refreshes, hands_per_refresh, seed, trace_memory))
+        results.update(bench_hand_db_load(samples, seed, trace_memory))
+        results.update(bench_hand_evaluator(evaluated_hands, seed, trace_memory))
+        results.update(bench_startup())
+    finally:
+        os.chdir(start_dir)
+    return results
+
+def print_results(results):
+    setup = results["setup"]
+    print(f"{setup['files']} files, {setup['hands']} hands, {setup['lines']} lines")
+    for stage, result in results.items():
+        if stage == "setup":
+            continue
+        memory = f"{result['peak_memory_mb']} MB" if result["peak_memory_mb"] is not None else "-"
+        print(f"{stage:<14} {result['seconds']:>8.3f} s  {result['hands_per_sec'] or '-':>8} hands/s  "
+              f"{result['lines_per_sec'] or '-':>9} lines/s  peak {memory}")
+        if result["latency"]:
+            latency = result["latency"]
+            print(f"{'':<14} latency min {latency['min_ms']} ms, median {latency['median_ms']} ms, "
+                  f"p95 {latency['p95_ms']} ms, max {latency['max_ms']} ms")
+        if result.get("error"):
+            print(f"{'':<14} not measured: {result['error']}")
+        elif "budget_seconds" in result:
+            print(f"{'':<14} budget {result['budget_seconds']} s, {'within' if result['within_budget'] else 'OVER'} budget, "
+                  f"deferred modules loaded: {result['deferred_modules_loaded'] or 'none'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing of synthetic hand history files")
+    parser.add_argument("--tables", type=int, default=6, help="number of cash game tables")
+    parser.add_argument("--tournaments", type=int, default=0, help="number of tournament tables")
+    parser.add_argument("--hands", type=int, default=2000, help="hands per table")
+    parser.add_argument("--hero", default="Hero", help="name of hero")
+    parser.add_argument("--seed", type=int, default=0, help="seed of random generator")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes of full refresh, 0 means one per CPU core")
+    parser.add_argument("--refreshes", type=int, default=50, help="number of HUD refreshes")
+    parser.add_argument("--refresh-hands", type=int, default=5, help="hands added before every HUD refresh")
+    parser.add_argument("--samples", type=int, default=500, help="hands loaded from hand store")
+    parser.add_argument("--evaluate", type=int, default=1000000, help="random 7 card hands ranked by hand evaluator")
+    parser.add_argument("--no-memory", action="store_true", help="skip second run of every stage for peak memory")
+    parser.add_argument("--work-dir", help="folder for generated files, temporary folder is used and removed by default")
+    parser.add_argument("--json", help="save results to JSON file")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="acetracker_bench_")
+    try:
+        results = run_benchmark(work_dir, args.tables, args.hands, args.tournaments, args.hero, args.seed, args.workers,
+            args.refreshes, args.refresh_hands, args.samples, not args.no_memory, args.evaluate)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as target:
+            json.dump(results, target, indent=4)
+    # Slow startup fails the run, so it is noticed when benchmark is run by scripts
+    if results["startup"]["within_budget"] is False:
+        print(f"Startup took {results['startup']['seconds']} s, budget is {results['startup']['budget_seconds']} s", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
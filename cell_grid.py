@@ -0,0 +1,61 @@
+"""
+Library for reusable grids of widgets in AceTracker.py, so refreshes change existing widgets instead of creating new ones
+"""
+
+def configure_changed(widget, old, new):
+    """
+    Function that configures widget with options of new that differ from old
+    """
+    changed = {key: value for key, value in new.items() if old.get(key) != value}
+    if changed:
+        widget.configure(**changed)
+
+class CellGrid:
+    """
+    Grid of cell widgets in master that are kept between renders. Render gets rows of cell options, text alone
+    can be given as a string, and configures only the options that changed since the previous render of the cell.
+    Cells left out are hidden with grid_remove and shown again when later renders need them.
+    Cells are made by create_cell(master, row, column) and changed by update_cell(cell, old, new), which
+    configures changed options by default. Every render of a cell should give the same option names.
+    """
+    def __init__(self, master, create_cell, update_cell=configure_changed, grid_options=None):
+        self.master = master
+        self.create_cell = create_cell
+        self.update_cell = update_cell
+        # Options of grid(), or function that returns them for row and column
+        self.grid_options = grid_options or {}
+        self.cells = {}
+        self.cell_options = {}
+        self.shown = set()
+
+    def cell_grid_options(self, row, column):
+        if callable(self.grid_options):
+            return self.grid_options(row, column)
+        return self.grid_options
+
+    def render(self, rows):
+        """Show rows of cell options and return number of cells that were created or changed"""
+        changed = 0
+        shown = set()
+        for row, cells in enumerate(rows):
+            for column, options in enumerate(cells):
+                if isinstance(options, str):
+                    options = {"text": options}
+                key = (row, column)
+                cell = self.cells.get(key)
+                if cell is None:
+                    cell = self.cells[key] = self.create_cell(self.master, row, column)
+                    self.cell_options[key] = {}
+                    cell.grid(row=row, column=column, **self.cell_grid_options(row, column))
+                elif key not in self.shown:
+                    # Hidden cell remembers its grid options
+                    cell.grid()
+                if options != self.cell_options[key]:
+                    self.update_cell(cell, self.cell_options[key], options)
+                    self.cell_options[key] = options
+                    changed += 1
+                shown.add(key)
+        for key in self.shown - shown:
+            self.cells[key].grid_remove()
+        self.shown = shown
+        return changed
@@ -0,0 +1,122 @@
+"""
+Command line tool for ingesting hand histories of AceTracker.py without the UI, for example on a server from cron.
+Files are parsed in parallel and only files changed after the previous run are parsed again, like refresh of the app.
+Hand store, bankroll and hero_stats.json are updated, and stats of hero and other players are printed or saved
+as JSON or CSV. Customtkinter and matplotlib are never imported.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from utility import load_from_json
+from hand_store import HandStore, source_key
+from ingest import ingest_history_folder
+from stats_engine import stat_names
+from profiler import RefreshProfiler, format_profile
+
+CONFIG_FILE = "./hud_data/config.json"
+
+def load_config(source=CONFIG_FILE):
+    """
+    Function that returns config of the app, or empty dict if there is none. Default config is not created,
+    so the tool doesn't write files that have to be filled in by hand.
+    """
+    if not os.path.exists(source):
+        return {}
+    return load_from_json(source) or {}
+
+def player_stats(hero_name, players=None, min_hands=1):
+    """
+    Function that returns total stats of players from hand store as dict of name and stats, most played first.
+    Players are all players with at least min_hands hands if not given. Hero is left out.
+    """
+    store = HandStore()
+    try:
+        if players is None:
+            players = store.player_names(min_hands)
+        totals = store.player_totals([player for player in players if player != hero_name])
+    finally:
+        store.close()
+    return {player: totals[player].to_json() for player in players if player in totals}
+
+def stats_rows(hero_name, hero_stats, players):
+    """
+    Function that returns stats as CSV rows with header, hero first. Stats have their percentage value.
+    """
+    rows = [["player", "hero", "played_hands", "profit"] + list(stat_names)]
+    for name, is_hero, stats in [(hero_name, 1, hero_stats)] + [(name, 0, stats) for name, stats in players.items()]:
+        if stats:
+            rows.append([name, is_hero, stats["played_hands"]["value"], round(stats["profit"]["value"], 2)]
+                + [stats[stat]["value"] for stat in stat_names])
+    return rows
+
+def write_stats(target, output_format, hero_name, hero_stats, players):
+    """
+    Function that writes stats as JSON or CSV to open text file
+    """
+    if output_format == "csv":
+        csv.writer(target, lineterminator="\n").writerows(stats_rows(hero_name, hero_stats, players))
+    else:
+        json.dump({"hero": {hero_name: hero_stats}, "players": players}, target, indent=4, separators=(',', ': '))
+        target.write("\n")
+
+def print_progress(done, total):
+    # Progress is shown only in a terminal, so cron mails don't get a line per file
+    if sys.stderr.isatty():
+        print(f"\rParsed {done} / {total} changed files", end="", file=sys.stderr, flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest hand history folder and export stats of hero and other players")
+    parser.add_argument("--history", help="hand history folder, path_to_hand_history of config by default")
+    parser.add_argument("--hero", help="name of hero, pokerstars_username of config by default")
+    parser.add_argument("--workers", type=int, help="worker processes, 0 means one per CPU core, ingest_workers of config by default")
+    parser.add_argument("--data-dir", default=".", help="folder that has hud_data and hands_db, current folder by default")
+    parser.add_argument("--players", nargs="*", help="export stats of these players, all players of --min-hands by default")
+    parser.add_argument("--min-hands", type=int, default=1, help="export stats of players with at least this many hands")
+    parser.add_argument("--no-players", action="store_true", help="export only stats of hero")
+    parser.add_argument("--format", choices=["json", "csv"], default="json", help="format of exported stats")
+    parser.add_argument("--output", help="save stats to this file instead of printing them")
+    parser.add_argument("--profile", action="store_true", help="print time of every ingest stage")
+    args = parser.parse_args()
+
+    # Stores of the app are relative to current folder, paths given to the tool are relative to where it was started
+    history_path = source_key(args.history) if args.history else None
+    output = os.path.abspath(args.output) if args.output else None
+    os.chdir(args.data_dir)
+    os.makedirs("./hud_data", exist_ok=True)
+    config = load_config()
+    if history_path is None and config.get("path_to_hand_history"):
+        # Path of config is relative to the data folder like in the app, files get the same keys as in the app
+        history_path = source_key(config["path_to_hand_history"])
+    hero_name = args.hero or config.get("pokerstars_username")
+    workers = args.workers if args.workers is not None else config.get("ingest_workers", 0)
+    if not history_path or not hero_name:
+        parser.error(f"--history and --hero are needed when they are not in {os.path.abspath(CONFIG_FILE)}")
+    if not os.path.isdir(history_path):
+        parser.error(f"Hand history folder not found: {history_path}")
+
+    start = time.perf_counter()
+    profiler = RefreshProfiler("cli ingest") if args.profile else None
+    result = ingest_history_folder(history_path, hero_name, workers, progress=print_progress, profiler=profiler)
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+    if result is None:
+        return 1
+    statistics, bankroll = result
+    print(f"Ingested {history_path} in {time.perf_counter() - start:.1f} s, {len(bankroll['profit'])} hands of {hero_name}, "
+          f"profit {bankroll['profit'].sum():.2f}, EV profit {bankroll['ev_profit'].sum():.2f}", file=sys.stderr)
+    if profiler is not None:
+        print(format_profile(profiler.finish().to_json()), file=sys.stderr)
+
+    players = {} if args.no_players else player_stats(hero_name, args.players, args.min_hands)
+    if output:
+        with open(output, "w", newline="") as target:
+            write_stats(target, args.format, hero_name, statistics, players)
+    else:
+        write_stats(sys.stdout, args.format, hero_name, statistics, players)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
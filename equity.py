@@ -0,0 +1,100 @@
+"""
+Library for calculating all-in equity of hero for the EV line of bankroll graph in AceTracker.py.
+Equity of a hand is calculated once and kept in hand store by hand id.
+"""
+from itertools import combinations
+from math import comb
+import numpy as np
+from hand_evaluator import parse_cards, evaluate_batch
+
+# Runouts are enumerated exactly when there are at most this many, like after flop and turn.
+# Pre-flop all-ins are sampled with Monte Carlo, hand id is the seed, so the result is always the same.
+# Standard error of sampled equity is below 1 percent, which averages out over the EV line of many hands.
+exact_runout_limit = 50000
+monte_carlo_runouts = 4000
+
+# Hands of several spots are ranked with one evaluate_batch call of at most this many hands
+equity_batch_hands = 1 << 20
+
+def board_runouts(deck, missing, seed=0):
+    """
+    Function that returns array of missing board cards from deck, every runout if there are at most
+    exact_runout_limit of them, otherwise random runouts
+    """
+    if missing == 0:
+        return np.zeros((1, 0), np.intp)
+    if comb(len(deck), missing) <= exact_runout_limit:
+        return np.array(list(combinations(deck, missing)), np.intp)
+    rng = np.random.default_rng(seed)
+    # Floyd's algorithm picks different cards for every runout with one random number per card
+    picks = np.empty((monte_carlo_runouts, missing), np.intp)
+    for step, last in enumerate(range(len(deck) - missing, len(deck))):
+        pick = rng.integers(0, last + 1, monte_carlo_runouts)
+        taken = (picks[:, :step] == pick[:, None]).any(axis=1)
+        picks[:, step] = np.where(taken, last, pick)
+    return np.asarray(deck, np.intp)[picks]
+
+def spot_hands(cards, board, seed=0):
+    """
+    Function that returns 7 card hands of every player over runouts of the board as array of shape
+    (players * runouts, 7), hands of the first player first
+    """
+    hole = [parse_cards(c) for c in cards]
+    board = parse_cards(board)
+    used = set(board) | {card for h in hole for card in h}
+    deck = [card for card in range(52) if card not in used]
+    runouts = board_runouts(deck, 5 - len(board), seed)
+    boards = np.concatenate([np.broadcast_to(np.asarray(board, np.intp), (len(runouts), len(board))), runouts], axis=1)
+    return np.concatenate([np.concatenate([np.broadcast_to(np.asarray(h, np.intp), (len(boards), len(h))), boards], axis=1)
+        for h in hole])
+
+def equity_of_values(values, players):
+    """
+    Function that returns share of the pot the first player wins on average from values of spot_hands.
+    Split pots are shared by winners.
+    """
+    values = values.reshape(players, -1)
+    winners = values == values.max(axis=0)
+    return float((winners[0] / winners.sum(axis=0)).mean())
+
+def all_in_equity(cards, board, seed=0):
+    """
+    Function that returns share of the pot the first player wins on average over runouts of the board.
+    Cards is list of hole cards of players like ["Ah Kd", "7s 7c"] and board is list of known board cards.
+    Split pots are shared by winners.
+    """
+    return equity_of_values(evaluate_batch(spot_hands(cards, board, seed)), len(cards))
+
+def spot_equities(spots, store):
+    """
+    Function that returns dict of hero equity by hand id for all-in spots made by the parser.
+    Equities found from hand store are not calculated again, new ones are saved to it.
+    Hands of new spots are ranked together in batches of equity_batch_hands.
+    """
+    equities = store.load_equities([spot[0] for spot in spots])
+    new = {}
+    batch, batch_size = [], 0
+    for hand_id, cards, board, _, _ in spots:
+        if hand_id not in equities and hand_id not in new:
+            hands = spot_hands(cards, board, seed=hand_id)
+            new[hand_id] = None
+            batch.append((hand_id, len(cards), hands))
+            batch_size += len(hands)
+            if batch_size >= equity_batch_hands:
+                new.update(batch_equities(batch))
+                batch, batch_size = [], 0
+    if batch:
+        new.update(batch_equities(batch))
+    if new:
+        store.save_equities(new)
+        equities.update(new)
+    return equities
+
+def batch_equities(batch):
+    """
+    Function that ranks hands of a batch of spots with one evaluate_batch call and returns dict of equity by hand id
+    """
+    values = evaluate_batch(np.concatenate([hands for _, _, hands in batch]))
+    ends = np.cumsum([len(hands) for _, _, hands in batch])
+    return {hand_id: equity_of_values(spot_values, players)
+        for (hand_id, players, _), spot_values in zip(batch, np.split(values, ends[:-1]))}
@@ -0,0 +1,215 @@
+"""
+Library for ranking poker hands of 5 to 7 cards with lookup tables, used for made hands of AceTracker.py.
+Hands are evaluated in batches with NumPy, so millions of hands can be ranked per second.
+
+Card is an integer rank * 4 + suit, where rank is index in card_ranks and suit in card_suits.
+Value of a hand is category << 20 and ranks that break ties in 4 bit slots, so better hand has bigger value.
+"""
+from itertools import combinations_with_replacement
+import numpy as np
+
+card_ranks = "23456789TJQKA"
+card_suits = "cdhs"
+
+hand_categories = ("High card", "Pair", "Two pair", "Three of a kind", "Straight", "Flush", "Full house", "Four of a kind", "Straight flush")
+rank_names = ("Deuce", "Trey", "Four", "Five", "Six", "Seven", "Eight", "Nine", "Ten", "Jack", "Queen", "King", "Ace")
+
+# Rank multiset of cards is a base 5 number with one digit per rank, digit is number of cards of the rank.
+# Suits are 13 bit masks of ranks, mask of suit s starts from bit 16 * s.
+rank_keys = np.array([5 ** (card // 4) for card in range(52)], np.int64)
+suit_bits = np.array([(1 << (card // 4)) << (16 * (card % 4)) for card in range(52)], np.int64)
+
+# Tables are built with NumPy when first hand is evaluated, it takes less than a second
+lookup_tables = {}
+
+def category_value(category):
+    """
+    Function that returns the smallest value of hand category, hands of the category or better have at least this value
+    """
+    return hand_categories.index(category) << 20
+
+def card_index(card):
+    """
+    Function that returns card like "Ah" as integer, raises ValueError for unknown cards like "??"
+    """
+    rank, suit = card[:-1], card[-1:]
+    if rank == "10":
+        rank = "T"
+    if len(rank) != 1 or rank not in card_ranks or not suit or suit not in card_suits:
+        raise ValueError(f"Unknown card {card!r}")
+    return card_ranks.index(rank) * 4 + card_suits.index(suit)
+
+def parse_cards(cards):
+    """
+    Function that returns list of card integers from text like "Ah Kd" or list of card texts,
+    or None if any card is unknown
+    """
+    if isinstance(cards, str):
+        cards = cards.split()
+    try:
+        return [card_index(card) for card in cards]
+    except ValueError:
+        return None
+
+def straight_top(ranks):
+    """
+    Function that returns highest rank of a straight made from set of ranks, or None. Ace can be low in A2345.
+    """
+    for top in range(12, 3, -1):
+        if all(rank in ranks for rank in range(top - 4, top + 1)):
+            return top
+    if {12, 0, 1, 2, 3} <= ranks:
+        return 3
+    return None
+
+def five_card_value(ranks, flush=False):
+    """
+    Function that returns value of exactly five card ranks, flush tells if they are of the same suit
+    """
+    groups = sorted(((ranks.count(rank), rank) for rank in set(ranks)), reverse=True)
+    counts = [count for count, _ in groups]
+    ordered = [rank for _, rank in groups]
+    top = straight_top(set(ranks)) if len(groups) == 5 else None
+    if top is not None:
+        category = 8 if flush else 4
+        ordered = [top]
+    elif counts[0] == 4:
+        category = 7
+    elif counts[:2] == [3, 2]:
+        category = 6
+    elif flush:
+        category = 5
+    elif counts[0] == 3:
+        category = 3
+    elif counts[:2] == [2, 2]:
+        category = 2
+    elif counts[0] == 2:
+        category = 1
+    else:
+        category = 0
+    value = category << 20
+    for i, rank in enumerate(ordered):
+        value |= rank << (16 - 4 * i)
+    return value
+
+def rank_multisets(size):
+    """
+    Function that returns keys and rank counts of every rank multiset of size cards, at most 4 cards per rank
+    """
+    ranks = np.array(list(combinations_with_replacement(range(13), size)), np.intp)
+    counts = np.zeros((len(ranks), 13), np.int64)
+    for i in range(size):
+        counts[np.arange(len(ranks)), ranks[:, i]] += 1
+    possible = counts.max(axis=1) <= 4
+    ranks, counts = ranks[possible], counts[possible]
+    return (5 ** np.arange(13, dtype=np.int64) * counts).sum(axis=1), counts, ranks
+
+def build_tables():
+    """
+    Function that builds lookup tables. Rank table has value of every rank multiset of 5, 6 and 7 cards
+    without flush, sorted by key. Flush table has value of best flush in every 13 bit mask of ranks.
+    Value of a bigger hand is the best value of hands with one card removed.
+    """
+    keys, _, ranks = rank_multisets(5)
+    values = np.array([five_card_value(list(hand)) for hand in ranks.tolist()], np.int32)
+    all_keys, all_values = [keys], [values]
+    for size in (6, 7):
+        bigger_keys, bigger_counts, _ = rank_multisets(size)
+        best = np.zeros(len(bigger_keys), np.int32)
+        order = np.argsort(keys)
+        for rank in range(13):
+            has_rank = bigger_counts[:, rank] > 0
+            smaller = bigger_keys[has_rank] - 5 ** rank
+            found = values[order[np.searchsorted(keys, smaller, sorter=order)]]
+            best[has_rank] = np.maximum(best[has_rank], found)
+        keys, values = bigger_keys, best
+        all_keys.append(keys)
+        all_values.append(values)
+    keys = np.concatenate(all_keys)
+    values = np.concatenate(all_values)
+    order = np.argsort(keys)
+
+    masks = np.arange(1 << 13)
+    bit_counts = np.zeros(len(masks), np.int64)
+    for rank in range(13):
+        bit_counts += (masks >> rank) & 1
+    flush_values = np.zeros(len(masks), np.int32)
+    for mask in np.flatnonzero(bit_counts == 5).tolist():
+        flush_values[mask] = five_card_value([rank for rank in range(13) if mask >> rank & 1], flush=True)
+    for size in range(6, 14):
+        for mask in np.flatnonzero(bit_counts == size).tolist():
+            flush_values[mask] = max(flush_values[mask ^ (1 << rank)] for rank in range(13) if mask >> rank & 1)
+    return {"rank_keys": keys[order], "rank_values": values[order], "flush_values": flush_values}
+
+def get_tables():
+    if not lookup_tables:
+        lookup_tables.update(build_tables())
+    return lookup_tables
+
+def evaluate_batch(cards):
+    """
+    Function that returns values of hands as int32 array. Cards is array of card integers of shape (hands, 5..7),
+    cards of one hand must be different.
+    """
+    tables = get_tables()
+    cards = np.asarray(cards, np.intp)
+    if cards.ndim != 2 or not 5 <= cards.shape[1] <= 7:
+        raise ValueError(f"Hands must have 5 to 7 cards, got shape {cards.shape}")
+    keys = rank_keys[cards].sum(axis=1)
+    values = tables["rank_values"][np.searchsorted(tables["rank_keys"], keys)]
+    suits = suit_bits[cards].sum(axis=1)
+    for suit in range(4):
+        values = np.maximum(values, tables["flush_values"][(suits >> (16 * suit)) & 0x1fff])
+    return values
+
+def evaluate(cards):
+    """
+    Function that returns value of one hand of 5 to 7 cards, given as card integers or text like "Ah Kd 7s 7c 2d"
+    """
+    if isinstance(cards, str) or (cards and isinstance(cards[0], str)):
+        cards = parse_cards(cards)
+        if cards is None:
+            raise ValueError("Hand has unknown cards")
+    return int(evaluate_batch([cards])[0])
+
+def evaluate_many(hands):
+    """
+    Function that returns values of hands given as lists of card texts. Hands are evaluated in batches of
+    the same size, hands with unknown cards or fewer than 5 cards get None.
+    """
+    values = [None] * len(hands)
+    sizes = {}
+    for i, hand in enumerate(hands):
+        cards = parse_cards(hand)
+        if cards is not None and 5 <= len(cards) <= 7 and len(set(cards)) == len(cards):
+            sizes.setdefault(len(cards), ([], []))
+            sizes[len(cards)][0].append(i)
+            sizes[len(cards)][1].append(cards)
+    for indexes, cards in sizes.values():
+        for i, value in zip(indexes, evaluate_batch(cards).tolist()):
+            values[i] = value
+    return values
+
+def hand_label(value):
+    """
+    Function that returns made hand of value as text, like "Two pair, Aces and Kings"
+    """
+    category = value >> 20
+    ranks = [(value >> (16 - 4 * i)) & 0xf for i in range(5)]
+    first, second = rank_names[ranks[0]], rank_names[ranks[1]]
+    plural = lambda name: name + "es" if name == "Six" else name + "s"
+    if category == 8:
+        return "Royal flush" if ranks[0] == 12 else f"Straight flush, {first} high"
+    if category == 7:
+        return f"Four of a kind, {plural(first)}"
+    if category == 6:
+        return f"Full house, {plural(first)} full of {plural(second)}"
+    if category in (4, 5):
+        return f"{hand_categories[category]}, {first} high"
+    if category == 3:
+        return f"Three of a kind, {plural(first)}"
+    if category == 2:
+        return f"Two pair, {plural(first)} and {plural(second)}"
+    if category == 1:
+        return f"Pair of {plural(first)}"
+    return f"{first} high"
@@ -0,0 +1,304 @@
+"""
+Library of compact data classes for hands and player stats of AceTracker.py
+"""
+import re
+import sys
+from array import array
+from enum import IntEnum
+
+class ActionType(IntEnum):
+    """Codes for player actions stored in hands"""
+    FOLD = 0
+    CHECK = 1
+    CALL = 2
+    BET = 3
+    RAISE = 4
+    POST = 5
+    CASH_OUT = 6
+
+# Action words of hand history lines and codes they are stored as
+action_codes = {
+    "folds": ActionType.FOLD,
+    "checks": ActionType.CHECK,
+    "calls": ActionType.CALL,
+    "bets": ActionType.BET,
+    "raises": ActionType.RAISE,
+    "posts": ActionType.POST,
+    "cashed out": ActionType.CASH_OUT
+}
+action_words = {code: word for word, code in action_codes.items()}
+
+# Flag added to action code of all-in actions
+ALL_IN = 0x80
+
+# Streets of a hand in the order they are played
+hand_streets = ("pre-flop", "flop", "turn", "river")
+street_index = {street: i for i, street in enumerate(hand_streets)}
+
+# Positions of six seated tables, codes of numeric tables are indexes of this list and -1 if not known
+position_names = ("sb", "bb", "utg", "hj", "co", "bu")
+position_codes = {name: i for i, name in enumerate(position_names)}
+
+# Patterns for reading hands from legacy JSON hand DB
+legacy_action_pattern = re.compile(r"(.+?): (folds|checks|calls|bets|raises|posts|cashed out)(.*)")
+legacy_amount_pattern = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+def big_blind_of(stakes):
+    """
+    Function that returns big blind from stakes like "$0.02/$0.05", 0 if not known
+    """
+    try:
+        return float(stakes.rsplit("/", 1)[1].lstrip("$"))
+    except (AttributeError, IndexError, ValueError):
+        return 0.0
+
+def format_amount(amount, tournament=0):
+    """
+    Function that formats amount as dollars, or as chips in tournaments
+    """
+    if tournament:
+        return f"{amount:.0f}"
+    return f"${amount:.2f}"
+
+class Action:
+    """One player action, amount is the money put in by the action and total is raise size for raises"""
+    __slots__ = ("player", "code", "amount", "total", "all_in")
+
+    def __init__(self, player, code, amount=0.0, total=0.0, all_in=False):
+        self.player = player
+        self.code = code
+        self.amount = amount
+        self.total = total
+        self.all_in = all_in
+
+    def describe(self, tournament=0):
+        """Return action as text without player name, for example "raises $0.10 to $0.20" """
+        text = action_words[self.code]
+        if self.code == ActionType.RAISE:
+            text = f"{text} {format_amount(self.amount, tournament)} to {format_amount(self.total, tournament)}"
+        elif self.code >= ActionType.CALL:
+            text = f"{text} {format_amount(self.amount, tournament)}"
+        if self.all_in:
+            text += " (all-in)"
+        return text
+
+    def to_text(self, tournament=0):
+        return f"{self.player}: {self.describe(tournament)}"
+
+    @classmethod
+    def from_text(cls, text):
+        """Read action from legacy hand DB text, returns None if text is not an action"""
+        match = legacy_action_pattern.fullmatch(text)
+        if match is None:
+            return None
+        player, word, rest = match.groups()
+        amounts = [float(a.replace(",", "")) for a in legacy_amount_pattern.findall(rest.split("[")[0])]
+        amount = amounts[0] if amounts else 0.0
+        total = amounts[1] if len(amounts) > 1 else 0.0
+        return cls(player, action_codes[word], amount, total, "all-in" in rest)
+
+class HandPlayer:
+    """Result of one player in a hand"""
+    __slots__ = ("name", "position", "cards", "profit")
+
+    def __init__(self, name, position="??", cards="?? ??", profit=999):
+        self.name = name
+        self.position = position
+        self.cards = cards
+        self.profit = profit
+
+class Hand:
+    """
+    One played hand stored in flat lists and arrays. Players are stored in seat order, and every action
+    takes three bytes for street, seat and action code plus two amounts. Action and HandPlayer objects are
+    created only when the hand is displayed. Hand DB JSON files store hands in the old format of strings,
+    which is created and read only by to_json and from_json.
+    """
+    __slots__ = ("hand_id", "tournament", "stakes", "date", "names", "positions", "cards", "profits", "boards", "pot_sizes", "action_info", "action_amounts")
+
+    def __init__(self, hand_id, tournament=0):
+        self.hand_id = hand_id
+        self.tournament = tournament
+        # Blinds like "$0.02/$0.05" and start time like "2024-01-31 18:05:00", None if not known
+        self.stakes = None
+        self.date = None
+        self.names = []
+        self.positions = []
+        self.cards = []
+        self.profits = array("d")
+        # Board cards and pot size of every street reached, pre-flop has no board
+        self.boards = [None]
+        self.pot_sizes = [None]
+        # Street, seat and code of every action, all-in flag is added to the code
+        self.action_info = array("B")
+        # Amount and total of every action
+        self.action_amounts = array("d")
+
+    def add_player(self, name):
+        """Add player to next seat and return index of the seat"""
+        self.names.append(name)
+        self.positions.append("??")
+        self.cards.append("?? ??")
+        self.profits.append(999)
+        return len(self.names) - 1
+
+    def start_street(self, board):
+        self.boards.append(board)
+        self.pot_sizes.append(None)
+
+    def add_action(self, seat, code, amount=0.0, total=0.0, all_in=False):
+        """Add action of player in seat to the latest street"""
+        self.action_info.extend((len(self.boards) - 1, seat, code | ALL_IN if all_in else code))
+        self.action_amounts.extend((amount, total))
+
+    def street_count(self):
+        return len(self.boards)
+
+    def board_cards(self):
+        """Board cards of all streets reached, like ["Ah", "Kd", "7s", "2c"]"""
+        return [card for board in self.boards if board is not None for card in board.split()]
+
+    def actions(self, street):
+        """Generator that yields actions of the street as Action objects"""
+        street_id = street_index[street]
+        info, amounts, names = self.action_info, self.action_amounts, self.names
+        for i in range(len(info) // 3):
+            if info[3 * i] == street_id:
+                code = info[3 * i + 2]
+                yield Action(names[info[3 * i + 1]], ActionType(code & ~ALL_IN), amounts[2 * i], amounts[2 * i + 1], bool(code & ALL_IN))
+
+    def players(self):
+        """Generator that yields results of players in seat order as HandPlayer objects"""
+        for i, name in enumerate(self.names):
+            yield HandPlayer(name, self.positions[i], self.cards[i], self.profits[i])
+
+    def profit_of(self, name):
+        """Profit of player rounded to cents, same as in hand DB keys"""
+        return round(self.profits[self.names.index(name)], 2)
+
+    def player_acted(self, street, name):
+        """Check if player did any action on the street"""
+        if name not in self.names:
+            return False
+        street_id, seat = street_index[street], self.names.index(name)
+        info = self.action_info
+        return any(info[i] == street_id and info[i + 1] == seat for i in range(0, len(info), 3))
+
+    def went_to_showdown(self, name):
+        """Check if player saw the river without folding"""
+        if len(self.boards) < len(hand_streets) or name not in self.names:
+            return False
+        seat = self.names.index(name)
+        info = self.action_info
+        acted = False
+        for i in range(0, len(info), 3):
+            if info[i] > 0 and info[i + 1] == seat:
+                if info[i + 2] & ~ALL_IN == ActionType.FOLD:
+                    return False
+                acted = True
+        return acted
+
+    def reached_river(self, name):
+        """Check if player was still in the hand when the river was dealt"""
+        if len(self.boards) < len(hand_streets) or name not in self.names:
+            return False
+        seat, river = self.names.index(name), len(hand_streets) - 1
+        info = self.action_info
+        return not any(info[i] < river and info[i + 1] == seat and info[i + 2] & ~ALL_IN == ActionType.FOLD for i in range(0, len(info), 3))
+
+    def all_in_cards(self, name):
+        """
+        Return hole cards of players left in an all-in hand, player first, and board cards of the street of the
+        last action, when money went in. None if player folded, hand didn't go to showdown, nobody was all-in,
+        someone cashed out or cards of a player are not known.
+        """
+        if len(self.boards) < len(hand_streets) or name not in self.names or not self.has_all_in():
+            return None
+        info = self.action_info
+        folded = set()
+        all_in = False
+        last_street = 0
+        for i in range(0, len(info), 3):
+            code = info[i + 2] & ~ALL_IN
+            if code == ActionType.CASH_OUT:
+                return None
+            if code == ActionType.FOLD:
+                folded.add(info[i + 1])
+            all_in = all_in or bool(info[i + 2] & ALL_IN)
+            last_street = info[i]
+        seat = self.names.index(name)
+        if not all_in or seat in folded:
+            return None
+        seats = [seat] + [s for s in range(len(self.names)) if s != seat and s not in folded]
+        cards = [self.cards[s] for s in seats]
+        if len(seats) < 2 or any("?" in c for c in cards):
+            return None
+        board = [card for board in self.boards[1:last_street + 1] if board is not None for card in board.split()]
+        return cards, board
+
+    def has_all_in(self):
+        """Check if any player went all-in, without going through actions one by one"""
+        return max(self.action_info[2::3], default=0) >= ALL_IN
+
+    def player_all_in(self, name):
+        """Check if player went all-in on any street"""
+        if name not in self.names or not self.has_all_in():
+            return False
+        seat = self.names.index(name)
+        info = self.action_info
+        return any(info[i + 1] == seat and info[i + 2] & ALL_IN for i in range(0, len(info), 3))
+
+    def to_json(self):
+        """Return hand in the format of hand DB JSON files"""
+        hand_data = {"summary": {}}
+        for player in self.players():
+            hand_data["summary"][player.name] = {"position": player.position, "cards": player.cards, "profit": player.profit}
+        for i, street in enumerate(hand_streets[:len(self.boards)]):
+            street_data = []
+            if self.boards[i] is not None:
+                street_data.append(f"board: {self.boards[i]}")
+            street_data.extend(action.to_text(self.tournament) for action in self.actions(street))
+            if self.pot_sizes[i] is not None:
+                street_data.append(f"pot size: ${self.pot_sizes[i]:.2f}")
+            hand_data[street] = street_data
+        return hand_data
+
+    @classmethod
+    def from_json(cls, dict_key, hand_data):
+        """Read hand from hand DB JSON file, dict_key is "<hand id>_<hero profit>" with "T_" prefix in tournaments"""
+        key_parts = dict_key.split("_")
+        tournament = 1 if key_parts[0] == "T" else 0
+        hand = cls(key_parts[tournament], tournament)
+        for name, result in hand_data.get("summary", {}).items():
+            seat = hand.add_player(sys.intern(name))
+            hand.positions[seat] = result["position"]
+            hand.cards[seat] = result["cards"]
+            hand.profits[seat] = result["profit"]
+        for i, street in enumerate(hand_streets):
+            if street not in hand_data:
+                break
+            if i > 0:
+                hand.start_street(None)
+            for text in hand_data[street]:
+                if text.startswith("board: "):
+                    hand.boards[i] = text[7:]
+                elif text.startswith("pot size: "):
+                    hand.pot_sizes[i] = float(legacy_amount_pattern.findall(text)[-1])
+                else:
+                    action = Action.from_text(text)
+                    if action is not None:
+                        if action.player not in hand.names:
+                            hand.add_player(sys.intern(action.player))
+                        hand.add_action(hand.names.index(action.player), action.code, action.amount, action.total, action.all_in)
+        return hand
+
+class SeatState:
+    """State of one seat during the hand being parsed, index is the seat of player in Hand"""
+    __slots__ = ("usr", "index", "pos", "money_betted_this_state", "money_betted_total")
+
+    def __init__(self, usr, index):
+        self.usr = usr
+        self.index = index
+        self.pos = None
+        self.money_betted_this_state = 0.0
+        self.money_betted_total = 0.0
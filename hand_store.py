@@ -0,0 +1,574 @@
+"""
+Library for storing parsed hands of AceTracker.py in a SQLite database
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from hand_model import Hand, ALL_IN
+from stats_engine import PlayerCounters, stat_names
+from hand_evaluator import evaluate_many
+
+HAND_STORE_FILE = "./hands_db/hands.sqlite3"
+HAND_STORE_VERSION = 1
+
+# Number of hands inserted with one executemany call
+insert_batch_size = 1000
+
+# Columns of player counters, true and false count of every stat, played hands and profit
+counter_columns = [f"{stat}_{kind}" for stat in stat_names for kind in ("true", "false")] + ["played_hands", "profit"]
+counter_column_definitions = {c: f'"{c}" {"REAL" if c == "profit" else "INTEGER"} NOT NULL DEFAULT 0' for c in counter_columns}
+counter_definitions = ",\n    ".join(counter_column_definitions.values())
+counter_list = ", ".join(f'"{c}"' for c in counter_columns)
+
+# Number of players whose total counters are kept in memory by PlayerStatsCache
+player_cache_size = 1024
+
+# Conditions of hand filters used by query_hand_keys
+hand_filters = {
+    "won": "hero_profit > 0",
+    "lost": "hero_profit < 0",
+    "post-flop": "hero_saw_flop = 1",
+    "showdown": "hero_showdown = 1"
+}
+
+# Every hand filter has a partial index with the columns of all filters in the order of hand lists, so hands
+# matching filters are counted and paged from the smallest index without reading hands table.
+filter_index_columns = "hand_id, tournament, hero_profit, hero_saw_flop, hero_showdown, hero_position, pot_size, hero_hand_value"
+filter_index_conditions = {f.replace("-", "_"): condition for f, condition in hand_filters.items()}
+filter_index_conditions["hand_value"] = "hero_hand_value IS NOT NULL"
+filter_indexes = "\n".join(f"CREATE INDEX IF NOT EXISTS hands_filter_{name} ON hands ({filter_index_columns}) WHERE {condition};"
+    for name, condition in filter_index_conditions.items())
+
+hand_store_schema = """
+CREATE TABLE IF NOT EXISTS hands (
+    id INTEGER PRIMARY KEY,
+    hand_id INTEGER NOT NULL,
+    hand_key TEXT NOT NULL,
+    source TEXT NOT NULL,
+    tournament INTEGER NOT NULL,
+    stakes TEXT,
+    date TEXT,
+    hero TEXT,
+    hero_position TEXT,
+    hero_profit REAL,
+    pot_size REAL,
+    hero_saw_flop INTEGER NOT NULL DEFAULT 0,
+    hero_showdown INTEGER NOT NULL DEFAULT 0,
+    hero_hand_value INTEGER
+);
+CREATE TABLE IF NOT EXISTS players (
+    hand INTEGER NOT NULL,
+    seat INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    position TEXT,
+    cards TEXT,
+    profit REAL,
+    PRIMARY KEY (hand, seat)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS streets (
+    hand INTEGER NOT NULL,
+    street INTEGER NOT NULL,
+    board TEXT,
+    pot_size REAL,
+    PRIMARY KEY (hand, street)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS actions (
+    hand INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    street INTEGER NOT NULL,
+    seat INTEGER NOT NULL,
+    code INTEGER NOT NULL,
+    all_in INTEGER NOT NULL,
+    amount REAL,
+    total REAL,
+    PRIMARY KEY (hand, number)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS player_stats (
+    player TEXT NOT NULL,
+    tournament INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    {counter_definitions},
+    PRIMARY KEY (player, tournament, source)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS player_totals (
+    player TEXT NOT NULL,
+    tournament INTEGER NOT NULL,
+    {counter_definitions},
+    PRIMARY KEY (player, tournament)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS all_in_equity (
+    hand_id INTEGER PRIMARY KEY,
+    equity REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS hands_hand_id ON hands (hand_id, tournament);
+CREATE INDEX IF NOT EXISTS hands_key ON hands (hand_key);
+CREATE INDEX IF NOT EXISTS hands_source ON hands (source);
+CREATE INDEX IF NOT EXISTS hands_date ON hands (date);
+CREATE INDEX IF NOT EXISTS hands_stakes ON hands (stakes);
+CREATE INDEX IF NOT EXISTS hands_filter_position ON hands (hero_position, {filter_index_columns});
+{filter_indexes}
+CREATE INDEX IF NOT EXISTS player_stats_source ON player_stats (source);
+""".format(counter_definitions=counter_definitions, filter_index_columns=filter_index_columns, filter_indexes=filter_indexes)
+
+def filter_conditions(filters=(), hero_position=None, min_pot_size=None, min_hand_value=None):
+    """
+    Function that returns WHERE clause and its parameters for hand filters. Min hand value is value of
+    hand_evaluator, hands where made hand of hero is not known don't match it.
+    """
+    conditions = [hand_filters[f] for f in filters]
+    parameters = []
+    if hero_position is not None:
+        conditions.append("hero_position = ?")
+        parameters.append(hero_position)
+    if min_pot_size is not None:
+        conditions.append("pot_size >= ?")
+        parameters.append(min_pot_size)
+    if min_hand_value is not None:
+        conditions.append("hero_hand_value >= ?")
+        parameters.append(min_hand_value)
+    if not conditions:
+        return "", parameters
+    return " WHERE " + " AND ".join(conditions), parameters
+
+def counter_values(counters):
+    """
+    Function that returns values of PlayerCounters in order of counter_columns
+    """
+    values = []
+    for i in range(len(stat_names)):
+        values.append(counters.true[i])
+        values.append(counters.false[i])
+    values.append(counters.played_hands)
+    values.append(counters.profit)
+    return values
+
+def counters_from_values(values):
+    """
+    Function that creates PlayerCounters from values in order of counter_columns
+    """
+    counters = PlayerCounters()
+    for i in range(len(stat_names)):
+        counters.true[i] = values[2 * i]
+        counters.false[i] = values[2 * i + 1]
+    counters.played_hands = values[-2]
+    counters.profit = values[-1]
+    return counters
+
+def source_key(source):
+    """
+    Function that returns the key of a hand history file in hand store and parse cache. The same file has
+    the same key however its path was written, so the app and the command line tool don't count it twice.
+    """
+    return os.path.normcase(os.path.abspath(source))
+
+class HandStore:
+    """
+    SQLite database of all parsed hands. Every hand has one row in hands table with attributes used for
+    filtering, and its players, streets and actions are stored in their own tables keyed by row id of the hand.
+    Every process must open its own HandStore, writes from several processes wait for each other.
+    """
+    def __init__(self, path=HAND_STORE_FILE):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        # Transactions are started explicitly, so that every batch of hands is saved all at once
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(hand_store_schema)
+        self.add_counter_columns()
+
+    def close(self):
+        self.connection.close()
+
+    def add_counter_columns(self):
+        """
+        Add columns of newly registered stats to player counter tables. Counters saved earlier don't have
+        the new stats, so they are removed and files are parsed again by next refresh.
+        """
+        connection = self.connection
+        if not self.missing_counter_columns():
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have added the columns meanwhile
+            missing = self.missing_counter_columns()
+            for table in ["player_stats", "player_totals"]:
+                for column in missing:
+                    connection.execute(f"ALTER TABLE {table} ADD COLUMN {counter_column_definitions[column]}")
+                if missing:
+                    connection.execute(f"DELETE FROM {table}")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def missing_counter_columns(self):
+        existing = {row[1] for row in self.connection.execute("PRAGMA table_info(player_stats)")}
+        return [column for column in counter_columns if column not in existing]
+
+    def replace_source(self, source, hero_name, hands):
+        """
+        Save hands parsed from source file in place of hands saved from it earlier. Hands is an iterable of
+        (hand_key, Hand) tuples, returns number of saved hands. Old hands are deleted in the same transaction
+        as the first batch of new hands, so the source is never seen without hands.
+        """
+        return self.write_hands(source_key(source), hero_name, hands, replace=True)
+
+    def add_hands(self, source, hero_name, hands):
+        """
+        Save new hands parsed from source file, returns number of saved hands
+        """
+        return self.write_hands(source_key(source), hero_name, hands)
+
+    def write_hands(self, source, hero_name, hands, replace=False):
+        """
+        Save hands in batches, each in its own short transaction. Hands are taken from the iterable and their
+        rows are made outside of transactions, so parsing a big file doesn't keep other writers waiting.
+        """
+        count = 0
+        batch = []
+        first = True
+        for hand_key, hand in hands:
+            batch.append((hand_key, hand))
+            if len(batch) >= insert_batch_size:
+                count += self.write_batch(source, self.batch_rows(source, hero_name, batch), replace and first)
+                batch = []
+                first = False
+        if batch or (replace and first):
+            count += self.write_batch(source, self.batch_rows(source, hero_name, batch), replace and first)
+        return count
+
+    def write_batch(self, source, rows, replace=False):
+        """Insert rows of one batch in a transaction, hands saved earlier from source are deleted first if replace is set"""
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if replace:
+                self.delete_hands("SELECT id FROM hands WHERE source = ?", (source,))
+            count = self.insert_rows(rows)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return count
+
+    def delete_hands(self, hand_query, parameters=()):
+        for table in ["players", "streets", "actions"]:
+            self.connection.execute(f"DELETE FROM {table} WHERE hand IN ({hand_query})", parameters)
+        self.connection.execute(f"DELETE FROM hands WHERE id IN ({hand_query})", parameters)
+
+    def insert_hands(self, source, hero_name, hands):
+        """
+        Insert hands in batches with executemany inside transaction of the caller, so only one batch of rows
+        is kept in memory
+        """
+        count = 0
+        batch = []
+        for hand_key, hand in hands:
+            batch.append((hand_key, hand))
+            if len(batch) >= insert_batch_size:
+                count += self.insert_rows(self.batch_rows(source, hero_name, batch))
+                batch = []
+        if batch:
+            count += self.insert_rows(self.batch_rows(source, hero_name, batch))
+        return count
+
+    def batch_rows(self, source, hero_name, batch):
+        """
+        Make rows of hands, players, streets and actions for a batch of hands. Row ids of hands start from 1,
+        insert_rows moves them after the hands already saved.
+        """
+        # Hand seen again, for example in another file, replaces the earlier copy
+        batch = list({(int(hand.hand_id), hand.tournament): (hand_key, hand) for hand_key, hand in batch}.values())
+        hand_ids = [(int(hand.hand_id), hand.tournament) for _, hand in batch]
+        # Made hands of hero are evaluated for the whole batch at once, only when hero reached the river
+        hand_values = evaluate_many([hand.cards[hand.names.index(hero_name)].split() + hand.board_cards()
+            if hand.reached_river(hero_name) else [] for _, hand in batch])
+        hand_rows, player_rows, street_rows, action_rows = [], [], [], []
+        for row_id, ((hand_key, hand), (hand_id, _), hand_value) in enumerate(zip(batch, hand_ids, hand_values), start=1):
+            hero_position = hero_profit = None
+            if hero_name in hand.names:
+                hero_seat = hand.names.index(hero_name)
+                hero_position = hand.positions[hero_seat]
+                hero_profit = round(hand.profits[hero_seat], 2)
+            pot_size = sum(pot for pot in hand.pot_sizes if pot is not None)
+            saw_flop = 1 if hand.player_acted("flop", hero_name) else 0
+            showdown = 1 if hand.went_to_showdown(hero_name) else 0
+            hand_rows.append((row_id, hand_id, hand_key, source, hand.tournament, hand.stakes, hand.date, hero_name, hero_position, hero_profit, pot_size, saw_flop, showdown, hand_value))
+            for seat, name in enumerate(hand.names):
+                player_rows.append((row_id, seat, name, hand.positions[seat], hand.cards[seat], hand.profits[seat]))
+            for street, board in enumerate(hand.boards):
+                street_rows.append((row_id, street, board, hand.pot_sizes[street]))
+            info, amounts = hand.action_info, hand.action_amounts
+            for i in range(len(info) // 3):
+                code = info[3 * i + 2]
+                action_rows.append((row_id, i, info[3 * i], info[3 * i + 1], code & ~ALL_IN, 1 if code & ALL_IN else 0, amounts[2 * i], amounts[2 * i + 1]))
+        return hand_ids, hand_rows, player_rows, street_rows, action_rows
+
+    def insert_rows(self, rows):
+        """Insert rows made by batch_rows, must be called inside a transaction. Returns number of inserted hands."""
+        connection = self.connection
+        hand_ids, hand_rows, player_rows, street_rows, action_rows = rows
+        for table in ["players", "streets", "actions"]:
+            connection.executemany(f"DELETE FROM {table} WHERE hand = (SELECT id FROM hands WHERE hand_id = ? AND tournament = ?)", hand_ids)
+        connection.executemany("DELETE FROM hands WHERE hand_id = ? AND tournament = ?", hand_ids)
+        # Transaction holds the write lock, so row ids after the biggest saved id are free
+        base = connection.execute("SELECT COALESCE(MAX(id), 0) FROM hands").fetchone()[0]
+        moved = lambda table_rows: [(row[0] + base,) + row[1:] for row in table_rows]
+        connection.executemany("INSERT INTO hands VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", moved(hand_rows))
+        connection.executemany("INSERT INTO players VALUES (?, ?, ?, ?, ?, ?)", moved(player_rows))
+        connection.executemany("INSERT INTO streets VALUES (?, ?, ?, ?)", moved(street_rows))
+        connection.executemany("INSERT INTO actions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", moved(action_rows))
+        return len(hand_rows)
+
+    def save_player_counters(self, source, tournament, counters, players=None):
+        """
+        Save counters of players parsed from source file in one transaction and update total counters of
+        the players by the difference to counters saved earlier from the file. If players is None, counters
+        of the whole file are replaced, otherwise only counters of given players are saved.
+        """
+        source = source_key(source)
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if players is None:
+                old_rows = connection.execute(f"SELECT player, {counter_list} FROM player_stats WHERE source = ? AND tournament = ?", (source, tournament)).fetchall()
+                players = set(counters) | {row[0] for row in old_rows}
+            else:
+                old_rows = []
+                for player in players:
+                    old_rows.extend(connection.execute(f"SELECT player, {counter_list} FROM player_stats WHERE player = ? AND tournament = ? AND source = ?", (player, tournament, source)))
+            old_values = {row[0]: row[1:] for row in old_rows}
+            zero = [0] * len(counter_columns)
+            delta_rows, stat_rows, removed = [], [], []
+            for player in players:
+                new = counter_values(counters[player]) if player in counters else zero
+                old = old_values.get(player, zero)
+                delta_rows.append([player, tournament] + [n - o for n, o in zip(new, old)])
+                if player in counters:
+                    stat_rows.append([player, tournament, source] + new)
+                else:
+                    removed.append((player, tournament, source))
+            updates = ", ".join(f'"{c}" = "{c}" + excluded."{c}"' for c in counter_columns)
+            placeholders = ", ".join("?" * len(counter_columns))
+            connection.executemany(f"INSERT INTO player_totals (player, tournament, {counter_list}) VALUES (?, ?, {placeholders}) ON CONFLICT (player, tournament) DO UPDATE SET {updates}", delta_rows)
+            connection.executemany(f"INSERT OR REPLACE INTO player_stats (player, tournament, source, {counter_list}) VALUES (?, ?, ?, {placeholders})", stat_rows)
+            connection.executemany("DELETE FROM player_stats WHERE player = ? AND tournament = ? AND source = ?", removed)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return players
+
+    def player_totals(self, players, tournament=0):
+        """Return total counters of players over all files as dict of name and PlayerCounters"""
+        totals = {}
+        for player in players:
+            row = self.connection.execute(f"SELECT {counter_list} FROM player_totals WHERE player = ? AND tournament = ?", (player, tournament)).fetchone()
+            if row is not None:
+                totals[player] = counters_from_values(row)
+        return totals
+
+    def player_names(self, min_hands=1, tournament=0):
+        """Return names of players with at least min_hands played hands, most played first"""
+        rows = self.connection.execute("SELECT player FROM player_totals WHERE tournament = ? AND played_hands >= ? ORDER BY played_hands DESC, player",
+            (tournament, min_hands))
+        return [row[0] for row in rows]
+
+    def load_equities(self, hand_ids):
+        """Return dict of saved all-in equities of hero by hand id"""
+        equities = {}
+        hand_ids = list(set(hand_ids))
+        for i in range(0, len(hand_ids), 500):
+            part = hand_ids[i:i + 500]
+            rows = self.connection.execute(f"SELECT hand_id, equity FROM all_in_equity WHERE hand_id IN ({', '.join('?' * len(part))})", part)
+            equities.update(rows)
+        return equities
+
+    def save_equities(self, equities):
+        """Save dict of all-in equities of hero by hand id"""
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("INSERT OR REPLACE INTO all_in_equity VALUES (?, ?)", equities.items())
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def has_player_stats(self, source):
+        """Check if player counters of source file are found from the store"""
+        return self.connection.execute("SELECT 1 FROM player_stats WHERE source = ? LIMIT 1", (source_key(source),)).fetchone() is not None
+
+    def has_source(self, source):
+        """Check if hands parsed from source file are found from the store"""
+        return self.connection.execute("SELECT 1 FROM hands WHERE source = ? LIMIT 1", (source_key(source),)).fetchone() is not None
+
+    def hand_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM hands").fetchone()[0]
+
+    def hand_keys(self):
+        """Generator that yields keys of all hands in order of hand ids"""
+        return self.query_hand_keys()
+
+    def query_hand_keys(self, filters=(), hero_position=None, min_pot_size=None, min_hand_value=None):
+        """
+        Generator that yields keys of hands matching all filters in order of hand ids.
+        Filters are names from hand_filters, which are evaluated from precomputed columns of hands table.
+        Rows are fetched from SQLite in pages while the generator is consumed.
+        """
+        where, parameters = filter_conditions(filters, hero_position, min_pot_size, min_hand_value)
+        cursor = self.connection.execute(f"SELECT hand_key FROM hands{where} ORDER BY hand_id, tournament", parameters)
+        while True:
+            rows = cursor.fetchmany(insert_batch_size)
+            if not rows:
+                return
+            for (hand_key,) in rows:
+                yield hand_key
+
+    def count_hands(self, filters=(), hero_position=None, min_pot_size=None, min_hand_value=None):
+        """Return number of hands matching all filters"""
+        where, parameters = filter_conditions(filters, hero_position, min_pot_size, min_hand_value)
+        return self.connection.execute(f"SELECT COUNT(*) FROM hands{where}", parameters).fetchone()[0]
+
+    def hand_keys_page(self, offset, limit, filters=(), hero_position=None, min_pot_size=None, min_hand_value=None):
+        """
+        Return keys of hands matching all filters from given position of the ordered result. Rows before the position
+        are skipped in an index, so this is used for jumps and hand_keys_from for the next or previous page.
+        """
+        where, parameters = filter_conditions(filters, hero_position, min_pot_size, min_hand_value)
+        rows = self.connection.execute(f"SELECT hand_key FROM hands{where} ORDER BY hand_id, tournament LIMIT ? OFFSET ?", parameters + [limit, offset])
+        return [hand_key for (hand_key,) in rows]
+
+    def hand_keys_from(self, hand_key, limit, filters=(), hero_position=None, min_pot_size=None, min_hand_value=None, backward=False):
+        """
+        Return keys of up to limit hands matching all filters that come after given hand in the ordered result,
+        or before it when backward. Hands are found from the position of given hand in the index, so reading
+        the next page doesn't skip over earlier rows like OFFSET does.
+        """
+        where, parameters = filter_conditions(filters, hero_position, min_pot_size, min_hand_value)
+        comparison, order = ("<", "DESC") if backward else (">", "ASC")
+        where = f"{where} AND" if where else " WHERE"
+        rows = self.connection.execute(f"""SELECT hand_key FROM hands{where}
+            (hand_id, tournament) {comparison} (SELECT hand_id, tournament FROM hands WHERE hand_key = ?)
+            ORDER BY hand_id {order}, tournament {order} LIMIT ?""", parameters + [hand_key, limit])
+        keys = [hand_key for (hand_key,) in rows]
+        if backward:
+            keys.reverse()
+        return keys
+
+    def load_hand(self, hand_key):
+        """Load one hand with its players, streets and actions, returns None if hand is not found"""
+        connection = self.connection
+        row = connection.execute("SELECT id, hand_id, tournament, stakes, date FROM hands WHERE hand_key = ?", (hand_key,)).fetchone()
+        if row is None:
+            return None
+        row_id, hand_id, tournament, stakes, date = row
+        hand = Hand(str(hand_id), tournament)
+        hand.stakes = stakes
+        hand.date = date
+        for seat, name, position, cards, profit in connection.execute(
+                "SELECT seat, name, position, cards, profit FROM players WHERE hand = ? ORDER BY seat", (row_id,)):
+            hand.add_player(name)
+            hand.positions[seat] = position
+            hand.cards[seat] = cards
+            hand.profits[seat] = profit
+        for street, board, pot_size in connection.execute(
+                "SELECT street, board, pot_size FROM streets WHERE hand = ? ORDER BY street", (row_id,)):
+            if street > 0:
+                hand.start_street(board)
+            hand.pot_sizes[street] = pot_size
+        for street, seat, code, all_in, amount, total in connection.execute(
+                "SELECT street, seat, code, all_in, amount, total FROM actions WHERE hand = ? ORDER BY number", (row_id,)):
+            hand.action_info.extend((street, seat, code | ALL_IN if all_in else code))
+            hand.action_amounts.extend((amount, total))
+        return hand
+
+    def upgrade(self, hero_name, legacy_folder="./hands_db"):
+        """
+        Import hands from per-table JSON hand DB files of earlier versions when the store is new, in one transaction
+        """
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version >= HAND_STORE_VERSION:
+                connection.execute("ROLLBACK")
+                return
+            count = self.import_json_folder(hero_name, legacy_folder)
+            connection.execute(f"PRAGMA user_version = {HAND_STORE_VERSION}")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        if count:
+            print(f"Imported {count} hands from JSON hand DB files")
+
+    def import_json_folder(self, hero_name, folder):
+        """
+        Import hands from per-table JSON hand DB files, returns number of imported hands
+        """
+        count = 0
+        if os.path.exists(folder):
+            for file_name in sorted(os.listdir(folder)):
+                if file_name.endswith("_db.json"):
+                    with open(os.path.join(folder, file_name)) as json_file:
+                        data = json.load(json_file)
+                    if data:
+                        hands = ((hand_key, Hand.from_json(hand_key, hand_data)) for hand_key, hand_data in data.items())
+                        count += self.insert_hands(file_name, hero_name, hands)
+        return count
+
+class PlayerStatsCache:
+    """
+    LRU cache of total counters of recently seated players in the format of stats JSON files. Players are read
+    from hand store only when they are not in the cache, and changed players must be invalidated after their
+    counters are saved. Cache can be shared by threads, but every thread must pass its own HandStore.
+    """
+    def __init__(self, capacity=player_cache_size):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_stats(self, store, players, tournament=0):
+        """Return stats of players that have counters in store, as dict of name and stats"""
+        stats = {}
+        missing = []
+        with self.lock:
+            for player in players:
+                key = (player, tournament)
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    stats[player] = self.entries[key]
+                else:
+                    missing.append(player)
+        if missing:
+            loaded = {player: counters.to_json() for player, counters in store.player_totals(missing, tournament).items()}
+            with self.lock:
+                for player, player_stats in loaded.items():
+                    self.entries[(player, tournament)] = player_stats
+                while len(self.entries) > self.capacity:
+                    self.entries.popitem(last=False)
+            stats.update(loaded)
+        return stats
+
+    def invalidate(self, players=None, tournament=0):
+        """Forget given players, or every player if players is None"""
+        with self.lock:
+            if players is None:
+                self.entries.clear()
+            else:
+                for player in players:
+                    self.entries.pop((player, tournament), None)
+
+def open_hand_store(hero_name, path=HAND_STORE_FILE):
+    """
+    Function that opens hand store, hands of old JSON hand DB files are imported when store is opened first time
+    """
+    store = HandStore(path)
+    store.upgrade(hero_name, os.path.dirname(path) or ".")
+    return store
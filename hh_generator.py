@@ -0,0 +1,351 @@
+"""
+Generator for synthetic PokerStars 6-max hand history files, used for benchmarking parsing of AceTracker.py.
+Same seed always produces the same files.
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+from hand_model import format_amount
+
+RANKS = "23456789TJQKA"
+SUITS = "cdhs"
+DECK = [r + s for r in RANKS for s in SUITS]
+
+PLAYER_NAMES = [
+    "AceHunter77", "RiverRat_99", "NitSlayer", "FishFinder", "ValueTown",
+    "BluffMaster3k", "Grinder_Joe", "ShortStackSam", "TiltProof", "PotOdds42",
+    "SuitedConnect", "CheckRaiseKing", "FoldEquity", "SnapCaller", "OverBetOlly",
+]
+
+SIX_POSITIONS = ["bb", "sb", "bu", "co", "hj", "utg"]
+POSITION_NAMES = {"bu": "button", "sb": "small blind", "bb": "big blind"}
+
+# Street where player folded, as written to the summary lines
+fold_texts = {"pre-flop": "before Flop", "flop": "on the Flop", "turn": "on the Turn", "river": "on the River"}
+
+class HandHistoryGenerator:
+    """
+    Writes realistic looking PokerStars hand histories for one table: blinds, raises, all-ins,
+    uncalled bets, cash-outs, showdowns and players sitting out. Hero always sits in seat 1.
+    """
+    def __init__(self, hero_name="Hero", seed=0, tournament_mode=0, small_blind=0.02, big_blind=0.05,
+                 table_name="Aase II", start_hand_id=240000000000, start_time=None):
+        self.rng = random.Random(seed)
+        self.hero_name = hero_name
+        self.tournament_mode = tournament_mode
+        self.small_blind = 10 if tournament_mode else small_blind
+        self.big_blind = 20 if tournament_mode else big_blind
+        self.table_name = table_name
+        self.hand_id = start_hand_id
+        self.tournament_id = 3000000000 + seed
+        self.time = start_time or datetime(2024, 1, 1, 12, 0, 0)
+        # Seat 0 always belongs to hero, other seats are filled from the name pool
+        villains = self.rng.sample(PLAYER_NAMES, 5)
+        self.seats = [hero_name] + villains
+        self.stacks = [self.buy_in() for _ in self.seats]
+        self.sitting_out = [False] * 6
+        self.button = 0
+        # Street where each seat folded in the current hand
+        self.fold_streets = {}
+
+    def buy_in(self):
+        if self.tournament_mode:
+            return 1500.0
+        return round(self.big_blind * self.rng.choice([40, 60, 100, 100, 100, 150]), 2)
+
+    def amount(self, value):
+        return format_amount(value, self.tournament_mode)
+
+    def round_amount(self, value):
+        if self.tournament_mode:
+            return float(int(round(value)))
+        return round(value, 2)
+
+    def file_name(self):
+        """PokerStars style file name for this table"""
+        date = self.time.strftime("%Y%m%d")
+        if self.tournament_mode:
+            return f"HH{date} T{self.tournament_id} No Limit Hold'em $1 + $0.10.txt"
+        return f"HH{date} {self.table_name} - ${self.small_blind:.2f}-${self.big_blind:.2f} - USD No Limit Hold'em.txt"
+
+    def header(self):
+        stamp = self.time.strftime("%Y/%m/%d %H:%M:%S")
+        if self.tournament_mode:
+            return (f"PokerStars Hand #{self.hand_id}: Tournament #{self.tournament_id}, $1.00+$0.10 USD "
+                    f"Hold'em No Limit - Level I ({int(self.small_blind)}/{int(self.big_blind)}) - {stamp} ET")
+        return (f"PokerStars Hand #{self.hand_id}:  Hold'em No Limit (${self.small_blind:.2f}/${self.big_blind:.2f} USD)"
+                f" - {stamp} ET")
+
+    def generate_hand(self):
+        """Generate one hand and return it as a list of lines"""
+        rng = self.rng
+        lines = [self.header()]
+        # Randomly seat players in / out, hero always plays
+        for i in range(1, 6):
+            if rng.random() < 0.03:
+                self.sitting_out[i] = not self.sitting_out[i]
+            if self.stacks[i] < self.big_blind * 2:
+                self.stacks[i] = self.buy_in()
+        if self.stacks[0] < self.big_blind * 2:
+            self.stacks[0] = self.buy_in()
+        active = [i for i in range(6) if not self.sitting_out[i]]
+        if len(active) < 3:
+            for i in range(6):
+                self.sitting_out[i] = False
+            active = list(range(6))
+        # Move button to next active seat
+        self.button = next(s for s in [(self.button + k) % 6 for k in range(1, 7)] if s in active)
+        order = active[active.index(self.button):] + active[:active.index(self.button)]
+        table_kind = f"'{self.tournament_id} 1'" if self.tournament_mode else f"'{self.table_name}'"
+        lines.append(f"Table {table_kind} 6-max Seat #{self.button + 1} is the button")
+        for i in range(6):
+            line = f"Seat {i + 1}: {self.seats[i]} ({self.amount(self.stacks[i])} in chips)"
+            if self.sitting_out[i]:
+                line += " is sitting out"
+            lines.append(line)
+
+        # Blinds, order after button is sb, bb, utg...
+        sb_seat, bb_seat = order[1], order[2]
+        invested_total = {s: 0.0 for s in active}
+        street_bets = {s: 0.0 for s in active}
+        all_in = set()
+        folded = set()
+
+        def put(seat, amount):
+            # Negative amount returns chips to the player (uncalled bets)
+            amount = self.round_amount(min(amount, self.stacks[seat]))
+            self.stacks[seat] = self.round_amount(self.stacks[seat] - amount)
+            street_bets[seat] = self.round_amount(street_bets[seat] + amount)
+            invested_total[seat] = self.round_amount(invested_total[seat] + amount)
+            if self.stacks[seat] <= 0:
+                all_in.add(seat)
+            return amount
+
+        put(sb_seat, self.small_blind)
+        lines.append(f"{self.seats[sb_seat]}: posts small blind {self.amount(self.small_blind)}")
+        put(bb_seat, self.big_blind)
+        lines.append(f"{self.seats[bb_seat]}: posts big blind {self.amount(self.big_blind)}")
+
+        deck = DECK[:]
+        rng.shuffle(deck)
+        hole = {s: [deck.pop(), deck.pop()] for s in active}
+        lines.append("*** HOLE CARDS ***")
+        lines.append(f"Dealt to {self.hero_name} [{hole[0][0]} {hole[0][1]}]")
+
+        board = []
+        preflop_order = order[3:] + order[:3]
+        postflop_order = order[1:] + order[:1]
+        streets = [("pre-flop", preflop_order), ("flop", postflop_order), ("turn", postflop_order), ("river", postflop_order)]
+        winner_by_fold = None
+        for street, act_order in streets:
+            if street != "pre-flop":
+                for seat in street_bets:
+                    street_bets[seat] = 0.0
+                if street == "flop":
+                    board += [deck.pop(), deck.pop(), deck.pop()]
+                    lines.append(f"*** FLOP *** [{' '.join(board)}]")
+                elif street == "turn":
+                    board.append(deck.pop())
+                    lines.append(f"*** TURN *** [{' '.join(board[:3])}] [{board[3]}]")
+                else:
+                    board.append(deck.pop())
+                    lines.append(f"*** RIVER *** [{' '.join(board[:4])}] [{board[4]}]")
+            if winner_by_fold is None and len([s for s in active if s not in folded and s not in all_in]) >= 2:
+                winner_by_fold = self.betting_round(lines, street, act_order, street_bets, folded, all_in, put)
+            if winner_by_fold is not None:
+                break
+
+        pot = self.round_amount(sum(invested_total.values()))
+        rake = 0.0 if self.tournament_mode else self.round_amount(min(pot * 0.05, 3 * self.big_blind)) if board else 0.0
+        collected = self.round_amount(pot - rake)
+        summary_results = {}
+        if winner_by_fold is not None:
+            lines.append(f"{self.seats[winner_by_fold]} collected {self.amount(collected)} from pot")
+            self.stacks[winner_by_fold] = self.round_amount(self.stacks[winner_by_fold] + collected)
+            summary_results[winner_by_fold] = ("collected", collected)
+        else:
+            lines.append("*** SHOW DOWN ***")
+            contenders = [s for s in active if s not in folded]
+            winner = rng.choice(contenders)
+            cashed_out = None
+            if not self.tournament_mode and len(contenders) == 2 and rng.random() < 0.1:
+                cashed_out = rng.choice(contenders)
+                cash_out = self.round_amount(collected * rng.uniform(0.3, 0.9))
+                fee = self.round_amount(cash_out * 0.01)
+                lines.append(f"{self.seats[cashed_out]} cashed out the hand for {self.amount(cash_out)} | Cash Out Fee {self.amount(fee)}")
+                self.stacks[cashed_out] = self.round_amount(self.stacks[cashed_out] + cash_out)
+            for seat in contenders:
+                lines.append(f"{self.seats[seat]}: shows [{hole[seat][0]} {hole[seat][1]}] (a pair)")
+            lines.append(f"{self.seats[winner]} collected {self.amount(collected)} from pot")
+            if winner != cashed_out:
+                self.stacks[winner] = self.round_amount(self.stacks[winner] + collected)
+            for seat in contenders:
+                if seat == winner:
+                    summary_results[seat] = ("won", collected, seat == cashed_out)
+                else:
+                    summary_results[seat] = ("lost", 0.0, seat == cashed_out)
+
+        lines.append("*** SUMMARY ***")
+        rake_text = f" | Rake {self.amount(rake)}" if not self.tournament_mode else ""
+        lines.append(f"Total pot {self.amount(pot)}{rake_text}")
+        if board:
+            lines.append(f"Board [{' '.join(board)}]")
+        for seat in active:
+            name = self.seats[seat]
+            pos = ""
+            if seat == self.button:
+                pos = " (button)"
+            elif seat == sb_seat:
+                pos = " (small blind)"
+            elif seat == bb_seat:
+                pos = " (big blind)"
+            prefix = f"Seat {seat + 1}: {name}{pos}"
+            result = summary_results.get(seat)
+            cards = f"[{hole[seat][0]} {hole[seat][1]}]"
+            if result is None:
+                lines.append(f"{prefix} folded {self.fold_streets.get(seat, fold_texts['pre-flop'])}")
+            elif result[0] == "collected":
+                lines.append(f"{prefix} collected ({self.amount(result[1])})")
+            elif result[0] == "won":
+                tail = " (Pot not awarded as player cashed out)" if result[2] else ""
+                lines.append(f"{prefix} showed {cards} and won ({self.amount(result[1])}) with a pair{tail}")
+            else:
+                tail = " (player cashed out)" if result[2] else ""
+                lines.append(f"{prefix} showed {cards} and lost with a pair{tail}")
+        self.fold_streets = {}
+        self.hand_id += 1
+        self.time += timedelta(seconds=rng.randint(20, 90))
+        return lines
+
+    def betting_round(self, lines, street, act_order, street_bets, folded, all_in, put):
+        """Simulate one betting round, returns winning seat if everyone else folded"""
+        rng = self.rng
+        current_bet = max(street_bets.values())
+        last_aggressor = None
+        raises = 0
+        acted = set()
+        while True:
+            pending = [s for s in act_order if s not in folded and s not in all_in
+                       and (s not in acted or street_bets[s] < current_bet)]
+            if not pending:
+                break
+            for seat in act_order:
+                if seat in folded or seat in all_in:
+                    continue
+                if seat in acted and street_bets[seat] >= current_bet:
+                    continue
+                remaining = [s for s in act_order if s not in folded]
+                if len(remaining) == 1:
+                    break
+                name = self.seats[seat]
+                to_call = self.round_amount(current_bet - street_bets[seat])
+                if rng.random() < 0.01:
+                    lines.append(f"{name} has timed out")
+                if rng.random() < 0.005:
+                    lines.append(f'{name} said, "nice hand"')
+                roll = rng.random()
+                if to_call <= 0:
+                    if roll < 0.6 or raises >= 3:
+                        lines.append(f"{name}: checks")
+                    elif current_bet > 0:
+                        # Big blind option
+                        before = street_bets[seat]
+                        put(seat, current_bet * 3 - before)
+                        total = street_bets[seat]
+                        tail = " and is all-in" if seat in all_in else ""
+                        lines.append(f"{name}: raises {self.amount(self.round_amount(total - current_bet))} to {self.amount(total)}{tail}")
+                        current_bet = total
+                        last_aggressor = seat
+                        raises += 1
+                    else:
+                        amount = self.round_amount(max(self.big_blind, rng.uniform(0.3, 1.0) * max(sum(street_bets.values()), self.big_blind * 2)))
+                        amount = put(seat, amount)
+                        tail = " and is all-in" if seat in all_in else ""
+                        lines.append(f"{name}: bets {self.amount(amount)}{tail}")
+                        current_bet = street_bets[seat]
+                        last_aggressor = seat
+                        raises += 1
+                else:
+                    if roll < 0.45:
+                        lines.append(f"{name}: folds")
+                        folded.add(seat)
+                        self.fold_streets[seat] = fold_texts[street]
+                    elif roll < 0.85 or raises >= 3:
+                        amount = put(seat, to_call)
+                        tail = " and is all-in" if seat in all_in else ""
+                        lines.append(f"{name}: calls {self.amount(amount)}{tail}")
+                    else:
+                        target = self.round_amount(current_bet * rng.choice([2.5, 3.0, 3.5]) if current_bet else self.big_blind * 3)
+                        if rng.random() < 0.1:
+                            target = street_bets[seat] + self.stacks[seat]
+                        before = street_bets[seat]
+                        put(seat, target - before)
+                        total = street_bets[seat]
+                        tail = " and is all-in" if seat in all_in else ""
+                        if total <= current_bet:
+                            lines.append(f"{name}: calls {self.amount(self.round_amount(total - before))}{tail}")
+                        else:
+                            lines.append(f"{name}: raises {self.amount(self.round_amount(total - current_bet))} to {self.amount(total)}{tail}")
+                            current_bet = total
+                            last_aggressor = seat
+                            raises += 1
+                acted.add(seat)
+            remaining = [s for s in act_order if s not in folded]
+            if len(remaining) == 1:
+                break
+        remaining = [s for s in act_order if s not in folded]
+        # Return uncalled part of the biggest bet
+        contributions = sorted(((street_bets[s], s) for s in remaining), reverse=True)
+        if contributions:
+            top, top_seat = contributions[0]
+            second = contributions[1][0] if len(contributions) > 1 else max(
+                [street_bets[s] for s in street_bets if s != top_seat] + [0.0])
+            if top > second:
+                uncalled = self.round_amount(top - second)
+                lines.append(f"Uncalled bet ({self.amount(uncalled)}) returned to {self.seats[top_seat]}")
+                put(top_seat, -uncalled)
+                all_in.discard(top_seat)
+        if len(remaining) == 1:
+            return remaining[0]
+        return None
+
+    def write(self, target_dir, hands):
+        """Write a table file with the given number of hands, returns the file path"""
+        path = os.path.join(target_dir, self.file_name())
+        with open(path, "w", encoding="utf-8") as target:
+            for _ in range(hands):
+                target.write("\n".join(self.generate_hand()))
+                target.write("\n\n\n")
+        return path
+
+def generate_history_folder(target_dir, tables=6, hands=1000, hero_name="Hero", seed=0, tournament_tables=0):
+    """
+    Function that writes cash game tables and tournament tables with given number of hands to target folder.
+    Every table gets its own seed and hand ids, so files don't share hands. Returns paths of written files.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    files = []
+    start_time = datetime(2024, 1, 1, 12, 0, 0)
+    for i in range(tables + tournament_tables):
+        tournament_mode = 1 if i >= tables else 0
+        generator = HandHistoryGenerator(hero_name, seed=seed * 1000 + i, tournament_mode=tournament_mode,
+            table_name=f"Synthetic {i + 1}", start_hand_id=240000000000 + i * 10 * hands,
+            start_time=start_time + timedelta(days=i))
+        files.append(generator.write(target_dir, hands))
+    return files
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic PokerStars hand history files")
+    parser.add_argument("target_dir", help="folder where table files are written")
+    parser.add_argument("--tables", type=int, default=6, help="number of cash game tables")
+    parser.add_argument("--tournaments", type=int, default=0, help="number of tournament tables")
+    parser.add_argument("--hands", type=int, default=1000, help="hands per table")
+    parser.add_argument("--hero", default="Hero", help="name of hero")
+    parser.add_argument("--seed", type=int, default=0, help="seed of random generator")
+    args = parser.parse_args()
+    files = generate_history_folder(args.target_dir, args.tables, args.hands, args.hero, args.seed, args.tournaments)
+    print(f"Wrote {len(files)} files with {args.hands} hands each to {args.target_dir}")
+
+if __name__ == "__main__":
+    main()
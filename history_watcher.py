@@ -0,0 +1,203 @@
+"""
+Library for watching hand history folder of AceTracker.py, so tables are parsed as soon as new hands are written
+"""
+import os
+import queue
+import threading
+import time
+
+# Watchdog uses inotify, ReadDirectoryChangesW or FSEvents, without it files are polled
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# Kinds of file changes sent by HistoryWatcher
+CREATED = "created"
+APPENDED = "appended"
+REPLACED = "replaced"
+DELETED = "deleted"
+
+def merge_changes(changes, new_changes):
+    """
+    Function that adds new changes to changes, file created and then appended before changes are handled stays created
+    """
+    for path, kind in new_changes.items():
+        if changes.get(path) != CREATED or kind == DELETED:
+            changes[path] = kind
+
+class WatchdogHandler(FileSystemEventHandler):
+    """Passes paths of changed files from watchdog observer thread to HistoryWatcher"""
+    def __init__(self, raw_events):
+        super().__init__()
+        self.raw_events = raw_events
+
+    def on_any_event(self, event):
+        if not event.is_directory:
+            self.raw_events.put(event.src_path)
+            if getattr(event, "dest_path", None):
+                self.raw_events.put(event.dest_path)
+
+class HistoryWatcher:
+    """
+    Watches files of hand history folder and sends batches of changes through a queue. Changes are coalesced
+    per file and a batch is sent when no new change has come in debounce seconds, or max_delay seconds after
+    the first change, so a burst of writes from the poker client causes only one refresh.
+    Without watchdog, files that changed recently are polled every poll_interval seconds, and folder is scanned
+    again when its modification time changes or every scan_interval seconds. Every change is checked from file
+    size, so a file is reported as appended only when it has grown.
+    """
+    def __init__(self, path, debounce=0.15, max_delay=1.0, poll_interval=0.5, scan_interval=30.0, hot_period=600.0, use_watchdog=True):
+        self.path = path
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.scan_interval = scan_interval
+        # Files changed during hot_period are polled more often than the rest of the folder
+        self.hot_period = hot_period
+        self.use_watchdog = use_watchdog and Observer is not None
+        self.raw_events = queue.Queue()
+        self.changes = queue.Queue()
+        self.stop_event = threading.Event()
+        # Size and modification time of every known file, and time of its latest change
+        self.file_states = {}
+        self.changed_at = {}
+        self.folder_mtime = None
+        self.last_scan = 0.0
+        self.observer = None
+        self.thread = None
+
+    def start(self):
+        # Remember current files without reporting them
+        self.scan_folder(None)
+        if self.use_watchdog:
+            self.observer = Observer()
+            self.observer.schedule(WatchdogHandler(self.raw_events), self.path, recursive=False)
+            self.observer.start()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.raw_events.put(None)
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        pending = {}
+        first_change = last_change = None
+        next_poll = time.monotonic() + self.poll_interval
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            # Without pending changes watchdog mode sleeps until next event
+            timeout = None if self.use_watchdog else max(0.0, next_poll - now)
+            if pending:
+                flush_at = min(last_change + self.debounce, first_change + self.max_delay)
+                timeout = max(0.0, flush_at - now) if timeout is None else max(0.0, min(timeout, flush_at - now))
+            changed_paths = set()
+            try:
+                changed_paths.add(self.raw_events.get(timeout=timeout))
+                while True:
+                    changed_paths.add(self.raw_events.get_nowait())
+            except queue.Empty:
+                pass
+            changed_paths.discard(None)
+
+            found = {}
+            for path in changed_paths:
+                self.check_file(path, found)
+            now = time.monotonic()
+            if not self.use_watchdog and now >= next_poll:
+                self.poll(found, now)
+                next_poll = now + self.poll_interval
+            if found:
+                merge_changes(pending, found)
+                last_change = now
+                if first_change is None:
+                    first_change = now
+            if pending and (now - last_change >= self.debounce or now - first_change >= self.max_delay):
+                self.changes.put(pending)
+                pending = {}
+                first_change = last_change = None
+
+    def poll(self, found, now):
+        """Check recently changed files, and whole folder if its file list changed or scan_interval has passed"""
+        try:
+            folder_mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if folder_mtime != self.folder_mtime or now - self.last_scan >= self.scan_interval:
+            self.scan_folder(found)
+            return
+        for path, changed_at in list(self.changed_at.items()):
+            if now - changed_at > self.hot_period:
+                del self.changed_at[path]
+            else:
+                self.check_file(path, found)
+
+    def scan_folder(self, found):
+        """
+        Check every file of the folder, found gets the ones that changed since previous check.
+        If found is None, files are only remembered.
+        """
+        self.last_scan = time.monotonic()
+        try:
+            self.folder_mtime = os.stat(self.path).st_mtime_ns
+            with os.scandir(self.path) as entries:
+                states = {entry.path: (entry.stat().st_size, entry.stat().st_mtime_ns) for entry in entries if entry.is_file()}
+        except OSError:
+            return
+        if found is None:
+            self.file_states = states
+            # Files written lately are likely tables still being played, so they are polled from the start
+            now, wall_time = time.monotonic(), time.time()
+            for path, (_, mtime_ns) in states.items():
+                if wall_time - mtime_ns / 1e9 < self.hot_period:
+                    self.changed_at[path] = now - (wall_time - mtime_ns / 1e9)
+            return
+        for path in set(states) | set(self.file_states):
+            self.check_file(path, found)
+
+    def check_file(self, path, found):
+        """Compare file with its previous state and add kind of change to found"""
+        previous = self.file_states.get(path)
+        try:
+            file_stat = os.stat(path)
+            state = (file_stat.st_size, file_stat.st_mtime_ns)
+        except OSError:
+            state = None
+        if state == previous:
+            return
+        if state is None:
+            kind = DELETED
+            del self.file_states[path]
+            self.changed_at.pop(path, None)
+        else:
+            if previous is None:
+                kind = CREATED
+            elif state[0] < previous[0]:
+                kind = REPLACED
+            elif state[0] > previous[0]:
+                kind = APPENDED
+            else:
+                # Only modification time changed, parser has nothing new to read
+                self.file_states[path] = state
+                return
+            self.file_states[path] = state
+            self.changed_at[path] = time.monotonic()
+        merge_changes(found, {path: kind})
+
+    def get_changes(self):
+        """Return all changes since previous call without blocking, as dict of path and kind of change"""
+        changes = {}
+        while True:
+            try:
+                batch = self.changes.get_nowait()
+            except queue.Empty:
+                return changes
+            merge_changes(changes, batch)
@@ -0,0 +1,235 @@
+"""
+Library for ingesting hand history folders for AceTracker.py
+"""
+import os
+import queue
+import threading
+from functools import partial
+from multiprocessing import Pool
+from utility import handle_txt_file, save_to_json, load_from_json
+from hand_store import open_hand_store, HandStore, source_key
+from bankroll import BankrollStore, BANKROLL_FOLDER, columns_from_rows, concatenate_columns, apply_all_in_ev
+from equity import spot_equities
+from profiler import RefreshProfiler, profile_stage
+from stats_engine import PlayerCounters, stat_names
+
+PARSE_CACHE_FILE = "./hud_data/parse_cache.json"
+PARSE_CACHE_VERSION = 3
+
+class IngestCancelled(Exception):
+    """Raised when ingestion is cancelled before all files were parsed"""
+
+def file_signature(source_file):
+    """
+    Function that returns size and modification time of a file, used for detecting changed files
+    """
+    file_stat = os.stat(source_file)
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+def load_parse_cache(hero_name, source=PARSE_CACHE_FILE):
+    """
+    Function that loads per-file parse results, cache is discarded if it was made for another hero
+    or with other registered stats
+    """
+    if os.path.exists(source):
+        cache = load_from_json(source)
+        if cache and cache.get("version") == PARSE_CACHE_VERSION and cache.get("hero") == hero_name and cache.get("stats") == list(stat_names):
+            return cache
+    return {"version": PARSE_CACHE_VERSION, "hero": hero_name, "stats": list(stat_names), "files": {}}
+
+def parse_table_file(source_file, hero_name, profile=False, trace_memory=False):
+    """
+    Function that parses one table file and returns result entry stored in parse cache.
+    Entry also has bankroll columns of hero hands, and profile of parsing if profile is set,
+    which must be removed before entry is cached. Equity of all-in hands is calculated here, so files
+    parsed by worker processes calculate it in parallel.
+    """
+    profiler = RefreshProfiler(source_file, trace_memory) if profile else None
+    single_table_stats, _, bankroll_rows, all_in_spots = handle_txt_file(source_file, hero_name, profiler=profiler)
+    hero_stats = None
+    if single_table_stats:
+        hero_stats = single_table_stats.get(hero_name)
+    bankroll = columns_from_rows(bankroll_rows if hero_stats else [])
+    if hero_stats and all_in_spots:
+        with profile_stage(profiler, "all-in equity"):
+            store = HandStore()
+            try:
+                apply_all_in_ev(bankroll, all_in_spots, spot_equities(all_in_spots, store))
+            finally:
+                store.close()
+        if profiler is not None:
+            profiler.count("all-in hands", len(all_in_spots))
+    entry = {
+        "signature": file_signature(source_file),
+        "hero_stats": hero_stats,
+        "bankroll": bankroll
+    }
+    if profiler is not None:
+        entry["profile"] = profiler.finish().to_json()
+    return entry
+
+def is_cached(cache, source_file, store):
+    """
+    Function that checks if cached result of a file is still valid
+    """
+    entry = cache["files"].get(source_file)
+    if entry is None or entry["signature"] != file_signature(source_file):
+        return False
+    # Hands and player counters of the file must still be found from hand store
+    if entry["hero_stats"] and not (store.has_source(source_file) and store.has_player_stats(source_file)):
+        return False
+    return True
+
+def worker_count(workers=0):
+    """
+    Function that returns number of worker processes to use, 0 means one per CPU core
+    """
+    if workers and workers > 0:
+        return workers
+    return os.cpu_count() or 1
+
+def parse_table_files(files, hero_name, workers=0, profile=False, trace_memory=False):
+    """
+    Function that parses table files in a process pool and yields results in the same order as files
+    """
+    workers = min(worker_count(workers), len(files))
+    if workers <= 1:
+        for f in files:
+            yield parse_table_file(f, hero_name, profile, trace_memory)
+        return
+    # Each file is parsed independently, imap keeps results in order of the files
+    chunk_size = max(1, len(files) // (workers * 4))
+    with Pool(processes=workers) as pool:
+        yield from pool.imap(partial(parse_table_file, hero_name=hero_name, profile=profile, trace_memory=trace_memory), files, chunk_size)
+
+def collect_hero_statistics(files, hero_name, workers=0, cache_file=PARSE_CACHE_FILE, progress=None, cancel_event=None, profiler=None, bankroll_folder=BANKROLL_FOLDER):
+    """
+    Function that calculates hero statistics from all given table files and returns them with bankroll columns.
+    Only files that changed after previous call are parsed again, others are read from parse cache.
+    Hands of parsed files are appended to bankroll store, before parse cache is saved.
+    Changed files are parsed in parallel, but results are always merged in order of the files.
+    Progress callback gets number of parsed and total changed files. If cancel_event is set,
+    files parsed so far are kept in cache and IngestCancelled is raised.
+    Profiles of parsed files are merged to profiler, so their stage times are summed over worker processes.
+    """
+    with profile_stage(profiler, "cache check"):
+        cache = load_parse_cache(hero_name, cache_file)
+        # Opening the store imports old JSON hand DBs before workers start writing to it
+        store = open_hand_store(hero_name)
+        try:
+            changed_files = [f for f in files if not is_cached(cache, f, store)]
+        finally:
+            store.close()
+        bankroll = BankrollStore(bankroll_folder)
+        # Without bankroll store, hands of cached files must be parsed again
+        if bankroll.rows == 0 and any(entry["hero_stats"] for entry in cache["files"].values()):
+            changed_files = list(files)
+    if profiler is not None:
+        profiler.count("files", len(files))
+        profiler.count("changed files", len(changed_files))
+        profiler.count("worker processes", min(worker_count(workers), len(changed_files)))
+    if progress: progress(0, len(changed_files))
+    results = parse_table_files(changed_files, hero_name, workers, profiler is not None, profiler is not None and profiler.trace_memory)
+    new_hands = []
+    try:
+        for done, (f, entry) in enumerate(zip(changed_files, results), start=1):
+            profile = entry.pop("profile", None)
+            if profiler is not None and profile is not None:
+                profiler.merge(profile)
+            new_hands.append(entry.pop("bankroll"))
+            cache["files"][f] = entry
+            if progress: progress(done, len(changed_files))
+            if cancel_event is not None and cancel_event.is_set():
+                # Cached files are not parsed again, so their hands must be saved first
+                bankroll.append(concatenate_columns(new_hands))
+                save_to_json(cache_file, cache)
+                raise IngestCancelled()
+    finally:
+        # Closing the generator also terminates worker processes when cancelled
+        results.close()
+    with profile_stage(profiler, "bankroll write"):
+        added_hands = bankroll.append(concatenate_columns(new_hands))
+    if profiler is not None:
+        profiler.count("bankroll hands", added_hands)
+
+    with profile_stage(profiler, "stats merge"):
+        hero_files = [cache["files"][f]["hero_stats"] for f in files if cache["files"][f]["hero_stats"]]
+        statistics = {}
+        if hero_files:
+            total = PlayerCounters()
+            for hero_stats in hero_files:
+                total.merge(PlayerCounters.from_json(hero_stats))
+            statistics = total.to_json()
+
+    # Forget files that are not in the history folder anymore
+    current_files = set(files)
+    removed_files = [f for f in cache["files"] if f not in current_files]
+    for f in removed_files:
+        cache["files"].pop(f)
+    if changed_files or removed_files:
+        with profile_stage(profiler, "JSON write"):
+            save_to_json(cache_file, cache)
+
+    return statistics, bankroll.load()
+
+def list_cash_game_files(history_path):
+    """
+    Function that returns all cash game table files from hand history folder, as keys of hand store
+    """
+    return [source_key(os.path.join(history_path, f)) for f in os.listdir(history_path) if os.path.isfile(os.path.join(history_path, f)) and "USD No Limit Hold'em" in f]
+
+def ingest_history_folder(history_path, hero_name, workers=0, progress=None, cancel_event=None, profiler=None):
+    """
+    Function that calculates hero statistics from hand history folder and saves them to hud_data.
+    Returns statistics and bankroll columns, or None if folder has no cash game files.
+    """
+    with profile_stage(profiler, "file listing"):
+        files = list_cash_game_files(history_path)
+    if not files:
+        print("No files found from", history_path)
+        return None
+    statistics, bankroll = collect_hero_statistics(files, hero_name, workers, progress=progress, cancel_event=cancel_event, profiler=profiler)
+
+    with profile_stage(profiler, "JSON write"):
+        # Save to JSON file
+        save_to_json(target="./hud_data/hero_stats.json", json_data=statistics)
+    return statistics, bankroll
+
+class IngestWorker(threading.Thread):
+    """
+    Background thread that runs one ingestion job. Job is called with progress and cancel_event
+    keyword arguments, and all results are sent back as (event, payload) tuples through a queue,
+    so UI thread can poll them without blocking. Events are "progress", "done", "cancelled" and "error".
+    """
+    def __init__(self, job, *args, **kwargs):
+        super().__init__(daemon=True)
+        self.job = job
+        self.args = args
+        self.kwargs = kwargs
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        try:
+            result = self.job(*self.args, progress=self.report_progress, cancel_event=self.cancel_event, **self.kwargs)
+            self.events.put(("done", result))
+        except IngestCancelled:
+            self.events.put(("cancelled", None))
+        except Exception as e:
+            self.events.put(("error", e))
+
+    def report_progress(self, done, total):
+        self.events.put(("progress", (done, total)))
+
+    def cancel(self):
+        """Ask job to stop after the file it is currently parsing"""
+        self.cancel_event.set()
+
+    def get_events(self):
+        """Return all events received since previous call without blocking"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
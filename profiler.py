@@ -0,0 +1,153 @@
+"""
+Library for timing stages of refreshes in AceTracker.py, latest profile of every refresh is shown in settings screen
+"""
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Latest finished profile of each refresh, for example "full refresh" and "HUD refresh"
+last_profiles = {}
+profiles_lock = threading.Lock()
+
+# Settings changed from settings screen, used when next refresh starts
+profile_settings = {"trace_memory": False}
+
+# Number of biggest allocation sites kept from tracemalloc snapshot
+top_allocation_count = 10
+
+class RefreshProfiler:
+    """
+    Collects time and number of calls of every stage and named counters of one refresh.
+    Time of a stage doesn't include time of stages run inside it, so stage times add up to time of the refresh.
+    Profiles of worker processes can be merged, then stage times are summed over workers.
+    """
+    def __init__(self, name, trace_memory=False, started_at=None):
+        self.name = name
+        self.stages = {}
+        self.counters = {}
+        # Time of child stages of every open stage
+        self.open_stages = []
+        # Profile can start earlier than the profiler is created, started_at is time.perf_counter() of the start
+        self.start_time = started_at if started_at is not None else time.perf_counter()
+        self.started = time.time() - (time.perf_counter() - self.start_time)
+        self.total_seconds = None
+        self.peak_memory = None
+        self.top_allocations = []
+        self.trace_memory = trace_memory and not tracemalloc.is_tracing()
+        if self.trace_memory:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager that adds time spent inside it to the stage"""
+        start = time.perf_counter()
+        self.open_stages.append(0.0)
+        try:
+            yield
+        finally:
+            child_seconds = self.open_stages.pop()
+            elapsed = time.perf_counter() - start
+            self.record(name, elapsed - child_seconds, 1)
+            if self.open_stages:
+                self.open_stages[-1] += elapsed
+
+    def add_time(self, name, seconds, calls=1):
+        """Add time measured outside of stage() to the stage, time is taken from the stage it was measured in"""
+        self.record(name, seconds, calls)
+        if self.open_stages:
+            self.open_stages[-1] += seconds
+
+    def record(self, name, seconds, calls):
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [seconds, calls]
+        else:
+            stage[0] += seconds
+            stage[1] += calls
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, profile):
+        """Add stages, counters and memory of profile made by to_json, usually from a worker process"""
+        for name, stage in profile["stages"].items():
+            self.record(name, stage["seconds"], stage["calls"])
+        for name, n in profile["counters"].items():
+            self.count(name, n)
+        if profile.get("peak_memory_mb") is not None:
+            self.peak_memory = max(self.peak_memory or 0, int(profile["peak_memory_mb"] * 2**20))
+            self.top_allocations = sorted(self.top_allocations + profile["top_allocations"],
+                key=lambda a: a["size_kb"], reverse=True)[:top_allocation_count]
+
+    def finish(self):
+        """Stop the clock and memory tracing, returns self"""
+        if self.total_seconds is None:
+            self.total_seconds = time.perf_counter() - self.start_time
+        if self.trace_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.peak_memory = max(self.peak_memory or 0, peak)
+            allocations = [{"location": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "size_kb": round(s.size / 1024, 1), "count": s.count}
+                for s in snapshot.statistics("lineno")[:top_allocation_count]]
+            self.top_allocations = sorted(self.top_allocations + allocations, key=lambda a: a["size_kb"], reverse=True)[:top_allocation_count]
+        return self
+
+    def to_json(self):
+        total_seconds = self.total_seconds if self.total_seconds is not None else time.perf_counter() - self.start_time
+        return {
+            "name": self.name,
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+            "total_seconds": round(total_seconds, 6),
+            "stages": {name: {"seconds": round(seconds, 6), "calls": calls} for name, (seconds, calls) in
+                sorted(self.stages.items(), key=lambda item: item[1][0], reverse=True)},
+            "counters": dict(sorted(self.counters.items())),
+            "peak_memory_mb": round(self.peak_memory / 2**20, 2) if self.peak_memory is not None else None,
+            "top_allocations": self.top_allocations
+        }
+
+def profile_stage(profiler, name):
+    """
+    Function that returns stage context of profiler, or context that does nothing if profiler is None
+    """
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name)
+
+def save_profile(profiler):
+    """
+    Function that finishes profiler and keeps it as the latest profile of its refresh
+    """
+    profile = profiler.finish().to_json()
+    with profiles_lock:
+        last_profiles[profiler.name] = profile
+    return profile
+
+def get_profiles():
+    with profiles_lock:
+        return dict(last_profiles)
+
+def format_profile(profile):
+    """
+    Function that returns profile as text table of stages, counters and memory
+    """
+    total = profile["total_seconds"]
+    lines = [f"{profile['name']} at {profile['started']}, took {total:.3f} s"]
+    if profile["counters"].get("worker processes", 0) > 1:
+        lines.append("Stage times of worker processes are summed, so they can add up to more than the refresh took")
+    lines.append("")
+    lines.append(f"{'Stage':<24}{'Seconds':>10}{'%':>8}{'Calls':>10}")
+    for name, stage in profile["stages"].items():
+        share = 100 * stage["seconds"] / total if total else 0
+        lines.append(f"{name:<24}{stage['seconds']:>10.3f}{share:>8.1f}{stage['calls']:>10}")
+    if profile["counters"]:
+        lines.append("")
+        for name, n in profile["counters"].items():
+            lines.append(f"{name:<24}{n:>10}")
+    if profile["peak_memory_mb"] is not None:
+        lines.append("")
+        lines.append(f"Peak traced memory {profile['peak_memory_mb']} MB, biggest allocations still alive at the end:")
+        for allocation in profile["top_allocations"]:
+            lines.append(f"{allocation['size_kb']:>10} KB {allocation['count']:>8} blocks  {allocation['location']}")
+    return "\n".join(lines)
@@ -0,0 +1,380 @@
+"""
+Library for counting player stats of AceTracker.py from a columnar table of actions with NumPy.
+Stats are declared once in the stat registry, everything else (counters, stats JSON files, hand store
+columns and HUD columns) is made from the registry.
+"""
+from array import array
+import numpy as np
+from hand_model import ActionType, ALL_IN, big_blind_of, position_codes
+
+class Stat:
+    """
+    Stat counted from player actions. True and false are conditions that get Situations and return which
+    situations count for and against the stat. Value of the stat is percentage of true actions.
+    """
+    __slots__ = ("name", "label", "true", "false")
+
+    def __init__(self, name, label, true, false):
+        self.name = name
+        self.label = label
+        self.true = true
+        self.false = false
+
+# Registered stats in the order of counters, name is used in JSON files and hand store and label in HUD.
+# Stats must be registered in this module, so that all processes count the same stats.
+stat_registry = []
+
+def register_stat(name, label, true, false):
+    """
+    Function that adds stat to the registry and returns it
+    """
+    stat = Stat(name, label, true, false)
+    stat_registry.append(stat)
+    return stat
+
+register_stat("vpip", "VPIP",
+    true=lambda s: s.voluntary,
+    false=lambda s: s.passive)
+register_stat("pfr", "PFR",
+    true=lambda s: s.pre_flop & s.unopened & s.raises,
+    false=lambda s: s.pre_flop & s.unopened & s.passive)
+register_stat("3bet_pre_flop", "3Bet",
+    true=lambda s: s.pre_flop & s.opened & s.raises,
+    false=lambda s: s.pre_flop & s.opened & (s.calls | s.folds))
+register_stat("fold_vs_btn_raise", "Fold vs Btn",
+    true=lambda s: s.pre_flop & s.button_raised & s.folds,
+    false=lambda s: s.pre_flop & s.button_raised & (s.raises | s.calls))
+register_stat("fold_c_bet", "Fold vs C-bet",
+    true=lambda s: s.facing_c_bet & s.folds,
+    false=lambda s: s.facing_c_bet & ~s.folds & ~s.aggressive)
+
+stat_names = tuple(stat.name for stat in stat_registry)
+
+# Code of rows for lines that name a player without a counted action, like "<player> has timed out" on the flop
+OTHER_LINE = len(ActionType)
+
+class PlayerCounters:
+    """
+    Long term stat counters of one player, true and false lists are in the order of stat registry.
+    Counters of the same player from different files or processes are combined with merge.
+    """
+    __slots__ = ("true", "false", "played_hands", "profit")
+
+    def __init__(self):
+        self.true = [0] * len(stat_names)
+        self.false = [0] * len(stat_names)
+        self.played_hands = 0
+        self.profit = 0.0
+
+    def merge(self, other):
+        """Add counters of other to these counters, returns self"""
+        self.true = [a + b for a, b in zip(self.true, other.true)]
+        self.false = [a + b for a, b in zip(self.false, other.false)]
+        self.played_hands += other.played_hands
+        self.profit += other.profit
+        return self
+
+    def to_json(self):
+        """Return counters in the format of stats JSON files, including percentage values"""
+        stats = {}
+        for i, stat in enumerate(stat_names):
+            true, false = self.true[i], self.false[i]
+            value = int(100 * (true / (true + false))) if true > 0 else 0
+            stats[stat] = {"false": false, "true": true, "value": value}
+        stats["played_hands"] = {"value": self.played_hands}
+        stats["profit"] = {"value": self.profit}
+        return stats
+
+    @classmethod
+    def from_json(cls, stats):
+        """Create counters from the format of stats JSON files, stats missing from JSON are zero"""
+        counters = cls()
+        for i, stat in enumerate(stat_names):
+            if stat in stats:
+                counters.true[i] = stats[stat]["true"]
+                counters.false[i] = stats[stat]["false"]
+        counters.played_hands = stats["played_hands"]["value"]
+        counters.profit = stats["profit"]["value"]
+        return counters
+
+# Actions of hands are copied to the table from arrays of Hand, street, seat and code of an action take three
+# bytes and its amount and total two floats. Columns read from the table have one row per counted action. Hand
+# is the row of the hand in hand columns and player is index in ActionTable.players. Facing raises is the number
+# of bets and raises made by other players on the street before the action, own raises are bets and raises of
+# the player before it. Button raises are bets and raises of the button before the action, when no other player
+# seated before the button has bet or raised, otherwise 0.
+integer_columns = ("hand", "player", "street", "seat", "position", "code", "facing_raises", "own_raises", "button_raises")
+
+# Position codes stored in the table are one higher, so unknown position is 0
+position_values = {position: code + 1 for position, code in position_codes.items()}
+button_value = position_values["bu"]
+
+# Mask that removes all-in flag from action codes
+code_mask = ALL_IN - 1
+
+class ActionTable:
+    """
+    Columnar table of player actions filled by the parser. Actions of a hand are added with one extend call
+    from arrays of the Hand, and raise columns, which depend on earlier actions of the street, are calculated
+    for all rows with NumPy when the table is read.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.action_info = array("B")
+        self.action_amounts = array("d")
+        # Hand columns. Actions of a hand before first counted were added to an earlier table, they are only
+        # used for raise columns of later actions.
+        self.hand_ids = array("q")
+        self.big_blinds = array("d")
+        self.hand_sizes = array("i")
+        self.first_counted = array("i")
+        self.button_seats = array("b")
+        self.seat_starts = array("i")
+        # Player and position of every seat of every hand
+        self.seat_players = array("i")
+        self.seat_positions = array("b")
+        self.players = []
+        self.player_index = {}
+
+    def __len__(self):
+        return len(self.action_amounts) // 2
+
+    def add_hand(self, hand, start=0, other_lines=()):
+        """
+        Add actions of hand to the table, actions before index start are not counted. Other lines are
+        (actions before the line, street, seat) of lines naming a player without a counted action, they are
+        added between actions with code OTHER_LINE.
+        """
+        info, amounts = hand.action_info, hand.action_amounts
+        if other_lines:
+            info, amounts = array("B"), array("d")
+            previous = 0
+            for action_count, street, seat in other_lines:
+                info.extend(hand.action_info[3 * previous:3 * action_count])
+                amounts.extend(hand.action_amounts[2 * previous:2 * action_count])
+                info.extend((street, seat, OTHER_LINE))
+                amounts.extend((0.0, 0.0))
+                previous = action_count
+            info.extend(hand.action_info[3 * previous:])
+            amounts.extend(hand.action_amounts[2 * previous:])
+        self.action_info.extend(info)
+        self.action_amounts.extend(amounts)
+        self.hand_ids.append(int(hand.hand_id))
+        self.big_blinds.append(big_blind_of(hand.stakes))
+        self.hand_sizes.append(len(amounts) // 2)
+        self.first_counted.append(start)
+        positions = hand.positions
+        self.button_seats.append(positions.index("bu") if "bu" in positions else -1)
+        self.seat_starts.append(len(self.seat_players))
+        player_index = self.player_index
+        for name in hand.names:
+            player_id = player_index.get(name)
+            if player_id is None:
+                player_id = player_index[name] = len(self.players)
+                self.players.append(name)
+            self.seat_players.append(player_id)
+        self.seat_positions.extend([position_values.get(position, 0) for position in positions])
+
+    def to_numpy(self):
+        """
+        Return dict of columns of counted actions as NumPy arrays
+        """
+        rows = len(self)
+        if not rows:
+            columns = {name: np.zeros(0, np.int32) for name in integer_columns}
+            columns["amount"], columns["hand_id"], columns["big_blind"] = np.zeros(0), np.zeros(0, np.int64), np.zeros(0)
+            return columns
+        info = np.frombuffer(self.action_info, np.uint8).reshape(rows, 3).astype(np.int32)
+        street, seat, code = info[:, 0], info[:, 1], info[:, 2] & code_mask
+        sizes = np.frombuffer(self.hand_sizes, np.int32)
+        hands = np.repeat(np.arange(len(sizes), dtype=np.int32), sizes)
+        first_rows = np.cumsum(sizes) - sizes
+        counted = ((code <= ActionType.RAISE) | (code == OTHER_LINE)) & (np.arange(rows) - first_rows[hands] >= np.frombuffer(self.first_counted, np.int32)[hands])
+        seat_rows = np.frombuffer(self.seat_starts, np.int32)[hands] + seat
+        position = np.frombuffer(self.seat_positions, np.int8)[seat_rows].astype(np.int32)
+        before_button = seat < np.frombuffer(self.button_seats, np.int8)[hands]
+        # Raise columns are sums of earlier bets and raises of the same street
+        raised = ((code == ActionType.BET) | (code == ActionType.RAISE)).astype(np.int32)
+        streets = hands.astype(np.int64) * 256 + street
+        total = raises_before(raised, streets)
+        own = raises_before(raised, streets * 256 + seat)
+        button = raises_before(raised * (position == button_value), streets)
+        others_before_button = raises_before(raised * before_button, streets) - own * before_button
+        button_raises = np.where((others_before_button == 0) & (code != OTHER_LINE), button, 0)
+        columns = {"hand": hands, "player": np.frombuffer(self.seat_players, np.int32)[seat_rows], "street": street, "seat": seat,
+            "position": position - 1, "code": code, "facing_raises": total - own, "own_raises": own, "button_raises": button_raises}
+        columns = {name: values[counted] for name, values in columns.items()}
+        columns["amount"] = np.frombuffer(self.action_amounts, np.float64)[0::2][counted]
+        columns["hand_id"] = np.frombuffer(self.hand_ids, np.int64)[columns["hand"]]
+        columns["big_blind"] = np.frombuffer(self.big_blinds, np.float64)[columns["hand"]]
+        return columns
+
+def raises_before(raised, groups):
+    """
+    Function that returns sum of raised in earlier rows of the same group for every row
+    """
+    order = None
+    if len(groups) > 1 and np.any(groups[1:] < groups[:-1]):
+        order = np.argsort(groups, kind="stable")
+        raised, groups = raised[order], groups[order]
+    before = np.cumsum(raised) - raised
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    before -= np.repeat(before[starts], np.diff(np.r_[starts, len(groups)]))
+    if order is None:
+        return before
+    result = np.empty_like(before)
+    result[order] = before
+    return result
+
+# Features of an action that stats can depend on and number of values kept from each. Bigger counts are kept
+# as the biggest value, and position is stored one higher, so unknown position is 0.
+situation_features = {
+    "street": 4,
+    "code": OTHER_LINE + 1,
+    "facing_raises": 3,
+    "own_raises": 2,
+    "button_raises": 3,
+    "position": len(position_codes) + 1
+}
+situation_shape = tuple(situation_features.values())
+situation_count = int(np.prod(situation_shape))
+
+class Situations:
+    """
+    Every combination of situation features as arrays, with shortcuts used by stat conditions
+    """
+    def __init__(self):
+        grid = np.indices(situation_shape).reshape(len(situation_shape), -1)
+        for name, values in zip(situation_features, grid):
+            setattr(self, name, values)
+        self.position = self.position - 1
+        self.folds = self.code == ActionType.FOLD
+        self.calls = self.code == ActionType.CALL
+        self.raises = self.code == ActionType.RAISE
+        self.aggressive = self.raises | (self.code == ActionType.BET)
+        self.passive = self.folds | (self.code == ActionType.CHECK)
+        self.voluntary = self.aggressive | self.calls
+        self.pre_flop = self.street == 0
+        self.unopened = self.facing_raises == 0
+        self.opened = self.facing_raises > 0
+        # Button made one raise and was the first raiser of other players in seat order, and player is not the button
+        self.button_raised = (self.button_raises == 1) & (self.position != position_codes["bu"])
+        # Bet of the flop was made by another player and player hasn't bet or raised on the flop
+        self.facing_c_bet = (self.street == 1) & self.opened & (self.own_raises == 0)
+
+def compile_stats(registry=stat_registry):
+    """
+    Function that evaluates conditions of all stats in every situation once. Returns true and false dispatch
+    tables of shape (situations, stats), which tell what every action counts to.
+    """
+    situations = Situations()
+    true = np.stack([np.broadcast_to(stat.true(situations), (situation_count,)) for stat in registry], axis=1)
+    false = np.stack([np.broadcast_to(stat.false(situations), (situation_count,)) for stat in registry], axis=1)
+    return true.astype(np.int64), false.astype(np.int64)
+
+dispatch_true, dispatch_false = compile_stats()
+
+# Tables with fewer rows are counted row by row, like a HUD refresh of a few new hands, where NumPy calls cost
+# more than they save. Stats of a situation are found from lists of dispatch tables.
+scalar_count_rows = 64
+situation_strides = [int(np.prod(situation_shape[i + 1:])) for i in range(len(situation_shape))]
+dispatch_lists = [([i for i, value in enumerate(true) if value], [i for i, value in enumerate(false) if value])
+    for true, false in zip(dispatch_true.tolist(), dispatch_false.tolist())]
+
+def situation_keys(columns):
+    """
+    Function that returns situation of every action as index of dispatch tables
+    """
+    features = []
+    for name, size in situation_features.items():
+        values = columns[name].astype(np.intp)
+        if name == "position":
+            values = values + 1
+        features.append(np.minimum(values, size - 1))
+    return np.ravel_multi_index(features, situation_shape)
+
+def count_stats(columns, keys=("player",)):
+    """
+    Function that groups actions by values of key columns and counts true and false actions of every stat in
+    every group. Returns list of key value arrays, one item per group in each, and true and false counts as
+    arrays of shape (groups, stats). Grouping by ("player", "position") or ("player", "big_blind") gives stats
+    per position or per stake.
+    """
+    if not len(columns["code"]):
+        empty = np.zeros((0, len(stat_names)), np.int64)
+        return [columns[key][:0] for key in keys], empty, empty.copy()
+    values, codes = [], []
+    for key in keys:
+        unique, inverse = np.unique(columns[key], return_inverse=True)
+        values.append(unique)
+        codes.append(inverse.ravel())
+    shape = [len(unique) for unique in values]
+    groups, inverse = np.unique(np.ravel_multi_index(codes, shape), return_inverse=True)
+    inverse = inverse.ravel()
+    group_values = [unique[index] for unique, index in zip(values, np.unravel_index(groups, shape))]
+    # One pass counts actions of every group and situation, dispatch tables turn them to counts of all stats
+    pairs, pair_counts = np.unique(inverse * situation_count + situation_keys(columns), return_counts=True)
+    pair_groups, pair_situations = np.divmod(pairs, situation_count)
+    true = np.zeros((len(groups), len(stat_names)), np.int64)
+    false = np.zeros((len(groups), len(stat_names)), np.int64)
+    np.add.at(true, pair_groups, pair_counts[:, None] * dispatch_true[pair_situations])
+    np.add.at(false, pair_groups, pair_counts[:, None] * dispatch_false[pair_situations])
+    return group_values, true, false
+
+def add_to_counters(table, long_stats):
+    """
+    Function that adds stats counted from all actions of the table to PlayerCounters of players in long_stats
+    """
+    if not len(table):
+        return
+    if len(table) < scalar_count_rows:
+        add_rows_to_counters(table, long_stats)
+        return
+    (player_ids,), true, false = count_stats(table.to_numpy())
+    players = table.players
+    for player_id, player_true, player_false in zip(player_ids.tolist(), true.tolist(), false.tolist()):
+        counters = long_stats[players[player_id]]
+        counters.true = [a + b for a, b in zip(counters.true, player_true)]
+        counters.false = [a + b for a, b in zip(counters.false, player_false)]
+
+def add_rows_to_counters(table, long_stats):
+    """
+    Function that counts stats of the table one action at a time, gives the same counts as add_to_counters
+    """
+    info, players = table.action_info, table.players
+    sizes = list(situation_shape)
+    end = 0
+    for hand, hand_size in enumerate(table.hand_sizes):
+        start, end = end, end + hand_size
+        first = start + table.first_counted[hand]
+        seat_start, button_seat = table.seat_starts[hand], table.button_seats[hand]
+        street = -1
+        for row in range(start, end):
+            row_street, seat, code = info[3 * row], info[3 * row + 1], info[3 * row + 2] & code_mask
+            if row_street != street:
+                street, total, button, others_before_button, own_raises = row_street, 0, 0, 0, {}
+            position = table.seat_positions[seat_start + seat]
+            own = own_raises.get(seat, 0)
+            if row >= first and (code <= ActionType.RAISE or code == OTHER_LINE):
+                button_raises = 0
+                if code != OTHER_LINE and others_before_button - (own if seat < button_seat else 0) == 0:
+                    button_raises = button
+                # Features in the order of situation features, position is already stored one higher
+                features = (street, code, total - own, own, button_raises, position)
+                situation = sum(min(value, size - 1) * stride for value, size, stride in zip(features, sizes, situation_strides))
+                true, false = dispatch_lists[situation]
+                if true or false:
+                    counters = long_stats[players[table.seat_players[seat_start + seat]]]
+                    for i in true:
+                        counters.true[i] += 1
+                    for i in false:
+                        counters.false[i] += 1
+            if code == ActionType.BET or code == ActionType.RAISE:
+                own_raises[seat] = own + 1
+                total += 1
+                if position == button_value:
+                    button += 1
+                elif seat < button_seat:
+                    others_before_button += 1
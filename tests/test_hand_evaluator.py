@@ -0,0 +1,70 @@
+"""
+Tests for hand_evaluator.py, lookup table values are compared with a slow ranker written from the rules
+"""
+from collections import Counter
+from itertools import combinations
+import numpy as np
+from hand_evaluator import evaluate, evaluate_batch, evaluate_many, hand_label
+
+def rank_five(cards):
+    """
+    Function that returns value of 5 cards in the format of hand_evaluator: category << 20 and tie breaking ranks
+    """
+    ranks = sorted((card // 4 for card in cards), reverse=True)
+    flush = len({card % 4 for card in cards}) == 1
+    straight_top = None
+    if len(set(ranks)) == 5:
+        if ranks[0] - ranks[4] == 4:
+            straight_top = ranks[0]
+        elif ranks == [12, 3, 2, 1, 0]:
+            straight_top = 3
+    # Ranks ordered by count and then by rank, like "full house, Kings over Deuces"
+    counts = sorted(Counter(ranks).items(), key=lambda item: (item[1], item[0]), reverse=True)
+    shape = [count for _, count in counts]
+    ordered = [rank for rank, _ in counts]
+    if straight_top is not None and flush:
+        category, ordered = 8, [straight_top]
+    elif shape == [4, 1]:
+        category = 7
+    elif shape == [3, 2]:
+        category = 6
+    elif flush:
+        category = 5
+    elif straight_top is not None:
+        category, ordered = 4, [straight_top]
+    elif shape == [3, 1, 1]:
+        category = 3
+    elif shape == [2, 2, 1]:
+        category = 2
+    elif shape == [2, 1, 1, 1]:
+        category = 1
+    else:
+        category = 0
+    return category << 20 | sum(rank << (16 - 4 * i) for i, rank in enumerate(ordered))
+
+def rank_best(cards):
+    return max(rank_five(five) for five in combinations(cards, 5))
+
+def test_evaluate_batch_matches_slow_ranker():
+    rng = np.random.default_rng(7)
+    for size in (5, 6, 7):
+        hands = np.array([rng.choice(52, size, replace=False) for _ in range(3000)])
+        values = evaluate_batch(hands).tolist()
+        assert values == [rank_best(hand.tolist()) for hand in hands]
+
+def test_every_category_is_found():
+    rng = np.random.default_rng(11)
+    hands = np.array([rng.choice(52, 7, replace=False) for _ in range(20000)])
+    categories = set((evaluate_batch(hands) >> 20).tolist())
+    # Straight flush is too rare for random hands
+    assert categories >= set(range(8))
+    assert evaluate("As Ks Qs Js Ts") >> 20 == 8
+
+def test_wheel_is_the_smallest_straight():
+    assert evaluate("Ah 2d 3c 4s 5h") < evaluate("2d 3c 4s 5h 6c")
+    assert evaluate("Ah 2d 3c 4s 5h 9c Kd") == rank_best([48 + 2, 1, 4, 8 + 3, 12 + 2, 28, 44 + 1])
+
+def test_evaluate_many_skips_unknown_hands():
+    values = evaluate_many([["Ah", "Ad", "7s", "7c", "2d"], ["Ah", "??", "7s", "7c", "2d"], ["Ah", "Kd"], ["Ah", "Ah", "7s", "7c", "2d"]])
+    assert values[1:] == [None, None, None]
+    assert hand_label(values[0]) == "Two pair, Aces and Sevens"
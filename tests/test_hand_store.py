@@ -0,0 +1,69 @@
+"""
+Tests for saving hands to hand_store.py and importing the legacy JSON hand DB
+"""
+import json
+import pytest
+import utility
+from hand_model import Hand
+from hand_store import HandStore, HAND_STORE_VERSION, open_hand_store
+from hh_generator import generate_history_folder
+
+@pytest.fixture(scope="module")
+def parsed_hands(tmp_path_factory):
+    files = generate_history_folder(str(tmp_path_factory.mktemp("history")), tables=1, hands=200, seed=5)
+    parser = utility.HandHistoryParser(files[0], "Hero")
+    return files[0], list(parser.iter_hands(final=True))
+
+def hand_content(hand):
+    return hand.to_json(), hand.stakes, hand.date, list(hand.action_info), list(hand.action_amounts)
+
+def test_hands_round_trip(tmp_path, parsed_hands):
+    source, hands = parsed_hands
+    store = HandStore(str(tmp_path / "hands.sqlite3"))
+    try:
+        assert store.add_hands(source, "Hero", hands) == len(hands)
+        assert store.has_source(source)
+        assert list(store.hand_keys()) == [hand_key for hand_key, _ in hands]
+        for hand_key, hand in hands:
+            assert hand_content(store.load_hand(hand_key)) == hand_content(hand)
+        assert store.load_hand("missing") is None
+        # Hands of the same file are replaced, not added twice
+        assert store.replace_source(source, "Hero", hands[:50]) == 50
+        assert store.hand_count() == 50
+    finally:
+        store.close()
+
+def test_filters_and_pages(tmp_path, parsed_hands):
+    source, hands = parsed_hands
+    store = HandStore(str(tmp_path / "hands.sqlite3"))
+    try:
+        store.add_hands(source, "Hero", hands)
+        won = [hand_key for hand_key, hand in hands if hand.profit_of("Hero") > 0]
+        assert store.count_hands(["won"]) == len(won)
+        assert list(store.query_hand_keys(["won"])) == won
+        assert store.hand_keys_page(5, 10, ["won"]) == won[5:15]
+        assert store.hand_keys_from(won[4], 10, ["won"]) == won[5:15]
+        assert store.hand_keys_from(won[15], 10, ["won"], backward=True) == won[5:15]
+    finally:
+        store.close()
+
+def test_legacy_json_import(tmp_path, parsed_hands):
+    _, hands = parsed_hands
+    legacy = {hand_key: hand.to_json() for hand_key, hand in hands[:120]}
+    with open(tmp_path / "table_db.json", "w") as json_file:
+        json.dump(legacy, json_file)
+    path = str(tmp_path / "hands.sqlite3")
+    store = open_hand_store("Hero", path)
+    try:
+        assert store.connection.execute("PRAGMA user_version").fetchone()[0] == HAND_STORE_VERSION
+        assert store.hand_count() == 120
+        for hand_key, hand_data in legacy.items():
+            assert store.load_hand(hand_key).to_json() == Hand.from_json(hand_key, hand_data).to_json()
+    finally:
+        store.close()
+    # JSON files are imported only when the store is created
+    store = open_hand_store("Hero", path)
+    try:
+        assert store.hand_count() == 120
+    finally:
+        store.close()
@@ -0,0 +1,159 @@
+"""
+Tests for counting stats from the action table of stats_engine.py and HandHistoryParser of utility.py
+"""
+from collections import defaultdict
+import pytest
+import utility
+from hh_generator import generate_history_folder
+from stats_engine import ActionTable, PlayerCounters, add_rows_to_counters, count_stats, stat_names
+
+# Two hands of six players. In the first one button 3-bets and wins with a c-bet, in the second one big blind
+# times out facing a c-bet before folding.
+history = """PokerStars Hand #250000000001:  Hold'em No Limit ($0.02/$0.05 USD) - 2024/02/01 20:00:00 ET
+Table 'Test' 6-max Seat #1 is the button
+Seat 1: Hero ($5.00 in chips)
+Seat 2: Alice ($5.00 in chips)
+Seat 3: Bob ($5.00 in chips)
+Seat 4: Carol ($5.00 in chips)
+Seat 5: Dave ($5.00 in chips)
+Seat 6: Eve ($5.00 in chips)
+Alice: posts small blind $0.02
+Bob: posts big blind $0.05
+*** HOLE CARDS ***
+Dealt to Hero [Ah Kh]
+Carol: folds
+Dave: raises $0.10 to $0.15
+Eve: calls $0.15
+Hero: raises $0.30 to $0.45
+Alice: folds
+Bob: folds
+Dave: folds
+Eve: calls $0.30
+*** FLOP *** [2c 7d Jh]
+Eve: checks
+Hero: bets $0.50
+Eve: folds
+Uncalled bet ($0.50) returned to Hero
+Hero collected $1.12 from pot
+*** SUMMARY ***
+Total pot $1.12 | Rake $0.00
+Board [2c 7d Jh]
+Seat 1: Hero (button) collected ($1.12)
+Seat 2: Alice (small blind) folded before Flop
+Seat 3: Bob (big blind) folded before Flop
+Seat 4: Carol folded before Flop (didn't bet)
+Seat 5: Dave folded before Flop
+Seat 6: Eve folded on the Flop
+
+
+PokerStars Hand #250000000002:  Hold'em No Limit ($0.02/$0.05 USD) - 2024/02/01 20:01:00 ET
+Table 'Test' 6-max Seat #2 is the button
+Seat 1: Hero ($5.67 in chips)
+Seat 2: Alice ($4.98 in chips)
+Seat 3: Bob ($4.95 in chips)
+Seat 4: Carol ($5.00 in chips)
+Seat 5: Dave ($4.85 in chips)
+Seat 6: Eve ($4.55 in chips)
+Bob: posts small blind $0.02
+Carol: posts big blind $0.05
+*** HOLE CARDS ***
+Dealt to Hero [Qs Qd]
+Dave: folds
+Eve: folds
+Hero: raises $0.10 to $0.15
+Alice: folds
+Bob: folds
+Carol: calls $0.10
+*** FLOP *** [3s 8h 9c]
+Carol: checks
+Hero: bets $0.20
+Carol has timed out
+Carol: folds
+Uncalled bet ($0.20) returned to Hero
+Hero collected $0.32 from pot
+*** SUMMARY ***
+Total pot $0.32 | Rake $0.00
+Board [3s 8h 9c]
+Seat 1: Hero collected ($0.32)
+Seat 2: Alice (button) folded before Flop (didn't bet)
+Seat 3: Bob (small blind) folded before Flop
+Seat 4: Carol (big blind) folded on the Flop
+Seat 5: Dave folded before Flop (didn't bet)
+Seat 6: Eve folded before Flop (didn't bet)
+"""
+
+# True and false counts of every stat in the order vpip, pfr, 3bet_pre_flop, fold_vs_btn_raise, fold_c_bet
+expected_counts = {
+    "Hero": ([4, 1, 1, 0, 0], [0, 0, 0, 0, 0]),
+    "Alice": ([0, 0, 0, 1, 0], [2, 0, 2, 0, 0]),
+    "Bob": ([0, 0, 0, 1, 0], [2, 0, 2, 0, 0]),
+    "Carol": ([1, 0, 0, 0, 1], [3, 1, 1, 0, 1]),
+    "Dave": ([1, 1, 0, 1, 0], [2, 1, 1, 0, 0]),
+    "Eve": ([2, 0, 0, 0, 1], [3, 1, 2, 1, 0])
+}
+
+def table_counts(table):
+    """
+    Function that counts the table with count_stats and returns true and false counts by player name
+    """
+    (player_ids,), true, false = count_stats(table.to_numpy())
+    return {table.players[i]: (t, f) for i, t, f in zip(player_ids.tolist(), true.tolist(), false.tolist())}
+
+def row_counts(table):
+    """
+    Function that counts the table with add_rows_to_counters and returns true and false counts by player name
+    """
+    long_stats = defaultdict(PlayerCounters)
+    add_rows_to_counters(table, long_stats)
+    return {name: (counters.true, counters.false) for name, counters in long_stats.items() if any(counters.true) or any(counters.false)}
+
+def test_expected_counts_are_in_registry_order():
+    assert stat_names == ("vpip", "pfr", "3bet_pre_flop", "fold_vs_btn_raise", "fold_c_bet")
+
+@pytest.mark.parametrize("block_size", [64, 700, utility.read_block_size])
+def test_parser_counts_fixed_history(tmp_path, monkeypatch, block_size):
+    # Small blocks end in the middle of hands, so actions of one hand are counted in several tables
+    monkeypatch.setattr(utility, "read_block_size", block_size)
+    path = tmp_path / "history.txt"
+    path.write_text(history)
+    parser = utility.HandHistoryParser(str(path), "Hero")
+    hands = list(parser.iter_hands(final=True))
+    assert [hand.hand_id for _, hand in hands] == ["250000000001", "250000000002"]
+    stats = parser.get_stats()
+    for player, (true, false) in expected_counts.items():
+        assert [stats[player][stat]["true"] for stat in stat_names] == true, player
+        assert [stats[player][stat]["false"] for stat in stat_names] == false, player
+        assert stats[player]["played_hands"]["value"] == 2
+    assert round(stats["Hero"]["profit"]["value"], 2) == 0.84
+
+def test_row_counts_match_count_stats(tmp_path):
+    files = generate_history_folder(str(tmp_path), tables=1, hands=300, seed=3)
+    parser = utility.HandHistoryParser(files[0], "Hero")
+    hands = [hand for _, hand in parser.iter_hands(final=True)]
+    table = ActionTable()
+    for i, hand in enumerate(hands):
+        # Some hands are added from the middle, like the rest of a hand cut by the end of a block
+        actions = len(hand.action_amounts) // 2
+        if i % 3 == 0 and actions > 4:
+            table.add_hand(hand, actions // 2)
+        else:
+            table.add_hand(hand)
+    assert len(table) > 1000
+    assert row_counts(table) == table_counts(table)
+
+def test_other_lines_and_counted_start(tmp_path):
+    path = tmp_path / "history.txt"
+    path.write_text(history)
+    parser = utility.HandHistoryParser(str(path), "Hero")
+    hand = [hand for _, hand in parser.iter_hands(final=True)][1]
+    # Timeout of Carol in seat 3 comes after the c-bet, which is the 10th action of the hand
+    table = ActionTable()
+    table.add_hand(hand, 0, [(10, 1, 3)])
+    counts = table_counts(table)
+    assert counts["Carol"] == ([1, 0, 0, 0, 1], [2, 0, 1, 0, 1])
+    assert row_counts(table) == counts
+    # Actions before start only count as raises before later actions
+    table = ActionTable()
+    table.add_hand(hand, 10, [(10, 1, 3)])
+    assert table_counts(table) == {"Carol": ([0, 0, 0, 0, 1], [1, 0, 0, 0, 1])}
+    assert row_counts(table) == table_counts(table)
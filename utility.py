@@ -3,315 +3,582 @@ Library of utility functions for AceTracker.py
 """
 import json
 import os
-import csv
-from re import findall
+import sys
+import time
 import re
+from hand_store import HandStore
+from profiler import profile_stage
+from hand_model import Hand, ActionType, SeatState, action_codes, street_index
+from stats_engine import ActionTable, PlayerCounters, add_to_counters
 
-def street_start_actions(short_stats, hand_db_data, line, current_state, previous_state, debug=0):
+# Pre-compiled regex patterns for parsing hand history lines
+dollar_pattern = re.compile(r"\$(\d+\.\d+)")
+chips_pattern = re.compile(r"(\d+)")
+# Blinds and start time from the first line of a hand, like "($0.02/$0.05 USD) - 2024/01/31 18:05:00 ET"
+stakes_pattern = re.compile(r"\(([^()/\s]+/[^()\s]+)")
+date_pattern = re.compile(r"(\d{4})/(\d{2})/(\d{2}) (\d{1,2}):(\d{2}):(\d{2})")
+
+# Single alternation that classifies every hand history line the parser needs, and extracts
+# actor, action and amount text in the same pass. Other lines, like table info, pot totals and
+# "<player> has timed out", are matched by the last alternative and blank lines are skipped.
+# Name of the last matched group tells the line type.
+line_pattern = re.compile(r"""^(?:
+      (?P<actor>[^\n:]+):\ (?P<action>folds|checks|calls|bets|raises|posts|shows|mucks)(?P<rest>[^\n]*)
+    | Seat\ (?P<seat_number>\d+):(?P<seat_rest>[^\n]*)
+    | \*\*\*\ (?P<street>HOLE\ CARDS|FLOP|TURN|RIVER|SHOW\ DOWN|SUMMARY)\ \*\*\*(?P<board>[^\n]*)
+    | PokerStars\ Hand\ \#(?P<hand_id>\d+):(?P<hand_info>[^\n]*)
+    | Dealt\ to\ (?P<dealt>[^\n]+?)\ (?P<cards>\[[^\n]*)
+    | Uncalled\ bet\ (?P<returned>\([^\n)]*\))\ returned\ to\ (?P<uncalled>[^\n]+)
+    | (?P<cashed>[^\n]+?)\ (?P<cash_out>cashed\ out\ the\ hand[^\n]*)
+    | (?P<other>[^\n]+)
+)$""", re.MULTILINE | re.VERBOSE)
+
+# Line type for the last group of every alternative in line_pattern
+line_types = {
+    "rest": "action",
+    "seat_rest": "seat",
+    "board": "street",
+    "hand_info": "hand-start",
+    "cards": "dealt",
+    "uncalled": "uncalled",
+    "cash_out": "cash-out",
+    "other": "other"
+}
+
+# Street marker names and hand state they start
+street_markers = {
+    "HOLE CARDS": "pre-flop",
+    "FLOP": "flop",
+    "TURN": "turn",
+    "RIVER": "river",
+    "SHOW DOWN": "showdown",
+    "SUMMARY": "end-hand"
+}
+street_before = {"flop": "pre-flop", "turn": "flop", "river": "turn"}
+action_streets = {"pre-flop", "flop", "turn", "river"}
+
+# Size of blocks read from hand history files
+read_block_size = 1024 * 1024
+
+def street_start_actions(short_stats, hand, line, current_state, previous_state, debug=0):
     """
     Function for handling actions required in start of every street
     """
-    streets = ["pre-flop", "flop", "turn", "river"]
     # Check cards
     cards = None
     if current_state == "flop":
         cards = line.split("[")[1].split("]")[0]
     elif current_state in ["turn", "river"]:
         cards = line.split("] [")[1].split("]")[0]
-    
-    # Reset raise counter and check money betted
+
+    # Check money betted
     pot_size = 0.0
-    for seat in short_stats:
-        short_stats[seat]["raises"] = 0
-        short_stats[seat]["money_betted_total"] += short_stats[seat]["money_betted_this_state"]
-        pot_size += short_stats[seat]["money_betted_this_state"]
-        short_stats[seat]["money_betted_this_state"] = 0
+    for seat_stats in short_stats.values():
+        seat_stats.money_betted_total += seat_stats.money_betted_this_state
+        pot_size += seat_stats.money_betted_this_state
+        seat_stats.money_betted_this_state = 0
 
     # Check pot size for previous street
-    if previous_state in streets:
-        hand_db_data[previous_state].append(f"pot size: ${pot_size:.2f}")
+    if previous_state in street_index and street_index[previous_state] < hand.street_count():
+        hand.pot_sizes[street_index[previous_state]] = pot_size
         if debug: print(f"ADDED pot size: ${pot_size:.2f}")
-    return short_stats, hand_db_data, cards
+    return short_stats, hand, cards
 
-def handle_txt_file(source_file, hero_name, tournament_mode=0):
+class HandHistoryParser:
     """
-    Function for parsing txt files containing all hands played in one table
+    Resumable parser for txt file containing all hands played in one table.
+    Parser remembers byte offset and player stats between calls, so calling
+    parse_new_lines again only processes lines appended after the previous call.
     """
-    # Pre-compile regex patterns
-    dollar_pattern = re.compile(r"\$(\d+\.\d+)")
-    digits_pattern = re.compile(r"(\d)")
-    hand_id_pattern = re.compile(r"PokerStars Hand #(\d+)")
-    
-    # Initialize variables outside the loop
-    temp_stats = {}
-    long_stats = {}
-    bank_roll_data = []
-    
-    # Read file in chunks for better performance
-    with open(source_file, 'r', buffering=8192) as source:
-        if tournament_mode:
-            source_file = source_file.replace("No Limit", "- No Limit")
-        hand_db_file = source_file.split("\\")[-1].split("-")[0].replace(" ", "_") + "db.json"
-        
-        # Process file in larger chunks
-        content = source.read()
-        lines = content.splitlines()
-        
-        state = "none"
-        positions_assigned = 0
-        seat_id = 0
-        current_seat = None
-        data_from_hand = {}
-        total_hands_data = {}
+    def __init__(self, source_file, hero_name, tournament_mode=0):
+        self.source_file = source_file
+        self.hero_name = hero_name
+        self.tournament_mode = tournament_mode
+        # Tournament amounts are chips without dollar sign
+        self.amount_pattern = chips_pattern if tournament_mode else dollar_pattern
+        # RefreshProfiler that gets time of parsing stages, None when parsing is not profiled
+        self.profiler = None
+        # Bankroll rows and all-in spots are only collected when the whole file is parsed at once, HUD parsers
+        # live for the whole session and would keep them forever
+        self.collect_bankroll = False
+        self.reset()
+
+    def reset(self):
+        """Forget all parsed data and start again from the beginning of the file"""
+        self.offset = 0
+        self.temp_stats = {}
+        self.long_stats = {}
+        # Hand id, date, stakes, position, profit, pot and all-in flag of every hand of hero, for bankroll store
+        self.bankroll_rows = []
+        # Hand id, hole cards with hero first, board cards, amount won by hero and whole pot won of every all-in hand of hero
+        self.all_in_spots = []
+        self.collected = {}
+        self.completed_hands = []
+        # Actions of hands are collected to a columnar table and counted to long_stats once per block
+        self.action_table = ActionTable()
+        self.hand = None
+        # Lines of current hand naming a player without a counted action and actions of it already in action table
+        self.other_lines = []
+        self.counted_actions = 0
+        self.state = "none"
+        self.positions_assigned = 0
+        self.seat_id = 0
+        # Per hand indexes for finding seat of a player in constant time
+        self.seat_by_name = {}
+        self.seat_by_number = {}
+        self.profits_checked = set()
+        # Set when parsing stopped at max_blocks before the end of the file
+        self.more_data = False
+        # Players whose counters changed after they were saved to hand store, None means all counters of the file
+        self.updated_players = None
+        self.saved_players = set()
         # DEBUG SHIT
-        super_debug = 0
-        for line in lines:
-            # Check hand state
-            if "PokerStars Hand #" in line:
-                state = "start-hand"
-                # Reset variables
-                temp_stats = {}
-                positions_assigned = 0
-                seat_id = 0
-                hand_id = str(line.split(" ")[2]).strip("#").strip(":")
-                if "Psadfasdfasdfasdfasdfdas" in line:
-                    print("SUPER DEBUG ACTIVATED ######################################")
-                    super_debug = 1
-                else:
-                    super_debug = 0
-                data_from_hand = {"summary": {}, "pre-flop": []}
-            elif "*** HOLE CARDS ***" in line:
-                state = "pre-flop"
-            elif "*** FLOP ***" in line:
-                state = "flop"
-                temp_stats, data_from_hand, cards = street_start_actions(temp_stats, data_from_hand, line, state, "pre-flop", super_debug)
-                data_from_hand["flop"] = [f"board: {cards}"]
-                if super_debug: print("HAND_DB 1: ", data_from_hand["pre-flop"])
-            elif "*** TURN ***" in line:
-                state = "turn"
-                temp_stats, data_from_hand, cards = street_start_actions(temp_stats, data_from_hand, line, state, "flop", super_debug)
-                data_from_hand["turn"] = [f"board: {cards}"]
-                if super_debug: print("HAND_DB 2: ", data_from_hand["flop"])
-            elif "*** RIVER ***" in line:
-                state = "river"
-                temp_stats, data_from_hand, cards = street_start_actions(temp_stats, data_from_hand, line, state, "turn", super_debug)
-                data_from_hand["river"] = [f"board: {cards}"]
-                if super_debug: print("HAND_DB 3: ", data_from_hand["turn"])
-            elif "*** SHOW DOWN ***" in line:
-                state = "showdown"
-                temp_stats, data_from_hand, _ = street_start_actions(temp_stats, data_from_hand, line, state, "river", super_debug)
-                if super_debug: print("HAND_DB 4: ", data_from_hand["river"])
-            elif "*** SUMMARY ***" in line:
-                # Calculate pot size, total money betted etc. one last time to update values for previous street
-                last_street = state
-                state = "end-hand"
-                temp_stats, data_from_hand, _ = street_start_actions(temp_stats, data_from_hand, line, state, last_street, super_debug)
-
-
-            if super_debug: print("State:", state, line)
-
-            if state == "start-hand" and positions_assigned == 0:
-                # Check active players
-                if line.startswith("Seat") and "is sitting out" not in line:
-                    usr = line.split(":")[1]
-                    usr = usr.split("(")[0].strip()
-                    if super_debug: print("User found:", usr)
-                    temp_stats[f"seat{seat_id}"] = {
-                        "usr": usr,
-                        "pos": None,
-                        "raises": 0,
-                        "money_betted_this_state": 0.0,
-                        "money_betted_total": 0.0
-                    }
-                    # Create data to hand DB for player and check if player exists in long term stats
-                    data_from_hand["summary"][usr] = {"position": "??", "cards": "?? ??", "profit": 999}
-                    if usr in long_stats:
-                        long_stats[usr]["played_hands"]["value"] += 1
-                    else:
-                        # Create new player to track
-                        long_stats[usr] = {
-                            "vpip": {"false": 0,"true": 0},
-                            "pfr": {"false": 0,"true": 0},
-                            "3bet_pre_flop": {"false": 0,"true": 0},
-                            "fold_vs_btn_raise": {"false": 0,"true": 0},
-                            "fold_c_bet": {"false": 0,"true": 0},
-                            "played_hands": {"value": 1},
-                            "profit": {"value": 0.0}
-                        }
-                        if super_debug: print("Long stats created")
-                    seat_id += 1
-
-                elif "posts big blind" in line:
-                    # Find player with BB
-                    player_count = len(temp_stats)
-                    if super_debug: print("Assigning positions")
-                    for i in range(player_count):
-                        if temp_stats[f"seat{i}"]["usr"] in line:
-                            # Set positions
-                            six_positions = ["bb", "sb", "bu", "co", "hj", "utg"]
-                            for j in range(player_count):
-                                if i < j:
-                                    i = player_count + j - 1
-                                temp_seat_id = i - j
-                                temp_stats[f"seat{temp_seat_id}"]["pos"] = six_positions[j]
-                                # Save position to hand DB as well
-                                tmp_usr = temp_stats[f"seat{temp_seat_id}"]["usr"]
-                                data_from_hand["summary"][tmp_usr]["position"] = six_positions[j]
-                            positions_assigned = 1                      
-                            break
-
-            # Find user_name in current text line
-            current_seat = None
-            for seat in temp_stats:
-                if temp_stats[seat]["usr"] in line:
-                    current_seat = seat
-                    current_player = temp_stats[current_seat]["usr"]
-                    if super_debug: print("Found seat and username", current_seat, current_player)
-
-            # If valid seat number found
+        self.super_debug = 0
+
+    def parse_new_lines(self, store, final=False, max_blocks=None):
+        """
+        Parse lines appended to the file since previous call, save new hands to hand store and return their number.
+        Last line is left for next call if it is still being written, unless final is set.
+        If max_blocks is given, at most that many blocks are read and more_data tells if file has more to parse.
+        Counters of players seen in new hands are saved too, and their names are left in saved_players.
+        """
+        with profile_stage(self.profiler, "hand store write"):
+            count = store.add_hands(self.source_file, self.hero_name, self.iter_hands(final, max_blocks))
+            self.saved_players = store.save_player_counters(self.source_file, self.tournament_mode, self.long_stats, self.updated_players)
+        # Players of unfinished hand can still get counted actions
+        self.updated_players = set(self.seat_by_name)
+        return count
+
+    def iter_hands(self, final=False, max_blocks=None):
+        """
+        Generator that parses lines appended to the file since previous call and yields every
+        completed hand as (dict_key, hand) tuple. Hands are not kept by the parser, so memory use
+        doesn't grow with the size of the file.
+        """
+        if self.profiler is not None:
+            yield from self.iter_hands_profiled(final, max_blocks)
+            return
+        handle_match, handle_action, handle_seat = self.handle_match, self.handle_action, self.handle_seat
+        for text in self.iter_text_blocks(final, max_blocks):
+            # Action and seat lines are two thirds of all lines, they go to their handlers directly, and other
+            # lines are only handled on the flop
+            for match in line_pattern.finditer(text):
+                line_type = match.lastgroup
+                if line_type == "rest":
+                    handle_action(*match.group("actor", "action", "rest"))
+                elif line_type == "seat_rest":
+                    handle_seat(*match.group("seat_number", "seat_rest"))
+                elif line_type != "other" or self.state == "flop":
+                    handle_match(match)
+            self.count_actions()
+            if self.completed_hands:
+                yield from self.completed_hands
+                self.completed_hands = []
+
+    def iter_hands_profiled(self, final=False, max_blocks=None):
+        """
+        Same as iter_hands, but time of reading, classifying lines with line pattern and handling them is added to profiler
+        """
+        profiler = self.profiler
+        perf_counter = time.perf_counter
+        blocks = self.iter_text_blocks(final, max_blocks)
+        while True:
+            start = perf_counter()
+            text = next(blocks, None)
+            profiler.add_time("file read", perf_counter() - start)
+            if text is None:
+                break
+            profiler.count("lines read", text.count("\n"))
+            classify_seconds = handle_seconds = 0.0
+            line_counts = {}
+            # Time between matches is used by finditer for finding next line and time inside loop for handling it
+            previous = perf_counter()
+            for match in line_pattern.finditer(text):
+                now = perf_counter()
+                classify_seconds += now - previous
+                line_counts[match.lastgroup] = line_counts.get(match.lastgroup, 0) + 1
+                self.handle_match(match)
+                previous = perf_counter()
+                handle_seconds += previous - now
+            classify_seconds += perf_counter() - previous
+            matched_lines = sum(line_counts.values())
+            profiler.add_time("line classification", classify_seconds, matched_lines)
+            profiler.add_time("action handling", handle_seconds, matched_lines)
+            for line_type, n in line_counts.items():
+                profiler.count(f"{line_types[line_type]} lines", n)
+            start = perf_counter()
+            profiler.count("actions", len(self.action_table))
+            self.count_actions()
+            profiler.add_time("stats count", perf_counter() - start)
+            if self.completed_hands:
+                profiler.count("hands", len(self.completed_hands))
+                yield from self.completed_hands
+                self.completed_hands = []
+
+    def iter_text_blocks(self, final=False, max_blocks=None):
+        """
+        Generator that reads the file from previous offset and yields decoded blocks of complete lines
+        """
+        self.more_data = False
+        if os.path.getsize(self.source_file) < self.offset:
+            # File was truncated or replaced, parse it again from the start
+            self.reset()
+        with open(self.source_file, "rb") as source:
+            source.seek(self.offset)
+            pending = b""
+            blocks = 0
+            while True:
+                if max_blocks is not None and blocks >= max_blocks:
+                    # Rest of the file is read by next call
+                    self.more_data = source.tell() < os.fstat(source.fileno()).st_size
+                    return
+                block = source.read(read_block_size)
+                if not block:
+                    break
+                blocks += 1
+                # Only complete lines are handled, rest of the block waits for next read
+                block = pending + block
+                end = block.rfind(b"\n") + 1
+                pending = block[end:]
+                if end:
+                    yield self.decode_block(block[:end])
+            if final and pending:
+                yield self.decode_block(pending)
+
+    def decode_block(self, data):
+        """
+        Function that decodes block of bytes read from the file and moves offset past it
+        """
+        text = data.decode("utf-8", errors="replace")
+        if self.offset == 0:
+            text = text.lstrip("\ufeff")   # Byte order mark in the beginning of file
+        self.offset += len(data)
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return text
+
+    def handle_match(self, match):
+        """
+        Function for updating parser state and statistics from one line of hand history
+        """
+        line_type = match.lastgroup
+        if self.super_debug: print("State:", self.state, line_types[line_type], match.group())
+        if line_type == "rest":
+            self.handle_action(*match.group("actor", "action", "rest"))
+        elif line_type == "seat_rest":
+            self.handle_seat(*match.group("seat_number", "seat_rest"))
+        elif line_type == "board":
+            self.handle_street(street_markers[match.group("street")], match.group())
+        elif line_type == "hand_info":
+            self.start_hand(match.group("hand_id"), match.group("hand_info"), match.group())
+        elif line_type == "cards":
+            self.handle_player_event("dealt", match.group("dealt"), match.group("cards"), match.group())
+        elif line_type == "other":
+            # Other lines only count as answers to a flop bet
+            if self.state == "flop":
+                self.handle_other_line(match.group())
+        elif line_type == "uncalled":
+            self.handle_player_event("uncalled", match.group("uncalled"), match.group("returned"), match.group())
+        else:
+            self.handle_player_event("cash-out", match.group("cashed"), match.group("cash_out"), match.group())
+
+    def handle_line(self, line):
+        """
+        Function for handling a single line of hand history, lines that parser doesn't need are ignored
+        """
+        match = line_pattern.match(line.rstrip("\r\n"))
+        if match is not None:
+            self.handle_match(match)
+
+    def start_hand(self, hand_id, hand_info, line):
+        """
+        Function for resetting hand specific variables in start of every hand
+        """
+        self.add_hand_actions()
+        self.state = "start-hand"
+        self.temp_stats = {}
+        self.positions_assigned = 0
+        self.seat_id = 0
+        self.seat_by_name = {}
+        self.seat_by_number = {}
+        self.profits_checked = set()
+        self.other_lines = []
+        self.counted_actions = 0
+        # Amounts won by every seat index
+        self.collected = {}
+        self.hand = Hand(hand_id, self.tournament_mode)
+        stakes = stakes_pattern.search(hand_info)
+        if stakes:
+            self.hand.stakes = stakes.group(1)
+        date = date_pattern.search(hand_info)
+        if date:
+            self.hand.date = "{}-{}-{} {:0>2}:{}:{}".format(*date.groups())
+        if "Psadfasdfasdfasdfasdfdas" in line:
+            print("SUPER DEBUG ACTIVATED ######################################")
+            self.super_debug = 1
+        else:
+            self.super_debug = 0
+
+    def handle_street(self, new_state, line):
+        """
+        Function for changing hand state when street marker line is found
+        """
+        previous_state = self.state
+        self.state = new_state
+        temp_stats, hand, super_debug = self.temp_stats, self.hand, self.super_debug
+        if new_state in street_before:
+            _, _, cards = street_start_actions(temp_stats, hand, line, new_state, street_before[new_state], super_debug)
+            hand.start_street(cards)
+        elif new_state == "showdown":
+            street_start_actions(temp_stats, hand, line, new_state, "river", super_debug)
+        elif new_state == "end-hand":
+            # Calculate pot size, total money betted etc. one last time to update values for previous street
+            street_start_actions(temp_stats, hand, line, new_state, previous_state, super_debug)
+
+    def handle_seat(self, seat_number, rest):
+        """
+        Function for handling seat lines, which list active players in start of hand and results in summary
+        """
+        state = self.state
+        if state == "start-hand":
+            # Check active players
+            if self.positions_assigned == 0 and "is sitting out" not in rest:
+                self.add_player(rest.split("(")[0].strip(), seat_number)
+        elif state == "end-hand":
+            current_seat = self.seat_by_number.get(seat_number)
             if current_seat:
-                # Check money betted / won
-                if tournament_mode:
-                    tmp_line = line.replace(f"{current_player}", "")   # Remove player name from line to not confuse digit finding
-                    find_dollars = digits_pattern.findall(tmp_line)
-                else:
-                    find_dollars = dollar_pattern.findall(line)
+                self.handle_result(current_seat, rest)
+
+    def add_player(self, usr, seat_number):
+        """
+        Function for adding active player to current hand and long term stats
+        """
+        if self.super_debug: print("User found:", usr)
+        # Same name object is shared by all hands and actions of the player
+        usr = sys.intern(usr)
+        seat = f"seat{self.seat_id}"
+        self.seat_by_name[usr] = seat
+        self.seat_by_number[seat_number] = seat
+        # Create data to hand DB for player and check if player exists in long term stats
+        self.temp_stats[seat] = SeatState(usr, self.hand.add_player(usr))
+        if self.updated_players is not None:
+            self.updated_players.add(usr)
+        counters = self.long_stats.get(usr)
+        if counters is None:
+            # Create new player to track
+            counters = self.long_stats[usr] = PlayerCounters()
+            if self.super_debug: print("Long stats created")
+        counters.played_hands += 1
+        self.seat_id += 1
+
+    def assign_positions(self, bb_seat):
+        """
+        Function for setting positions of all players based on seat of big blind
+        """
+        temp_stats = self.temp_stats
+        player_count = len(temp_stats)
+        if self.super_debug: print("Assigning positions")
+        i = int(bb_seat[4:])
+        six_positions = ["bb", "sb", "bu", "co", "hj", "utg"]
+        for j in range(player_count):
+            if i < j:
+                i = player_count + j - 1
+            seat_stats = temp_stats[f"seat{i - j}"]
+            seat_stats.pos = six_positions[j]
+            # Save position to hand DB as well
+            self.hand.positions[seat_stats.index] = six_positions[j]
+        self.positions_assigned = 1
+
+    def handle_action(self, actor, action_type, rest):
+        """
+        Function for handling "<player>: <action>" lines
+        """
+        current_seat = self.seat_by_name.get(actor)
+        if current_seat is None:
+            return
+        state = self.state
+        seat_stats = self.temp_stats[current_seat]
+        if state in action_streets:
+            action_code = action_codes.get(action_type)
+            if action_code is None or action_code > ActionType.RAISE:
+                if action_type == "posts":
+                    self.add_post(seat_stats, rest)
+                if state == "flop":
+                    self.add_other_line(seat_stats)
+                return
+            # Check money betted, amounts are searched only from text after player name
+            amount = total = 0.0
+            if action_code >= ActionType.CALL:
+                find_dollars = self.amount_pattern.findall(rest)
                 if find_dollars:
-                    if state not in ["end-hand", "showdown"]:
-                        if "bets" in line or "calls" in line:
-                            temp_stats[current_seat]["money_betted_this_state"] += float(find_dollars[-1])
-                        elif "posts" in line and "blind" in line:
-                            temp_stats[current_seat]["money_betted_this_state"] += float(find_dollars[-1])
-                            data_from_hand["pre-flop"].append(f"{temp_stats[current_seat]['usr']}: posts ${find_dollars[-1]}")
-                        elif "raises" in line:
-                            # Special case: If hero raises after call / bet / raise, we can just override previous money betted
-                            temp_stats[current_seat]["money_betted_this_state"] = float(find_dollars[-1])
-                        elif "Uncalled bet" in line:
-                            temp_stats[current_seat]["money_betted_this_state"] -= float(find_dollars[-1])
-                    elif state == "showdown":
-                        # Check cash out
-                        if "cashed out the hand" in line:
-                            cash_out_amount = float(find_dollars[0])
-                            temp_stats[current_seat]["money_betted_total"] -= cash_out_amount
-                            data_from_hand["river"].append(f"{temp_stats[current_seat]['usr']}: cashed out ${cash_out_amount}")
-                    elif state == "end-hand":
-                        if ("collected" in line or "won" in line) and ("player cashed out" not in line):
-                            temp_stats[current_seat]["money_betted_total"] -= float(find_dollars[-1])
-                
-                if state == "end-hand":
-                    # Calculate money won/lost in this hand
-                    profit_before = float(long_stats[current_player]["profit"]["value"])
-                    long_stats[current_player]["profit"]["value"] = profit_before - temp_stats[current_seat]["money_betted_total"]
-                    if super_debug: print("Checking profit", long_stats[current_player]["profit"]["value"], profit_before)
-                    
-                    data_from_hand["summary"][current_player]["profit"] = long_stats[current_player]["profit"]["value"] - profit_before
-
-                    # Check if profit calculated for all players
-                    profit_checked = 0
-                    for player in data_from_hand["summary"]:
-                        if data_from_hand["summary"][player]["profit"] != 999:
-                            profit_checked += 1
-
-                    # If profit checked for all players, save data to database
-                    if profit_checked == len(temp_stats):
-                        dict_key = f"{hand_id}_{data_from_hand['summary'][hero_name]['profit']:.2f}"
-                        if tournament_mode:
-                            dict_key = f"T_{dict_key}"
-                        bank_roll_data.append(float(data_from_hand['summary'][hero_name]['profit']))
-                        total_hands_data[dict_key] = data_from_hand
-                        if super_debug: print("Hand data saved to database", data_from_hand)
-
-                # Check dealt cards to hero and showdown cards
-                if (state == "pre-flop" and "Dealt to " in line) or (state == "showdown" and "shows" in line):
-                    cards = line.split("[")[1].split("]")[0]
-                    data_from_hand["summary"][current_player]["cards"] = cards
-                    if super_debug: print("Cards found:", cards)
-
-                # Update long term stats for user
-                long_stats, player_action = check_player_actions(current_seat, current_player, line, state, long_stats, temp_stats, super_debug)
-                # Check if action was done
-                if player_action:
-                    if "and is all-in" in player_action:
-                        player_action = player_action.replace("and is all-in", "(all-in)")
-                    data_from_hand[state].append(player_action)
-
-    # Calculate value field for stats
-    for player in long_stats:
-        for stat in long_stats[player]:
-            if stat not in ["played_hands", "profit"]:
-                if long_stats[player][stat]["true"] > 0:
-                    long_stats[player][stat]["value"] = long_stats[player][stat]["true"] / (long_stats[player][stat]["true"] + long_stats[player][stat]["false"])
-                    long_stats[player][stat]["value"] = int(100 * long_stats[player][stat]["value"])
-                else:
-                    long_stats[player][stat]["value"] = 0
-    
-    # If valid data, save to database and return collected data
-    if long_stats:
-        # Save hands to database
-        save_to_json(f"./hands_db/{hand_db_file}", total_hands_data)
-        return long_stats, temp_stats, bank_roll_data
-    # Return 0 to indicate, that data not valid
-    return 0, 0, 0
+                    if action_code == ActionType.RAISE:
+                        # Special case: If hero raises after call / bet / raise, we can just override previous money betted
+                        amount, total = float(find_dollars[0]), float(find_dollars[-1])
+                        seat_stats.money_betted_this_state = total
+                    else:
+                        amount = float(find_dollars[-1])
+                        seat_stats.money_betted_this_state += amount
+            # Stats of the action are counted later from actions of the hand in action table
+            self.hand.add_action(seat_stats.index, action_code, amount, total, "and is all-in" in rest)
+        elif state == "start-hand":
+            if action_type == "posts":
+                if self.positions_assigned == 0 and rest.startswith(" big blind"):
+                    self.assign_positions(current_seat)
+                self.add_post(seat_stats, rest)
+        elif state == "showdown" and action_type == "shows":
+            # Check showdown cards
+            self.hand.cards[seat_stats.index] = rest.split("[")[1].split("]")[0]
+
+    def add_post(self, seat_stats, rest):
+        """
+        Function for adding posted blind to money betted and actions of the hand
+        """
+        if "blind" in rest:
+            find_dollars = self.amount_pattern.findall(rest)
+            if find_dollars:
+                amount = float(find_dollars[-1])
+                seat_stats.money_betted_this_state += amount
+                self.hand.add_action(seat_stats.index, ActionType.POST, amount)
+
+    def handle_player_event(self, line_type, actor, rest, line):
+        """
+        Function for handling lines that refer to a player without action, like dealt cards and returned bets
+        """
+        current_seat = self.seat_by_name.get(actor)
+        if current_seat is None:
+            return
+        state = self.state
+        if state == "flop":
+            self.add_other_line(self.temp_stats[current_seat])
+        if line_type == "dealt":
+            if state == "pre-flop":
+                # Check dealt cards to hero
+                self.hand.cards[self.temp_stats[current_seat].index] = line.split("[")[1].split("]")[0]
+        elif line_type == "uncalled":
+            if state != "end-hand" and state != "showdown":
+                find_dollars = self.amount_pattern.findall(rest)
+                if find_dollars:
+                    self.temp_stats[current_seat].money_betted_this_state -= float(find_dollars[-1])
+        elif line_type == "cash-out":
+            if state == "showdown":
+                find_dollars = self.amount_pattern.findall(rest)
+                if find_dollars:
+                    cash_out_amount = float(find_dollars[0])
+                    self.temp_stats[current_seat].money_betted_total -= cash_out_amount
+                    self.hand.add_action(self.temp_stats[current_seat].index, ActionType.CASH_OUT, cash_out_amount)
+
+    def handle_other_line(self, line):
+        """
+        Function for lines that start with name of a seated player without an action, like "<player> has timed out"
+        """
+        seat_stats = None
+        for name, seat in self.seat_by_name.items():
+            # Longest name wins when one name is the start of another
+            if line.startswith(name) and line[len(name):len(name) + 1] in (" ", ":") and (seat_stats is None or len(name) > len(seat_stats.usr)):
+                seat_stats = self.temp_stats[seat]
+        if seat_stats is not None:
+            self.add_other_line(seat_stats)
+
+    def add_other_line(self, seat_stats):
+        """
+        Function that remembers line of player without a counted action for action table. Such lines on the flop
+        count as not folding to a c-bet, like they always have.
+        """
+        hand = self.hand
+        self.other_lines.append((len(hand.action_amounts) // 2, hand.street_count() - 1, seat_stats.index))
+
+    def add_hand_actions(self):
+        """
+        Function that adds actions of current hand that are not in action table yet to it
+        """
+        hand = self.hand
+        if hand is None:
+            return
+        actions = len(hand.action_amounts) // 2 + len(self.other_lines)
+        if actions > self.counted_actions:
+            self.action_table.add_hand(hand, self.counted_actions, self.other_lines)
+            self.counted_actions = actions
+
+    def handle_result(self, current_seat, rest):
+        """
+        Function for calculating money won/lost in this hand from player's summary line
+        """
+        seat_stats = self.temp_stats[current_seat]
+        hand = self.hand
+        counters = self.long_stats[seat_stats.usr]
+        if ("collected" in rest or "won" in rest) and ("player cashed out" not in rest):
+            find_dollars = self.amount_pattern.findall(rest)
+            if find_dollars:
+                seat_stats.money_betted_total -= float(find_dollars[-1])
+                self.collected[seat_stats.index] = self.collected.get(seat_stats.index, 0.0) + float(find_dollars[-1])
+
+        profit_before = counters.profit
+        counters.profit = profit_before - seat_stats.money_betted_total
+        if self.super_debug: print("Checking profit", counters.profit, profit_before)
+
+        hand.profits[seat_stats.index] = counters.profit - profit_before
 
-def check_player_actions(user_seat, user_name, txt_line, hand_state, long_stats, short_stats, debug):
+        # If profit checked for all players, save data to database
+        self.profits_checked.add(current_seat)
+        if len(self.profits_checked) == len(self.temp_stats):
+            hero_seat = hand.names.index(self.hero_name)
+            hero_profit = hand.profits[hero_seat]
+            dict_key = f"{hand.hand_id}_{hero_profit:.2f}"
+            if self.tournament_mode:
+                dict_key = f"T_{dict_key}"
+            if self.collect_bankroll:
+                pot_size = sum(pot for pot in hand.pot_sizes if pot is not None)
+                self.bankroll_rows.append((int(hand.hand_id), hand.date, hand.stakes, hand.positions[hero_seat], float(hero_profit), pot_size, hand.player_all_in(self.hero_name)))
+                all_in = hand.all_in_cards(self.hero_name)
+                if all_in is not None:
+                    self.all_in_spots.append((int(hand.hand_id), *all_in, self.collected.get(hero_seat, 0.0), sum(self.collected.values())))
+            self.completed_hands.append((dict_key, hand))
+            if self.super_debug: print("Hand data saved to database", hand.to_json())
+
+    def count_actions(self):
+        """
+        Function that adds stats of actions parsed since previous call to long term stats and empties action table
+        """
+        # Actions of unfinished hand parsed so far are counted now, rest of them when the hand is finished
+        self.add_hand_actions()
+        table = self.action_table
+        add_to_counters(table, self.long_stats)
+        table.clear()
+
+    def get_stats(self):
+        """
+        Function that returns long term stats of all players in the format of stats JSON files
+        """
+        self.count_actions()
+        return {player: counters.to_json() for player, counters in self.long_stats.items()}
+
+def handle_txt_file(source_file, hero_name, tournament_mode=0, store=None, profiler=None):
     """
-    Function that updates statistics for player specified by user_name
+    Function for parsing txt files containing all hands played in one table.
+    Hands are streamed from the parser to hand store as they complete, so whole table is never kept in memory.
     """
-    if debug:
-        print(txt_line)
-    # Init some general variables
-    action = None
-    button_raised = 0
-    villain_raises = 0
-    for seat_num in short_stats:
-        if seat_num != user_seat and short_stats[seat_num]["raises"]:
-            villain_raises += short_stats[seat_num]["raises"]
-            # Check if this was button raise
-            if villain_raises == 1 and short_stats[seat_num]["pos"] == "bu":
-                button_raised = 1
-
-    # VPIP
-    if hand_state in ["pre-flop", "flop", "turn", "river"]:
-        action = txt_line.strip("\n")#.replace("$", "")
-        if "folds" in txt_line:
-            long_stats[user_name]["vpip"]["false"] += 1
-        elif "checks" in txt_line:
-            long_stats[user_name]["vpip"]["false"] += 1
-        elif "bets" in txt_line or "raises" in txt_line or "calls" in txt_line:
-            long_stats[user_name]["vpip"]["true"] += 1
-            if "bets" in txt_line or "raises" in txt_line:
-                short_stats[user_seat]["raises"] += 1
-        else:
-            action = None   # If no action done, reset action to None
-
-    if hand_state == "pre-flop":
-        # PFR
-        if villain_raises == 0:
-            if "raises" in txt_line:
-                long_stats[user_name]["pfr"]["true"] += 1
-            elif "folds" in txt_line or "checks" in txt_line:
-                long_stats[user_name]["pfr"]["false"] += 1
-        # 3Bet pre-flop
-        elif villain_raises:
-            if "raises" in txt_line:
-                long_stats[user_name]["3bet_pre_flop"]["true"] += 1
-            elif "calls" in txt_line or "folds" in txt_line:
-                long_stats[user_name]["3bet_pre_flop"]["false"] += 1
-        # Fold vs button raise
-        if button_raised:
-            if "raises" in txt_line or "calls" in txt_line:
-                long_stats[user_name]["fold_vs_btn_raise"]["false"] += 1
-            elif "folds" in txt_line:
-                long_stats[user_name]["fold_vs_btn_raise"]["true"] += 1
-    
-    # Fold to C bet
-    if hand_state == "flop" and villain_raises and short_stats[user_seat]["raises"] == 0:
-        if "folds" in txt_line:
-            long_stats[user_name]["fold_c_bet"]["true"] += 1
-        else:
-            long_stats[user_name]["fold_c_bet"]["false"] += 1
+    own_store = store is None
+    if own_store:
+        store = HandStore()
+    try:
+        parser = HandHistoryParser(source_file, hero_name, tournament_mode)
+        parser.profiler = profiler
+        parser.collect_bankroll = True
+        # Hands saved earlier from this file are replaced together with the first batch of new hands
+        with profile_stage(profiler, "hand store write"):
+            store.replace_source(source_file, hero_name, parser.iter_hands(final=True))
+            store.save_player_counters(source_file, tournament_mode, parser.long_stats)
+    finally:
+        if own_store:
+            store.close()
+    with profile_stage(profiler, "stats merge"):
+        long_stats = parser.get_stats()
 
-    return long_stats, action
+    # If valid data, return collected data
+    if long_stats:
+        return long_stats, parser.temp_stats, parser.bankroll_rows, parser.all_in_spots
+    # Return 0 to indicate, that data not valid
+    return 0, 0, 0, 0
 
 def save_to_json(target, json_data):
     """
@@ -347,21 +614,14 @@ def load_from_json(source):
         return 0
 
 def create_hero_stats(target_file):
-    hero_statistics = {
-        "vpip": {"false": 0, "true": 0, "value": 0},
-        "pfr": {"false": 0, "true": 0, "value": 0},
-        "3bet_pre_flop": {"false": 0, "true": 0, "value": 0},
-        "fold_vs_btn_raise": {"false": 0, "true": 0, "value": 0},
-        "fold_c_bet": {"false": 0, "true": 0, "value": 0},
-        "played_hands": {"value": 0},
-        "profit": {"value": 0.0}
-    }
-    save_to_json(target_file, hero_statistics)
+    # Empty counters have every registered stat
+    save_to_json(target_file, PlayerCounters().to_json())
 
 def create_config(target_file):
     config_data = {
         "path_to_hand_history": "C:\\path\\to\\your\\PokerStars\\HandHistory\\Username",
         "pokerstars_username": "TBA",
+        "ingest_workers": 0,
     }
     save_to_json(target_file, config_data)
 
@@ -376,11 +636,3 @@ def create_opening_ranges():
         "BU": []
     }
     save_to_json("./hud_data/opening_ranges.json", opening_ranges)
-
-def save_to_csv(target, csv_data):
-    """
-    Function that saves data to json file
-    """
-    with open(target, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerows(csv_data)